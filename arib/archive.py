@@ -0,0 +1,462 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: archive.py
+Desc: Searchable archive of the captions of any number of recordings
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+arib-archive ingest decodes the captions of .ts files into a SQLite
+database, and arib-archive search finds every caption (and so programme)
+in which a phrase was said, in milliseconds, however many recordings have
+been ingested:
+
+  arib-archive ingest -d captions.db recordings/*.ts
+  arib-archive search -d captions.db 右京さん
+
+Each caption is a cue, just as in the .srt and other formats (see
+arib.formats): its text, start and end time in the recording, PID and
+language, in a table
+
+  files       path, size and SHA-256 of each recording ingested
+  programmes  service, title, start and duration of each programme (EIT
+              event) captions were found in, and when it starts in the file
+  captions    cues, each of one file, PID, language and programme if known
+
+Caption text is indexed by an FTS5 table with the trigram tokenizer, since
+Japanese isn't written with spaces between words. Any phrase of three or
+more characters is found through the index, shorter ones by a scan.
+
+Each file is ingested in a single transaction, its cues inserted in
+batches, so a file is either all there or not at all. A file already in
+the archive (by SHA-256 of its contents, wherever it is) is skipped, and
+one ingested again after it has changed (e.g. a recording that was still
+being written) replaces what was there for its path.
+
+'''
+import os
+import sys
+import time
+import argparse
+import datetime
+import sqlite3
+from collections import namedtuple
+
+from arib.arib_exceptions import ArchiveError
+from arib.formats import CaptionFormatter
+from arib.formats import clocktime
+from arib.mpeg.ts import TS
+from arib.output import utf8_stdout
+from arib.ts2ass import Extraction
+
+DEFAULT_DATABASE = 'captions.db'
+
+# cues inserted at once
+DEFAULT_BATCH_SIZE = 1000
+
+DEFAULT_LIMIT = 100
+
+# shortest phrase found through the FTS5 index. The trigram tokenizer
+# indexes every three characters, so shorter phrases are found by a scan.
+MIN_INDEXED_PHRASE = 3
+
+# bytes hashed at once
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# bumped whenever the schema changes
+VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+  id INTEGER PRIMARY KEY,
+  path TEXT NOT NULL,
+  sha256 TEXT NOT NULL UNIQUE,
+  size INTEGER NOT NULL,
+  ingested REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_path ON files (path);
+CREATE TABLE IF NOT EXISTS programmes (
+  id INTEGER PRIMARY KEY,
+  file_id INTEGER NOT NULL REFERENCES files (id),
+  service_id INTEGER,
+  service TEXT,
+  event_id INTEGER,
+  title TEXT,
+  start TEXT,
+  duration INTEGER,
+  offset REAL
+);
+CREATE TABLE IF NOT EXISTS captions (
+  id INTEGER PRIMARY KEY,
+  file_id INTEGER NOT NULL REFERENCES files (id),
+  programme_id INTEGER REFERENCES programmes (id),
+  pid INTEGER,
+  language TEXT,
+  start REAL NOT NULL,
+  end REAL NOT NULL,
+  text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS captions_file ON captions (file_id, start);
+CREATE VIRTUAL TABLE IF NOT EXISTS captions_fts USING fts5 (
+  text, content='captions', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS captions_insert AFTER INSERT ON captions BEGIN
+  INSERT INTO captions_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS captions_delete AFTER DELETE ON captions BEGIN
+  INSERT INTO captions_fts (captions_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+'''
+
+Hit = namedtuple('Hit', ['path', 'start', 'end', 'pid', 'language', 'text', 'service', 'title', 'aired'])
+Hit.__doc__ = '''Caption found by Archive.search. start and end are seconds
+into the recording. service and title are those of its programme and aired
+the JST datetime it was broadcast, each None if unknown.'''
+
+
+def sha256(filename):
+  '''Hex SHA-256 of the contents of a file
+  '''
+  # slow to import, and only needed to ingest
+  import hashlib
+  digest = hashlib.sha256()
+  with open(filename, 'rb') as f:
+    for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+      digest.update(block)
+  return digest.hexdigest()
+
+
+def phrase_query(phrase):
+  '''FTS5 query for a phrase, taken literally
+  '''
+  return u'"' + phrase.replace(u'"', u'""') + u'"'
+
+
+def like_pattern(phrase):
+  '''LIKE pattern for a phrase anywhere in the text, escaped with \\
+  '''
+  return u'%' + phrase.replace(u'\\', u'\\\\').replace(u'%', u'\\%').replace(u'_', u'\\_') + u'%'
+
+
+class ArchiveFormatter(CaptionFormatter):
+  '''Writes cues to an Archive rather than a file. Cues are held back until
+  their language code is known (see set_language), or until close().
+  '''
+  def __init__(self, archive, pid, language, programme_id=None, offset=0.0, tmax=5):
+    '''
+    :param language: ISO 639 language code, or None if unknown
+    :param programme_id: programmes row the cues are in
+    :param offset: stream time cue times count from (the start of the programme)
+    '''
+    super(ArchiveFormatter, self).__init__(tmax=tmax)
+    self._archive = archive
+    self._pid = pid
+    self._language = language
+    self._programme_id = programme_id
+    self._offset = offset
+    self._held = []
+
+  def open_file(self):
+    self._file = self
+
+  def cue(self, index, start, end, lines):
+    return (start + self._offset, end + self._offset, u'\n'.join(lines))
+
+  def write(self, cue):
+    if self._language is None:
+      self._held.append(cue)
+    else:
+      self._archive.write((self._programme_id, self._pid, self._language) + cue)
+
+  def set_language(self, language):
+    '''Language code, from management data. Writes the cues held until now.
+    '''
+    self._language = language
+    held, self._held = self._held, []
+    for cue in held:
+      self.write(cue)
+
+  def close(self):
+    # the Archive commits the whole file at once, so only the last and any
+    # held cues are left
+    self.last_cue()
+    for cue in self._held:
+      self._archive.write((self._programme_id, self._pid, None) + cue)
+    self._held = []
+
+  def abort(self):
+    pass
+
+  def keep(self):
+    pass
+
+
+class ArchiveExtraction(Extraction):
+  '''Extraction of every caption PID and language of a .ts file, and the
+  programmes they're in, into an Archive
+  '''
+  def __init__(self, archive, infilename, **kwargs):
+    Extraction.__init__(self, infilename, {}, formats=(), languages=True, all_pids=True,
+      split_programmes=True, **kwargs)
+    self.archive = archive
+    # programmes row id by (service id, event id)
+    self.programme_ids = {}
+
+  def formatter(self, pid, language, event=None):
+    service = self.service_pids[pid][0] if self.services else None
+    programme = (event.service_id, event.event_id) if event else None
+    key = (service, programme, pid, language)
+    formatter = self.formatters.get(key)
+    if formatter is None:
+      programme_id = None
+      offset = 0.0
+      if event:
+        offset = self.programme_starts[programme]
+        programme_id = self.programme_ids.get(programme)
+        if programme_id is None:
+          programme_id = self.programme_ids[programme] = self.archive.programme(event,
+            self.guide.services.get(event.service_id), offset)
+      formatter = ArchiveFormatter(self.archive, pid, self.language_codes.get((pid, language)),
+        programme_id, offset, self.tmax)
+      self.formatters[key] = formatter
+    return formatter
+
+  def relabel(self, pid, language):
+    code = self.language_codes[(pid, language)]
+    for key, formatter in self.formatters.items():
+      if key[2] == pid and key[3] == language:
+        formatter.set_language(code)
+
+
+class Archive(object):
+  '''SQLite database of captions, indexed for full text search
+  '''
+  def __init__(self, filename=DEFAULT_DATABASE, batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    :param batch_size: cues inserted at once
+    :raises ArchiveError: if the database can't be used
+    '''
+    self._filename = filename
+    self._batch_size = batch_size
+    self._rows = []
+    self._file_id = None
+    try:
+      # transactions are begun and committed explicitly
+      self._db = sqlite3.connect(filename, isolation_level=None)
+      version = self._db.execute('PRAGMA user_version').fetchone()[0]
+      if version not in (0, VERSION):
+        raise ArchiveError(filename + ' is an archive of version ' + str(version) + ', not ' + str(VERSION))
+      self._db.execute('PRAGMA journal_mode = WAL')
+      self._db.execute('PRAGMA synchronous = NORMAL')
+      self._db.execute('PRAGMA foreign_keys = ON')
+      self._db.executescript(SCHEMA)
+      self._db.execute('PRAGMA user_version = {v}'.format(v=VERSION))
+    except sqlite3.Error as ex:
+      raise ArchiveError(filename + ': ' + str(ex) + ' (FTS5 with the trigram tokenizer needs SQLite 3.34 or later)')
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    self.close()
+    return False
+
+  def close(self):
+    self._db.close()
+
+  def ingested(self, digest):
+    '''Path a file with this SHA-256 was ingested from, or None
+    '''
+    row = self._db.execute('SELECT path FROM files WHERE sha256 = ?', (digest,)).fetchone()
+    return row[0] if row else None
+
+  def ingest(self, infilename, pid=-1, tmax=5, services=False, verbose=False):
+    '''Decode the captions of a .ts file into the archive, unless a file
+    with the same contents already has been
+    :param pid: PID of the captions (found automatically if not given)
+    :param services: the captions of every service of a multiplex
+    :return: number of captions ingested, or None if already in the archive
+    :raises ArchiveError: if the captions can't be decoded
+    '''
+    path = os.path.abspath(infilename)
+    digest = sha256(infilename)
+    if self.ingested(digest) is not None:
+      return None
+    extraction = ArchiveExtraction(self, infilename, pid=pid, tmax=tmax, services=services,
+      verbose=verbose, silent=not verbose)
+    db = self._db
+    db.execute('BEGIN')
+    try:
+      # replaces an earlier version of the same file
+      for (file_id,) in db.execute('SELECT id FROM files WHERE path = ?', (path,)).fetchall():
+        self._remove(file_id)
+      self._file_id = db.execute('INSERT INTO files (path, sha256, size, ingested) VALUES (?, ?, ?, ?)',
+        (path, digest, os.path.getsize(infilename), time.time())).lastrowid
+      self._rows = []
+      if not extraction.run(TS(infilename)):
+        raise ArchiveError('could not decode the captions of ' + infilename)
+      self.flush()
+      count = db.execute('SELECT COUNT(*) FROM captions WHERE file_id = ?', (self._file_id,)).fetchone()[0]
+      db.execute('COMMIT')
+    except BaseException:
+      self._rows = []
+      db.execute('ROLLBACK')
+      raise
+    finally:
+      self._file_id = None
+    return count
+
+  def _remove(self, file_id):
+    db = self._db
+    db.execute('DELETE FROM captions WHERE file_id = ?', (file_id,))
+    db.execute('DELETE FROM programmes WHERE file_id = ?', (file_id,))
+    db.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+  def programme(self, event, service, offset):
+    '''Add a programme of the file being ingested
+    :param event: arib.mpeg.si.Event
+    :param service: arib.mpeg.si.Service, or None if unknown
+    :param offset: stream time of its start
+    :return: its row id
+    '''
+    return self._db.execute('INSERT INTO programmes (file_id, service_id, service, event_id, title, start, duration, offset) '
+      'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (self._file_id, event.service_id, service.name if service else None,
+      event.event_id, event.title, event.start.isoformat() if event.start else None, event.duration, offset)).lastrowid
+
+  def write(self, row):
+    '''Add a cue of the file being ingested, as given by ArchiveFormatter.cue
+    '''
+    self._rows.append(row)
+    if len(self._rows) >= self._batch_size:
+      self.flush()
+
+  def flush(self):
+    if self._rows:
+      self._db.executemany('INSERT INTO captions (file_id, programme_id, pid, language, start, end, text) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)', [(self._file_id,) + row for row in self._rows])
+      self._rows = []
+
+  def search(self, phrase, limit=DEFAULT_LIMIT, query=False, language=None, title=None):
+    '''Captions containing a phrase, in order of file and time
+    :param query: phrase is an FTS5 query (e.g. 右京 AND 相棒) rather than literal text
+    :param language: only captions in this language (ISO 639 code)
+    :param title: only captions of programmes with this in their title
+    :return: list of Hit
+    '''
+    sql = ('SELECT f.path, c.start, c.end, c.pid, c.language, c.text, p.service, p.title, p.start, p.offset '
+      'FROM captions c JOIN files f ON f.id = c.file_id LEFT JOIN programmes p ON p.id = c.programme_id ')
+    if query or len(phrase) >= MIN_INDEXED_PHRASE:
+      sql += 'WHERE c.id IN (SELECT rowid FROM captions_fts WHERE captions_fts MATCH ?) '
+      parameters = [phrase if query else phrase_query(phrase)]
+    else:
+      sql += "WHERE c.text LIKE ? ESCAPE '\\' "
+      parameters = [like_pattern(phrase)]
+    if language:
+      sql += 'AND c.language = ? '
+      parameters.append(language)
+    if title:
+      sql += "AND p.title LIKE ? ESCAPE '\\' "
+      parameters.append(like_pattern(title))
+    sql += 'ORDER BY f.path, c.start LIMIT ?'
+    parameters.append(limit)
+    try:
+      rows = self._db.execute(sql, parameters).fetchall()
+    except sqlite3.OperationalError as ex:
+      raise ArchiveError(str(ex))
+    return [Hit(path, start, end, pid, language_code, text, service, programme_title, aired(start, started, offset))
+      for path, start, end, pid, language_code, text, service, programme_title, started, offset in rows]
+
+
+def aired(start, programme_start, offset):
+  '''JST datetime a caption was broadcast, from the start of its programme
+  '''
+  if programme_start is None or offset is None:
+    return None
+  return datetime.datetime.strptime(programme_start, '%Y-%m-%dT%H:%M:%S') + datetime.timedelta(seconds=start - offset)
+
+
+def ingest(args):
+  status = 0
+  with Archive(args.database, batch_size=args.batch_size) as archive:
+    for infilename in args.infile:
+      if not os.path.exists(infilename):
+        print(infilename + ': does not exist')
+        status = -1
+        continue
+      started = time.time()
+      try:
+        count = archive.ingest(infilename, pid=args.pid, tmax=args.tmax, services=args.services, verbose=args.verbose)
+      except ArchiveError as ex:
+        print(infilename + ': ' + str(ex))
+        status = -1
+        continue
+      if args.quiet:
+        continue
+      if count is None:
+        print(infilename + ': already ingested')
+      else:
+        print(infilename + ': {n} captions in {t:.1f}s'.format(n=count, t=time.time() - started))
+  return status
+
+
+def search(args):
+  with Archive(args.database) as archive:
+    hits = archive.search(args.phrase, limit=args.limit, query=args.query, language=args.language, title=args.title)
+  for hit in hits:
+    programme = u''
+    if hit.title is not None:
+      programme = u' ' + hit.title + (u' (' + hit.service + u')' if hit.service else u'')
+      if hit.aired:
+        programme += u' ' + hit.aired.strftime('%Y-%m-%d %H:%M:%S')
+    print(u'{path} {s} --> {e}{programme}\n  {text}'.format(path=hit.path, s=clocktime(hit.start),
+      e=clocktime(hit.end), programme=programme, text=hit.text.replace(u'\n', u'\n  ')))
+  return 0 if hits else 1
+
+
+def main():
+  utf8_stdout()
+  parser = argparse.ArgumentParser(description='Archive the closed captions of MPEG TS files in a searchable database.')
+  parser.add_argument('-d', '--database', help='Archive database filename (default: ' + DEFAULT_DATABASE + ').',
+                      type=str, default=DEFAULT_DATABASE)
+  commands = parser.add_subparsers(dest='command', metavar='command')
+  commands.required = True
+
+  parser_ingest = commands.add_parser('ingest', help='Add the captions of .ts files to the archive.',
+    description='Add the captions of .ts files to the archive. Files already ingested are skipped.')
+  parser_ingest.add_argument('infile', help='Input filename (MPEG2 Transport Stream File).', type=str, nargs='+')
+  parser_ingest.add_argument('-p', '--pid',
+                             help='Specify a PID of a PES known to contain closed caption info (tool will attempt to find the proper PID if not specified.).',
+                             type=int, default=-1)
+  parser_ingest.add_argument('--services',
+                             help='Ingest the captions of every service of a multiplex (MPTS), found through its PAT and PMTs.',
+                             action='store_true')
+  parser_ingest.add_argument('-t', '--tmax', help='Caption display time limit (seconds).', type=int, default=5)
+  parser_ingest.add_argument('--batch-size', help='Captions inserted at once.', type=int, default=DEFAULT_BATCH_SIZE)
+  parser_ingest.add_argument('-v', '--verbose', help='Verbose output.', action='store_true')
+  parser_ingest.add_argument('-q', '--quiet', help='Only report failures.', action='store_true')
+  parser_ingest.set_defaults(run=ingest)
+
+  parser_search = commands.add_parser('search', help='Find the captions containing a phrase.',
+    description='Find the captions containing a phrase, with the file, time and programme of each.')
+  parser_search.add_argument('phrase', help='Text to find.', type=str)
+  parser_search.add_argument('--query', help='The phrase is an FTS5 query, e.g. "右京 AND 相棒", rather than literal text.',
+                             action='store_true')
+  parser_search.add_argument('-l', '--language', help='Only captions in this language (ISO 639 code, e.g. jpn).',
+                             type=str, default=None)
+  parser_search.add_argument('--title', help='Only captions of programmes with this in their title.', type=str,
+                             default=None)
+  parser_search.add_argument('-n', '--limit', help='Most captions shown.', type=int, default=DEFAULT_LIMIT)
+  parser_search.set_defaults(run=search)
+  args = parser.parse_args()
+
+  if args.command == 'ingest' and args.pid >= 0 and args.services:
+    parser.error('--services can not be used with --pid')
+  try:
+    sys.exit(args.run(args))
+  except ArchiveError as ex:
+    print('*** Sorry, ' + str(ex))
+    sys.exit(-1)
+
+if __name__ == "__main__":
+  main()
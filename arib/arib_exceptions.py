@@ -28,3 +28,18 @@ class FileOpenError(Exception):
   def __str__(self):
     return 'File open error: : {msg}'.format(msg=self._msg)
 
+
+class CheckpointError(Exception):
+  def __init__(self, msg='No further info'):
+    self._msg = msg
+
+  def __str__(self):
+    return 'Checkpoint error: {msg}'.format(msg=self._msg)
+
+
+class ArchiveError(Exception):
+  def __init__(self, msg='No further info'):
+    self._msg = msg
+
+  def __str__(self):
+    return 'Archive error: {msg}'.format(msg=self._msg)
@@ -15,9 +15,14 @@ file.
 
 import arib.code_set as code_set
 import arib.control_characters as control_characters
-import codecs
-import re
-from arib_exceptions import FileOpenError
+from arib.output import BufferedFile
+from arib.output import DEFAULT_FLUSH_LINES
+from arib.frozen import frozen
+
+# caption text waiting for the next clear screen is capped, so a stream that
+# never clears the screen can't grow memory without bound.
+MAX_PENDING_LINES = 64
+MAX_PENDING_CHARACTERS = 4096
 
 class Pos(object):
   '''Screen position in pixels
@@ -36,16 +41,22 @@ class Pos(object):
 
 class Dialog(object):
   ''' text and dialog
+  Text is accumulated as a list of fragments and only joined once,
+  when the dialog line is written.
   '''
   def __init__(self, s, x=None, y=None):
-    self._s = s
+    self._parts = [s]
+    self._len = len(s)
     self._x = x
     self._y = y
   def __iadd__(self, other):
-    self._s += other
+    self._parts.append(other)
+    self._len += len(other)
     return self
   def __len__(self):
-    return len(self._s)
+    return self._len
+  def __str__(self):
+    return u''.join(self._parts)
 
 class Size(object):
   '''Screen width, height of an area in pixels
@@ -108,28 +119,14 @@ class ClosedCaptionArea(object):
         
     return Pos(self.UL.x + c * w, self.UL.y + r * h)
   
-class ASSFile(object):
+class ASSFile(BufferedFile):
   '''Wrapper for a single open utf-8 encoded .ass subtitle file
+  Dialog lines are buffered and written in batches (see arib.output).
   '''
-  def __init__(self, filepath, width=960, height=540):
-    try:
-      self._f = codecs.open(filepath.decode('sjis'),'w',encoding='utf8')
-      self.write_header(width,height, filepath.decode('sjis'))
-      self.write_styles()
-    except:
-        raise FileOpenError("Could not open file " + filepath +" for writing.")
-
-  def __del__(self):
-    try:
-      if self._f:
-        self._f.close()
-    except AttributeError:
-      pass
-
-  def write(self, line):
-    '''Write indicated string to file. usually a line of dialog.
-    '''
-    self._f.write(line)
+  def __init__(self, filepath, width=960, height=540, flush_lines=DEFAULT_FLUSH_LINES, atomic=True):
+    super(ASSFile, self).__init__(filepath, flush_lines=flush_lines, atomic=atomic)
+    self.write_header(width,height, filepath)
+    self.write_styles()
 
   def write_header(self, width, height, title):
     header = u'''[Script Info]
@@ -151,7 +148,7 @@ Video File: {title}
 
 
 '''.format(width=width, height=height, title=title)
-    self._f.write(header)
+    self.write(header)
 
   def write_styles(self):
     styles = u'''[V4+ Styles]
@@ -162,7 +159,7 @@ Style: small,MS UI Gothic,18,&H00FFFFFF,&H000000FF,&H00000000,&H88000000,0,0,0,0
 
 
 '''
-    self._f.write(styles)
+    self.write(styles)
 
 def asstime(seconds):
   '''format floating point seconds elapsed time to 0:02:14.53
@@ -173,43 +170,62 @@ def asstime(seconds):
   seconds -= 60*mins
   return u'{h:d}:{m:02d}:{s:02.2f}'.format(h=hrs, m=mins, s=seconds)
 
+# precomputed .ass override tags
+STYLE_TAGS = frozen({
+  'normal' : u'{\\rnormal}',
+  'medium' : u'{\\rmedium}',
+  'small' : u'{\\rsmall}',
+})
+
+BLACK = u'{\\c&H000000&}'
+RED = u'{\\c&H0000ff&}'
+GREEN = u'{\\c&H00ff00&}'
+YELLOW = u'{\\c&H00ffff&}'
+BLUE = u'{\\c&Hff0000&}'
+MAGENTA = u'{\\c&Hff00ff&}'
+CYAN = u'{\\c&Hffff00&}'
+WHITE = u'{\\c&Hffffff&}'
+
+DIALOGUE_PREFIX = u'Dialogue: 0,{start_time},{end_time},normal,,0000,0000,0000,,'
+DIALOGUE_SUFFIX = u'\\N\n'
+
 
 def kanji(formatter, k, timestamp):
   formatter.open_file()
-  formatter._current_lines[-1] += unicode(k)
-  #print unicode(k)
+  formatter._current_lines[-1] += str(k)
+  #print str(k)
 
 def alphanumeric(formatter, a, timestamp):
   formatter.open_file()
-  formatter._current_lines[-1] += unicode(a)
-  #print unicode(a)
+  formatter._current_lines[-1] += str(a)
+  #print str(a)
 
 def hiragana(formatter, h, timestamp):
   formatter.open_file()
-  formatter._current_lines[-1] += unicode(h)
-  #print unicode(h)
+  formatter._current_lines[-1] += str(h)
+  #print str(h)
 
 def katakana(formatter, k, timestamp):
   formatter.open_file()
-  formatter._current_lines[-1] += unicode(k)
-  #print unicode(k)
+  formatter._current_lines[-1] += str(k)
+  #print str(k)
 
 def medium(formatter, k, timestamp):
   formatter.open_file()
-  formatter._current_lines[-1] += u'{\\rmedium}' + formatter._current_color
   formatter._current_style = 'medium'
+  formatter._current_lines[-1] += formatter.style_tag()
   formatter._current_textsize = TextSize.MEDIUM
 
 def normal(formatter, k, timestamp):
   formatter.open_file()
-  formatter._current_lines[-1] += u'{\\rnormal}' + formatter._current_color
   formatter._current_style = 'normal'
+  formatter._current_lines[-1] += formatter.style_tag()
   formatter._current_textsize = TextSize.NORMAL
 
 def small(formatter, k, timestamp):
   formatter.open_file()
-  formatter._current_lines[-1] += u'{\\rsmall}' + formatter._current_color
   formatter._current_style = 'small'
+  formatter._current_lines[-1] += formatter.style_tag()
   formatter._current_textsize = TextSize.SMALL
 
 def space(formatter, k, timestamp):
@@ -219,58 +235,71 @@ def space(formatter, k, timestamp):
 def drcs(formatter, c, timestamp):
   formatter._current_lines[-1] += u'�'
 
-def black(formatter, k, timestamp):
-  formatter.open_file()
+def color(formatter, tag):
   #{\c&H000000&} \c&H<bb><gg><rr>& {\c&Hffffff&}
-  formatter._current_lines[-1] += u'{\c&H000000&}'
-  formatter._current_color = '{\c&H000000&}'
+  formatter.open_file()
+  formatter._current_lines[-1] += tag
+  formatter._current_color = tag
+
+def black(formatter, k, timestamp):
+  color(formatter, BLACK)
 
 def red(formatter, k, timestamp):
-  #{\c&H0000ff&}
-  formatter.open_file()
-  formatter._current_lines[-1] += u'{\c&H0000ff&}'
-  formatter._current_color = '{\c&H0000ff&}'
+  color(formatter, RED)
+
 def green(formatter, k, timestamp):
-  #{\c&H00ff00&}
-  formatter.open_file()
-  formatter._current_lines[-1] += u'{\c&H00ff00&}'
-  formatter._current_color = '{\c&H00ff00&}'
+  color(formatter, GREEN)
 
 def yellow(formatter, k, timestamp):
-  #{\c&H00ffff&}
-  formatter.open_file()
-  formatter._current_lines[-1] += u'{\c&H00ffff&}'
-  formatter._current_color = '{\c&H00ffff&}'
+  color(formatter, YELLOW)
+
 def blue(formatter, k, timestamp):
-  #{\c&Hff0000&}
-  formatter.open_file()
-  formatter._current_lines[-1] += u'{\c&Hff0000&}'
-  formatter._current_color = '{\c&Hff0000&}'
+  color(formatter, BLUE)
+
 def magenta(formatter, k, timestamp):
-  #{\c&Hff00ff&}
-  formatter.open_file()
-  formatter._current_lines[-1] += u'{\c&Hff00ff&}'
-  formatter._current_color = '{\c&Hff00ff&}'
+  color(formatter, MAGENTA)
+
 def cyan(formatter, k, timestamp):
-  #{\c&Hffff00&}
-  formatter.open_file()
-  formatter._current_lines[-1] += u'{\c&Hffff00&}'
-  formatter._current_color = '{\c&Hffff00&}'
+  color(formatter, CYAN)
+
 def white(formatter, k, timestamp):
-  #{\c&Hffffff&}
-  formatter.open_file()
-  formatter._current_lines[-1] += u'{\c&Hffffff&}'
-  formatter._current_color = '{\c&Hffffff&}'
+  color(formatter, WHITE)
 
 def position_set(formatter, p, timestamp):
   '''Active Position set coordinates are given in character row, column
   So we have to calculate pixel coordinates (and then sale them)
   '''
-  pos = formatter._CCArea.RowCol2ScreenPos(p.row, p.col, formatter._current_textsize)
-  line = u'{{\\r{style}}}{color}{{\pos({x},{y})}}'.format(color=formatter._current_color, style=formatter._current_style, x=pos.x, y=pos.y)
-  formatter._current_lines.append(Dialog(line))
-
-a_regex = ur'<CS:"(?P<x>\d{1,4});(?P<y>\d{1,4}) a">'
+  key = (p.row, p.col, formatter._current_textsize)
+  tag = formatter._pos_tags.get(key)
+  if tag is None:
+    pos = formatter._CCArea.RowCol2ScreenPos(p.row, p.col, formatter._current_textsize)
+    tag = u'{{\\pos({x},{y})}}'.format(x=pos.x, y=pos.y)
+    formatter._pos_tags[key] = tag
+  line = Dialog(formatter.style_tag())
+  line += tag
+  formatter._current_lines.append(line)
+
+# CSI active position set: <CS:"x;y a"> with 1 to 4 digit x and y
+CSI_APS_FINAL = (0x20, ord('a'))
+CSI_SEPARATOR = ord(';')
+DIGITS = frozenset(range(ord('0'), ord('9') + 1))
+
+def csi_position_tag(formatter, args):
+  '''Return the cached position tag for the parameters of a CSI sequence
+  or None if it isn't an active position set.
+  '''
+  params = tuple(args[:-2])
+  if params in formatter._csi_tags:
+    return formatter._csi_tags[params]
+  tag = None
+  if tuple(args[-2:]) == CSI_APS_FINAL and CSI_SEPARATOR in params:
+    i = params.index(CSI_SEPARATOR)
+    x = params[:i]
+    y = params[i + 1:]
+    if 0 < len(x) <= 4 and 0 < len(y) <= 4 and DIGITS.issuperset(x) and DIGITS.issuperset(y):
+      tag = u'{{\\pos({x},{y})}}{{\\an1}}'.format(x=u''.join(chr(c) for c in x), y=u''.join(chr(c) for c in y))
+  formatter._csi_tags[params] = tag
+  return tag
 
 def control_character(formatter, csi, timestamp):
   '''This will be the most difficult to format, since the same class here
@@ -278,18 +307,15 @@ def control_character(formatter, csi, timestamp):
   e.g:
   <CS:"7 S"><CS:"170;30 _"><CS:"620;480 V"><CS:"36;36 W"><CS:"4 X"><CS:"24 Y"><Small Text><CS:"170;389 a">
   '''
-  cmd = unicode(csi)
-  a_match = re.search(a_regex, cmd)
-  if a_match:
+  tag = csi_position_tag(formatter, csi._args)
+  if tag:
     # APS Control Sequences (absolute positioning of text as <CS: 170;389 a> above
     # indicate the LOWER LEFT HAND CORNER of text position.
-    x = a_match.group('x')
-    y = a_match.group('y')
-    formatter._current_lines.append( Dialog( u'{{\\r{style}}}{color}{{\\pos({x},{y})}}{{\\an1}}'.format(color=formatter._current_color, style=formatter._current_style, x=x, y=y)))
+    line = Dialog(formatter.style_tag())
+    line += tag
+    formatter._current_lines.append(line)
     return
 
-pos_regex = ur'({\\pos\(\d{1,4},\d{1,4}\)})'
-
 def clear_screen(formatter, cs, timestamp):
 
   if(timestamp - formatter._elapsed_time_s > formatter._tmax):
@@ -299,31 +325,30 @@ def clear_screen(formatter, cs, timestamp):
   start_time = asstime(formatter._elapsed_time_s)
 
   if (len(formatter._current_lines[0]) or len(formatter._current_lines)) and start_time != end_time:
+    prefix = DIALOGUE_PREFIX.format(start_time=start_time, end_time=end_time)
     for l in reversed(formatter._current_lines):
       if not len(l):
         continue
-     
-      line = u'Dialogue: 0,{start_time},{end_time},normal,,0000,0000,0000,,{line}\\N\n'.format(start_time=start_time, end_time=end_time, line=l._s)
+
       #TODO: add option to dump to stdout
-      #print line.encode('utf-8')
       if formatter._ass_file:
-        formatter._ass_file.write(line)
+        formatter._ass_file.write(prefix + str(l) + DIALOGUE_SUFFIX)
       formatter._current_lines = [Dialog(u'')]
 
   formatter._elapsed_time_s = timestamp
   formatter._current_textsize = TextSize.NORMAL
-  formatter._current_color = '{\c&Hffffff&}'
+  formatter._current_color = WHITE
   
 
 class ASSFormatter(object):
-  '''
+  r'''
   Format ARIB objects to dialog of the sort below:
   Dialogue: 0,0:02:24.54,0:02:30.55,small,,0000,0000,0000,,{\pos(500,900)}ゴッド\N
   Dialogue: 0,0:02:24.54,0:02:30.55,small,,0000,0000,0000,,{\pos(780,900)}ほかく\N
   Dialogue: 0,0:02:24.54,0:02:30.55,normal,,0000,0000,0000,,{\pos(420,1020)}ＧＯＤの捕獲を目指す・\N
   '''
 
-  DISPLAYED_CC_STATEMENTS = {
+  DISPLAYED_CC_STATEMENTS = frozen({
     code_set.Kanji : kanji,
     code_set.Alphanumeric : alphanumeric,
     code_set.Hiragana : hiragana,
@@ -363,15 +388,19 @@ class ASSFormatter(object):
     code_set.DRCS14 : drcs,
     code_set.DRCS15 : drcs,
 
-  }
+  })
 
 
-  def __init__(self, default_color='white', tmax=5, width=960, height=540, video_filename='output.ass', verbose=False):
+  def __init__(self, default_color='white', tmax=5, width=960, height=540, video_filename='output.ass', verbose=False,
+    flush_lines=DEFAULT_FLUSH_LINES, atomic=True):
     '''
     :param width: width of target screen in pixels
     :param height: height of target screen in pixels
     :param format_callback: callback method of form <None>callback(string) that
     can be used to dump strings to file upon each subsequent "clear screen" command.
+    :param flush_lines: number of dialog lines buffered before they're written to disk
+    (0 to write only on close).
+    :param atomic: only publish the .ass file under its name once complete (see arib.output)
     '''
     self._color = default_color
     self._tmax = tmax
@@ -380,37 +409,99 @@ class ASSFormatter(object):
     self._elapsed_time_s = 0.0
     self._ass_file = None
     self._current_lines = [Dialog(u'')]
+    # pending lines dropped at MAX_PENDING_LINES or MAX_PENDING_CHARACTERS
+    self.dropped_lines = 0
     self._current_style = 'normal'
-    self._current_color = '{\c&Hffffff&}'
+    self._current_color = WHITE
     self._current_textsize = TextSize.NORMAL
+    # caches of formatted style+color and position tags
+    self._style_tags = {}
+    self._pos_tags = {}
+    self._csi_tags = {}
     self._filename = video_filename
     self._width = width
     self._height = height
     self._height = height
     self._verbose = verbose
+    self._flush_lines = flush_lines
+    self._atomic = atomic
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    if exc_type is None:
+      self.close()
+    else:
+      self.abort()
+    return False
+
+  def style_tag(self):
+    r'''Current style and color override tags, e.g. {\rnormal}{\c&Hffffff&}
+    '''
+    key = (self._current_style, self._current_color)
+    tag = self._style_tags.get(key)
+    if tag is None:
+      tag = STYLE_TAGS[self._current_style] + self._current_color
+      self._style_tags[key] = tag
+    return tag
 
   def open_file(self):
     if not self._ass_file:
       if self._verbose:
         print("Found nonempty ARIB closed caption data in file.")
         print("Writing .ass file: " + self._filename)
-      self._ass_file = ASSFile(self._filename)
+      self._ass_file = ASSFile(self._filename, flush_lines=self._flush_lines, atomic=self._atomic)
 
   def file_written(self):
     return self._ass_file is not None
 
+  def close(self):
+    '''Write out any buffered dialog and move the .ass file into place
+    '''
+    if self._ass_file:
+      self._ass_file.close()
+
+  def abort(self):
+    '''Discard the partially written .ass file
+    '''
+    if self._ass_file:
+      self._ass_file.abort()
+
+  def keep(self):
+    '''Leave the partially written .ass file to be resumed from a checkpoint
+    '''
+    if self._ass_file:
+      self._ass_file.keep()
+
+  def rename(self, filename):
+    '''Write to another .ass file, e.g. once the caption language is known
+    '''
+    self._filename = filename
+    if self._ass_file:
+      self._ass_file.rename(filename)
+
   def format(self, captions, timestamp):
     '''Format ARIB closed caption info tinto text for an .ASS file
     '''
     #TODO: Show progress in some way
     #print('File elapsed time seconds: {s}'.format(s=timestamp))
-    #line = u'{t}: {l}\n'.format(t=timestamp, l=u''.join([unicode(s) for s in captions if type(s) in ASSFormatter.DISPLAYED_CC_STATEMENTS]))
+    #line = u'{t}: {l}\n'.format(t=timestamp, l=u''.join([str(s) for s in captions if type(s) in ASSFormatter.DISPLAYED_CC_STATEMENTS]))
 
+    handlers = ASSFormatter.DISPLAYED_CC_STATEMENTS
     for c in captions:
-      if type(c) in ASSFormatter.DISPLAYED_CC_STATEMENTS:
+      handler = handlers.get(type(c))
+      if handler:
         #invoke the handler for this object type
-        ASSFormatter.DISPLAYED_CC_STATEMENTS[type(c)](self, c, timestamp)
+        handler(self, c, timestamp)
       else:
         #TODO: Warning of unhandled characters
         pass
         #print str(type(c))
+
+    if len(self._current_lines) > MAX_PENDING_LINES:
+      self.dropped_lines += len(self._current_lines) - MAX_PENDING_LINES
+      del self._current_lines[:-MAX_PENDING_LINES]
+    if len(self._current_lines[-1]) > MAX_PENDING_CHARACTERS:
+      self.dropped_lines += 1
+      self._current_lines[-1] = Dialog(self.style_tag())
@@ -144,19 +144,19 @@ def asstime(seconds):
 def kanji(formatter, k, timestamp):
   #ignore all 'small' styled characters as they're prob furigana
   if formatter._current_style != 'small':
-    formatter._current_lines[-1] += unicode(k)
+    formatter._current_lines[-1] += str(k)
 
 def alphanumeric(formatter, a, timestamp):
   if formatter._current_style != 'small':
-    formatter._current_lines[-1] += unicode(a)
+    formatter._current_lines[-1] += str(a)
 
 def hiragana(formatter, h, timestamp):
   if formatter._current_style != 'small':
-    formatter._current_lines[-1] += unicode(h)
+    formatter._current_lines[-1] += str(h)
 
 def katakana(formatter, k, timestamp):
   if formatter._current_style != 'small':
-    formatter._current_lines[-1] += unicode(k)
+    formatter._current_lines[-1] += str(k)
 
 def medium(formatter, k, timestamp):
   #formatter._current_lines[-1] += u'{\\rmedium}' + formatter._current_color
@@ -174,42 +174,42 @@ def space(formatter, k, timestamp):
   formatter._current_lines[-1] += u' '
 
 def drcs(formatter, c, timestamp):
-  formatter._current_lines[-1] += unicode(c)
+  formatter._current_lines[-1] += str(c)
 
 def black(formatter, k, timestamp):
   #{\c&H000000&} \c&H<bb><gg><rr>& {\c&Hffffff&}
-  formatter._current_lines[-1] += u'{\c&H000000&}'
-  formatter._current_color = '{\c&H000000&}'
+  formatter._current_lines[-1] += u'{\\c&H000000&}'
+  formatter._current_color = '{\\c&H000000&}'
 
 def red(formatter, k, timestamp):
   #{\c&H0000ff&}
-  formatter._current_lines[-1] += u'{\c&H0000ff&}'
-  formatter._current_color = '{\c&H0000ff&}'
+  formatter._current_lines[-1] += u'{\\c&H0000ff&}'
+  formatter._current_color = '{\\c&H0000ff&}'
 def green(formatter, k, timestamp):
   #{\c&H00ff00&}
-  formatter._current_lines[-1] += u'{\c&H00ff00&}'
-  formatter._current_color = '{\c&H00ff00&}'
+  formatter._current_lines[-1] += u'{\\c&H00ff00&}'
+  formatter._current_color = '{\\c&H00ff00&}'
 
 def yellow(formatter, k, timestamp):
   #{\c&H00ffff&}
-  formatter._current_lines[-1] += u'{\c&H00ffff&}'
-  formatter._current_color = '{\c&H00ffff&}'
+  formatter._current_lines[-1] += u'{\\c&H00ffff&}'
+  formatter._current_color = '{\\c&H00ffff&}'
 def blue(formatter, k, timestamp):
   #{\c&Hff0000&}
-  formatter._current_lines[-1] += u'{\c&Hff0000&}'
-  formatter._current_color = '{\c&Hff0000&}'
+  formatter._current_lines[-1] += u'{\\c&Hff0000&}'
+  formatter._current_color = '{\\c&Hff0000&}'
 def magenta(formatter, k, timestamp):
   #{\c&Hff00ff&}
-  formatter._current_lines[-1] += u'{\c&Hff00ff&}'
-  formatter._current_color = '{\c&Hff00ff&}'
+  formatter._current_lines[-1] += u'{\\c&Hff00ff&}'
+  formatter._current_color = '{\\c&Hff00ff&}'
 def cyan(formatter, k, timestamp):
   #{\c&Hffff00&}
-  formatter._current_lines[-1] += u'{\c&Hffff00&}'
-  formatter._current_color = '{\c&Hffff00&}'
+  formatter._current_lines[-1] += u'{\\c&Hffff00&}'
+  formatter._current_color = '{\\c&Hffff00&}'
 def white(formatter, k, timestamp):
   #{\c&Hffffff&}
-  formatter._current_lines[-1] += u'{\c&Hffffff&}'
-  formatter._current_color = '{\c&Hffffff&}'
+  formatter._current_lines[-1] += u'{\\c&Hffffff&}'
+  formatter._current_color = '{\\c&Hffffff&}'
 
 def position_set(formatter, p, timestamp):
   '''Active Position set coordinates are given in character row, colum
@@ -217,10 +217,10 @@ def position_set(formatter, p, timestamp):
   '''
   pos = formatter._CCArea.RowCol2ScreenPos(p.row, p.col)
   #line = u'{{\\r{style}}}{color}{{\pos({x},{y})}}'.format(color=formatter._current_color, style=formatter._current_style, x=pos.x, y=pos.y)
-  line = u'{{\\r{style}}}{color}{{\pos({x},{y})}}'.format(color=formatter._current_color, style=formatter._current_style, x=pos.x, y=pos.y)
+  line = u'{{\\r{style}}}{color}{{\\pos({x},{y})}}'.format(color=formatter._current_color, style=formatter._current_style, x=pos.x, y=pos.y)
   #formatter._current_lines.append(line)
 
-a_regex = ur'<CS:"(?P<x>\d{1,4});(?P<y>\d{1,4}) a">'
+a_regex = r'<CS:"(?P<x>\d{1,4});(?P<y>\d{1,4}) a">'
 
 def control_character(formatter, csi, timestamp):
   '''This will be the most difficult to format, since the same class here
@@ -228,7 +228,7 @@ def control_character(formatter, csi, timestamp):
   e.g:
   <CS:"7 S"><CS:"170;30 _"><CS:"620;480 V"><CS:"36;36 W"><CS:"4 X"><CS:"24 Y"><Small Text><CS:"170;389 a">
   '''
-  cmd = unicode(csi)
+  cmd = str(csi)
   a_match = re.search(a_regex, cmd)
   if a_match:
     x = a_match.group('x')
@@ -236,7 +236,7 @@ def control_character(formatter, csi, timestamp):
     #formatter._current_lines.append(u'{{\\r{style}}}{color}{{\pos({x},{y})}}'.format(color=formatter._current_color, style=formatter._current_style, x=x, y=y))
     return
 
-pos_regex = ur'({\\pos\(\d{1,4},\d{1,4}\)})'
+pos_regex = r'({\\pos\(\d{1,4},\d{1,4}\)})'
 
 def clear_screen(formatter, cs, timestamp):
 
@@ -248,7 +248,7 @@ def clear_screen(formatter, cs, timestamp):
       if not len(l):
         continue
       eng = translate(l, client_id=CLIENT_ID, secret_key=SECRET_KEY)
-      print eng
+      print(eng)
       line = u'Dialogue: 0,{start_time},{end_time},normal,,0000,0000,0000,,{line}\\N\n'.format(start_time=start_time, end_time=end_time, line=eng)
       #TODO: add option to dump to stdout
       #print line.encode('utf-8')
@@ -259,7 +259,7 @@ def clear_screen(formatter, cs, timestamp):
   
 
 class ASSFormatter(object):
-  '''
+  r'''
   Format ARIB objects to dialog of the sort below:
   Dialogue: 0,0:02:24.54,0:02:30.55,small,,0000,0000,0000,,{\pos(500,900)}ゴッド\N
   Dialogue: 0,0:02:24.54,0:02:30.55,small,,0000,0000,0000,,{\pos(780,900)}ほかく\N
@@ -325,14 +325,14 @@ class ASSFormatter(object):
     self._ass_file.write_styles()
     self._current_lines = [u'']
     self._current_style = 'normal'
-    self._current_color = '{\c&Hffffff&}'
+    self._current_color = '{\\c&Hffffff&}'
 
   def format(self, captions, timestamp):
     '''Format ARIB closed caption info tinto text for an .ASS file
     '''
     #TODO: Show progress in some way
     #print('File elapsed time seconds: {s}'.format(s=timestamp))
-    #line = u'{t}: {l}\n'.format(t=timestamp, l=u''.join([unicode(s) for s in captions if type(s) in ASSFormatter.DISPLAYED_CC_STATEMENTS]))
+    #line = u'{t}: {l}\n'.format(t=timestamp, l=u''.join([str(s) for s in captions if type(s) in ASSFormatter.DISPLAYED_CC_STATEMENTS]))
     
     for c in captions:
       if type(c) in ASSFormatter.DISPLAYED_CC_STATEMENTS:
@@ -354,7 +354,7 @@ def main():
   pid = args.pid
   infilename = args.infile
   if not os.path.exists(infilename):
-    print 'Please provide input Transport Stream file.'
+    print('Please provide input Transport Stream file.')
     os.exit(-1)
 
   #open an Ass file and formatter
@@ -13,29 +13,30 @@ after http://stackoverflow.com/questions/12017846/microsoft-translator-api-in-py
 '''
 import argparse
 import json
-import requests
-import urllib
+import urllib.parse
 
 def translate(text, from_language=u'ja', to_language=u'en', client_id=u'', secret_key=u''):
   if not secret_key:
     raise Exception(u'No Microsoft Azure secret key provided on bing.translate call.')
+  # requests is only needed (and only has to be installed) when translating
+  import requests
 
   args = {
-          'client_id': client_id.encode('utf8'),
-          'client_secret': secret_key.encode('utf-8'),#your azure secret here
+          'client_id': client_id,
+          'client_secret': secret_key,#your azure secret here
           'scope': 'http://api.microsofttranslator.com',
           'grant_type': 'client_credentials'
       }
   oauth_url = u'https://datamarket.accesscontrol.windows.net/v2/OAuth2-13'
-  oauth_junk = json.loads(requests.post(oauth_url,data=urllib.urlencode(args)).content)
+  oauth_junk = json.loads(requests.post(oauth_url,data=urllib.parse.urlencode(args)).content)
   translation_args = {
-          'text': text.encode('utf-8'),
-          'to': to_language.encode('utf-8'),
-          'from': from_language.encode('utf-8'),
+          'text': text,
+          'to': to_language,
+          'from': from_language,
           }
   headers={'Authorization': 'Bearer '+oauth_junk['access_token']}
   translation_url = 'http://api.microsofttranslator.com/V2/Ajax.svc/Translate?'
-  translation_result = requests.get(translation_url+urllib.urlencode(translation_args),headers=headers)
+  translation_result = requests.get(translation_url+urllib.parse.urlencode(translation_args),headers=headers)
   return translation_result.content.decode('utf-8')
 
 def main():
@@ -0,0 +1,88 @@
+# vim: set ts=2 expandtab:
+'''
+Module: checkpoint.py
+Desc: Sidecar checkpoints to resume an interrupted extraction from
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+An extraction of a long recording can save checkpoints as it goes. Every
+so many bytes of input, between two TS packets, everything needed to carry
+on from there is pickled into a sidecar file next to the output:
+
+  offset      file offset of the next TS packet
+  ts          partially assembled PES and the timelines (TS.checkpoint)
+  psi, guide  program maps and programme guide seen so far
+  extraction  caption PIDs and languages found, and the formatters with
+              their pending lines and the length of their '.part' files
+
+Resuming restores all of this, truncates each '.part' file to its saved
+length and reads on from the offset, so the output is the same as that of
+an uninterrupted run. The caption decoder starts afresh with each statement
+(its code set designations are reset), so it has no state to save.
+
+The version and the options of the conversion are pickled ahead of the
+state, so a checkpoint that can't be resumed is refused without restoring
+(and then throwing away) the formatters, which would remove their '.part'
+files.
+
+Checkpoints are pickles, so only resume from ones written by this same
+version of the package, and never from untrusted files.
+
+'''
+import os
+import pickle
+
+from arib.arib_exceptions import CheckpointError
+from arib.output import TEMP_SUFFIX
+
+CHECKPOINT_SUFFIX = '.checkpoint'
+
+# MB of input between checkpoints
+DEFAULT_CHECKPOINT_INTERVAL_MB = 64
+
+# bumped whenever what's saved changes
+VERSION = 6
+
+
+def checkpoint_filename(outfilename):
+  return outfilename + CHECKPOINT_SUFFIX
+
+
+def save(filename, state, options=None):
+  '''Replace the checkpoint with a new one, atomically. Pickling the formatters
+  syncs their output to disk first (see arib.output.BufferedFile).
+  :param options: options of the conversion, which a resume must match
+  '''
+  path = filename + TEMP_SUFFIX
+  with open(path, 'wb') as f:
+    pickle.dump((VERSION, options), f, pickle.HIGHEST_PROTOCOL)
+    pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+    f.flush()
+    os.fsync(f.fileno())
+  os.replace(path, filename)
+
+
+def load(filename, options=None):
+  '''State saved in a checkpoint, or None if there is none
+  :param options: options of this conversion, if they must match those saved
+  '''
+  if not os.path.exists(filename):
+    return None
+  try:
+    with open(filename, 'rb') as f:
+      version, saved_options = pickle.load(f)
+      if version != VERSION:
+        raise CheckpointError(repr(filename) + " was written by another version")
+      if options is not None and saved_options != options:
+        raise CheckpointError(repr(filename) + " was saved by a different conversion")
+      return pickle.load(f)
+  except (pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError) as ex:
+    raise CheckpointError("Could not read " + repr(filename) + ": " + str(ex))
+
+
+def remove(filename):
+  '''Remove a checkpoint once it's no longer needed
+  '''
+  if os.path.exists(filename):
+    os.remove(filename)
@@ -12,23 +12,95 @@ an ARIB data group
 
 '''
 
-import read
-from decoder import Decoder
-import code_set
+import struct
+from collections import namedtuple
+
+import arib.read as read
+from arib.decoder import Decoder
+from arib.decoder import statement_text
+import arib.code_set as code_set
+from arib.frozen import frozen
 DEBUG = False
-DRCS_DEBUG = False
+
+# in order to provide SOME kind of info when we encounter a DRCS, i have
+# a small hash table mapping to known (encountered) values.
+# There seems to be at least two new DRCS characters in every .ts file I
+# examine, so this is very limited.
+CHARACTER_HASHES = frozen({
+  -3174437220813644284 : u'♬',
+  3626218632846089044 : u'[ｽﾋﾟｰｶｰ]', #u"\U0001F50A", # unicode 'speaker with 3 sound U+1f50A
+  -7036522249175460012 : u'[ｽﾋﾟｰｶｰ]', #u"\U0001F508", # unicode "SPEAKER U+1F508
+  7569189553178784666 : u'[ﾊﾟｿｺﾝ]', #u"\U0001F4BB", #unicode personal computer U+1F4BB
+  -7054764751876937278 : u'[ﾃﾚﾋﾞ]', #u"\U0001F4FA", # unicode TV U+1f4fa
+  7675785349947576464 : u'[携帯]', #u"\U0001F4F1", # unicode cellphone U+1F4F1
+  -8588766517861681222 : u'｟',
+  -137322149189423910 : u'｠',
+  -8884896295922033014 : u'⟪',
+  -5876459750587952470 : u'⟫',
+  2149867084803144864 : u'[ﾃﾚﾋﾞ]', #u"\U0001F4FA", # unicode TV U+1f4fa
+  -6623079553638809300: u'[ﾏｲｸ]',
+  -3827305093498498888 : u'𝔹', # custom Conan 'meitantei badge". yes. really.
+  -775118510460996568 : u'｟',
+  -4397084408988046416 : u'｠',
+  -6328951014288157962 : u'[ﾊﾟｿｺﾝ]',
+  1113567731799993878 : u'①',
+  6707059547002745896 : u'[ﾗｼﾞｵ]',
+  6692026985814559272 : u'[携帯]',
+  })
+
+
+def pattern_hash(pixels):
+  '''Hash of a DRCS pattern, which CHARACTER_HASHES is keyed by.
+  This is the hash Python 2 gave str(pixels) on 64 bit systems. It is
+  computed here rather than with hash(), as Python 3 randomizes string
+  hashes between runs.
+  :param pixels: list of pattern data byte values
+  '''
+  s = str(pixels).encode('ascii')
+  x = s[0] << 7
+  for c in s:
+    x = ((1000003 * x) ^ c) & 0xffffffffffffffff
+  x ^= len(s)
+  if x >= 1 << 63:
+    x -= 1 << 64
+  if x == -1:
+    x = -2
+  return x
+
+
+class Context(namedtuple('Context', ['drcs_debug', 'character_hashes', 'text_only'])):
+  '''Settings for decoding caption data, passed down to everything decoded
+  from a data group instead of being kept in module globals, so that
+  decoders with different settings can run side by side on any thread.
+  Contexts are immutable. Derive a changed one with _replace().
+  :param drcs_debug: print every DRCS character pattern received
+  :param character_hashes: read only mapping of DRCS pattern hash to the
+    text it stands for
+  :param text_only: decode statement bodies as StatementText, their text
+    alone, rather than StatementBody. Much faster where nothing else is needed.
+  '''
+  __slots__ = ()
+
+  def __new__(cls, drcs_debug=False, character_hashes=CHARACTER_HASHES, text_only=False):
+    return super(Context, cls).__new__(cls, drcs_debug, character_hashes, text_only)
+
+DEFAULT_CONTEXT = Context()
 
 def set_DRCS_debug(v):
-  global DRCS_DEBUG
-  DRCS_DEBUG = v
+  '''Removed: DRCS debugging is a setting of the decoding Context, not of
+  the module. Kept so that old callers fail saying what to use instead.
+  '''
+  raise NotImplementedError('set_DRCS_debug() was removed. Decode with '
+    'Context(drcs_debug=True) (see arib.closed_caption.Context) instead.')
 
 class CaptionStatementData(object):
   '''Represents a closed caption text wrapper
   Detailed in table 9-10 in ARIB STD b-24 PG 176
   '''
-  def __init__(self, f):
+  def __init__(self, f, context=DEFAULT_CONTEXT):
     '''
     :param bytes: array of bytes payload
+    :param context: Context the data units are decoded with
     '''
     self._TMD = read.ucb(f)>>6
     if self._TMD == 0x1 or self._TMD == 0x2:
@@ -39,17 +111,17 @@ class CaptionStatementData(object):
       self.STM = d >> 28
       self._data_unit_loop_length = d & 0xffffffff
       if DEBUG:
-        print 'CaptionStatementData: STM (time) ' + str(self.STM)
-        print 'CaptionStatementData: data unit loop length: ' + str(self._data_unit_loop_length)
+        print('CaptionStatementData: STM (time) ' + str(self.STM))
+        print('CaptionStatementData: data unit loop length: ' + str(self._data_unit_loop_length))
     else:
       self.STM = 0
       self._data_unit_loop_length = read.ui3b(f)
     if DEBUG:
-      print 'Caption statement: data unit loop length: ' + str(self._data_unit_loop_length)
+      print('Caption statement: data unit loop length: ' + str(self._data_unit_loop_length))
     bytes_read = 0
     self._data_units = []
     while bytes_read < self._data_unit_loop_length:
-      self._data_units.append(DataUnit(f))
+      self._data_units.append(DataUnit(f, context))
       bytes_read += self._data_units[-1].size()
 
   def load_caption_statement_data(self, data):
@@ -70,9 +142,9 @@ class StatementBody(object):
   def __init__(self, f, data_unit):
     self._unit_separator = data_unit._unit_separator
     self._data_unit_type = data_unit._data_unit_type
-    if self._data_unit_type is not 0x20:
+    if self._data_unit_type != 0x20:
       if DEBUG:
-        print 'this is not caption data'
+        print('this is not caption data')
       raise ValueError
     self._data_unit_size = data_unit._data_unit_size
     #self._payload = f.read(self._data_unit_size)
@@ -93,7 +165,7 @@ class StatementBody(object):
     Return a list of statements and characters
     '''
     if DEBUG:
-      print 'going to read {bytes} bytes in binary file caption statement.'.format(bytes=bytes_to_read)
+      print('going to read {bytes} bytes in binary file caption statement.'.format(bytes=bytes_to_read))
     statements = []
     bytes_read = 0
     #TODO: Check to see if decoder state is carred between packet processing
@@ -115,93 +187,141 @@ class StatementBody(object):
     #  print '{l}\n'.format(l=line)
     return statements
 
+
+class StatementText(object):
+  '''Statement body (caption text) in Data Unit, decoded to its text alone
+  by arib.decoder.statement_text. Used instead of StatementBody when the
+  Context is text_only.
+  '''
+  ID = 0x20
+  def __init__(self, f, data_unit):
+    self._unit_separator = data_unit._unit_separator
+    self._data_unit_type = data_unit._data_unit_type
+    if self._data_unit_type != StatementText.ID:
+      raise ValueError
+    self._data_unit_size = data_unit._data_unit_size
+    self._payload = statement_text(f, self._data_unit_size)
+
+  def payload(self):
+    '''unicode text, lines separated by newlines
+    '''
+    return self._payload
+
+  @staticmethod
+  def Type():
+    return StatementText.ID
+
 class DRCSFont(object):
   """ A single character in DRCS
   Called a 'font' to agree with Table D-1 in ARIB b-24 spec page 141
   """
-  # in order to provide SOME kind of info when we encounter a DRCS, i have
-  # a small hash table mapping to known (encountered) values.
-  # There seems to be at least two new DRCS characters in every .ts file I
-  # examine, so this is very limited.
-  character_hashes = {
-    -3174437220813644284 : u'♬',
-    3626218632846089044 : u'[ｽﾋﾟｰｶｰ]', #u"\U0001F50A", # unicode 'speaker with 3 sound U+1f50A
-    -7036522249175460012 : u'[ｽﾋﾟｰｶｰ]', #u"\U0001F508", # unicode "SPEAKER U+1F508
-    7569189553178784666 : u'[ﾊﾟｿｺﾝ]', #u"\U0001F4BB", #unicode personal computer U+1F4BB
-    -7054764751876937278 : u'[ﾃﾚﾋﾞ]', #u"\U0001F4FA", # unicode TV U+1f4fa
-    7675785349947576464 : u'[携帯]', #u"\U0001F4F1", # unicode cellphone U+1F4F1
-    -8588766517861681222 : u'｟',
-    -137322149189423910 : u'｠',
-    -8884896295922033014 : u'⟪',
-    -5876459750587952470 : u'⟫',
-    2149867084803144864 : u'[ﾃﾚﾋﾞ]', #u"\U0001F4FA", # unicode TV U+1f4fa
-    -6623079553638809300: u'[ﾏｲｸ]',
-    -3827305093498498888 : u'𝔹', # custom Conan 'meitantei badge". yes. really.
-    -775118510460996568 : u'｟',
-    -4397084408988046416 : u'｠',
-    -6328951014288157962 : u'[ﾊﾟｿｺﾝ]',
-    1113567731799993878 : u'①',
-    6707059547002745896 : u'[ﾗｼﾞｵ]',
-    6692026985814559272 : u'[携帯]',
-    }
+  # shared and read only. see Context for using a different table
+  character_hashes = CHARACTER_HASHES
 
   # first is  combiled font id + font number four bits each
-  def __init__(self, f):
+  def __init__(self, f, context=DEFAULT_CONTEXT):
     b = read.ucb(f)
-    self._font_id = (b & 0xf0) >> 8
+    self._font_id = (b & 0xf0) >> 4
     self._mode = (b & 0x0f)
     if self._mode == 0 or self._mode == 0x1:
       self._depth = read.ucb(f)
       self._width = read.ucb(f)
       self._height = read.ucb(f)
-      self._pixels = []
+      # pattern data is packed at bits_per_pixel() bits per pixel, which
+      # is derived from depth (typical depth = 2, i.e. 4 pixels per byte)
+      self._pixels = list(read.buffer(f, self.pattern_size()))
 
-      # assuming 4 pixels per byte. How is this tied to depth above? (typical depth = 2)
-      for i in range((self._width * self._height)/4):
-        self._pixels.append(read.ucb(f))
+      self._hash = pattern_hash(self._pixels)
 
-      tmp_str = str(self._pixels)
-      self._hash = hash(tmp_str)
-
-      if DRCS_DEBUG:
+      if context.drcs_debug:
         print("DRCS character font id: {id}".format(id=self._font_id))
         print("DRCS character hash: {h}".format(h=self._hash))
 
-      if self._hash in DRCSFont.character_hashes:
-        self._character = DRCSFont.character_hashes[self._hash]
-      else:
-        self._character = u'�'
+      self._character = context.character_hashes.get(self._hash, u'�')
 
     else:
         raise ValueError("DRCSFont mode not supported.")
-    if DRCS_DEBUG:
+    if context.drcs_debug:
       print("DRCS character: font: {font}".format(font=self._font_id))
-      px = ''
-      i = 0
-      for h in range(self._height/2):
-        for w in range(self._width/4):
-          #px += str(self._pixels[i]) + " "
-          p = self._pixels[h * self._width/2 + w]
-          if p == 0:
-            px += " "
-          elif p == 0xff:
-            px += "█"
-          elif p == 0x0f:
-            px += "▐"
-          elif p == 0xf0:
-            px += "▌"
-          else:
-            px += "╳"
-          i = i + 1
-        px += '\n'
-      print(px)
+      print(self.dump())
+
+  def levels(self):
+    """ Number of gradation levels in this pattern
+    ARIB b-24 encodes depth as the number of gradations minus 2.
+    """
+    return self._depth + 2
+
+  def bits_per_pixel(self):
+    bpp = 1
+    while (1 << bpp) < self.levels():
+      bpp += 1
+    return bpp
+
+  def pattern_size(self):
+    """ Size in bytes of the packed pattern data for this font
+    """
+    return (self._width * self._height * self.bits_per_pixel() + 7) // 8
+
+  def digest(self):
+    """ Content digest of this font, stable across runs and interpreters
+    Unlike _hash, this takes the pattern dimensions and depth into account.
+    """
+    import hashlib
+    h = hashlib.sha1()
+    h.update(struct.pack('BBB', self._depth, self._width, self._height))
+    h.update(bytes(self._pixels))
+    return h.hexdigest()
+
+  def bitmap(self):
+    """ Unpack pattern data into a list of rows of gradation values
+    Each value is in range 0 to levels() - 1.
+    """
+    bpp = self.bits_per_pixel()
+    rows = []
+    bit = 0
+    for y in range(self._height):
+      row = []
+      for x in range(self._width):
+        # pixels are packed msb first and may straddle byte boundaries
+        v = 0
+        for i in range(bpp):
+          v = (v << 1) | ((self._pixels[bit >> 3] >> (7 - (bit & 0x7))) & 0x1)
+          bit += 1
+        row.append(v)
+      rows.append(row)
+    return rows
+
+  def dump(self):
+    """ Render the pattern as text for debugging
+    Each output character covers four pixels of every other pixel row.
+    """
+    full = self.levels() - 1
+    bitmap = self.bitmap()
+    px = ''
+    for h in range(self._height//2):
+      for w in range(self._width//4):
+        p = bitmap[h * 2][w * 4:w * 4 + 4]
+        left = p[0] == full and p[1] == full
+        right = p[2] == full and p[3] == full
+        if not any(p):
+          px += " "
+        elif left and right:
+          px += "█"
+        elif right and not p[0] and not p[1]:
+          px += "▐"
+        elif left and not p[2] and not p[3]:
+          px += "▌"
+        else:
+          px += "╳"
+      px += '\n'
+    return px
 
 
 
 class DRCSCharacter(object):
   """ DRCS character parsed by DRCS2ByteCharacter class
   """
-  def __init__(self, f):
+  def __init__(self, f, context=DEFAULT_CONTEXT):
     """
     :param f: file descriptor we're reading from
     """
@@ -209,51 +329,82 @@ class DRCSCharacter(object):
     self._number_of_font = read.ucb(f)
     self._fonts = []
     for i in range(self._number_of_font):
-      self._fonts.append(DRCSFont(f))
+      self._fonts.append(DRCSFont(f, context))
+
+  def character_code(self):
+    return self._character_code
+
+  def fonts(self):
+    return self._fonts
 
 class DRCS1ByteCharacter(object):
   """ DRCS data structure
   Describes custom character data delivered at runtime in the TS stream
   """
   ID = 0x30
-  def __init__(self, f, data_unit):
+  def __init__(self, f, data_unit, context=DEFAULT_CONTEXT):
     self._unit_separator = data_unit._unit_separator
     self._data_unit_type = data_unit._data_unit_type
     if self._data_unit_type is not DRCS1ByteCharacter.ID:
       if DEBUG:
-        print 'this is not a DRCS character'
+        print('this is not a DRCS character')
       raise ValueError
     self._data_unit_size = data_unit._data_unit_size
     self._characters = []
     self._number_of_code = read.ucb(f)
     for i in range(self._number_of_code):
-      self._characters.append(DRCSCharacter(f))
+      self._characters.append(DRCSCharacter(f, context))
 
   def payload(self):
-    return self._payload
+    return self._characters
 
   @staticmethod
   def Type():
     return DRCS1ByteCharacter.ID
 
+class DRCS2ByteCharacter(object):
+  """ DRCS data structure for the 2 byte DRCS (DRCS-0) code set
+  Same layout as DRCS1ByteCharacter, only the data unit type differs.
+  """
+  ID = 0x31
+  def __init__(self, f, data_unit, context=DEFAULT_CONTEXT):
+    self._unit_separator = data_unit._unit_separator
+    self._data_unit_type = data_unit._data_unit_type
+    if self._data_unit_type is not DRCS2ByteCharacter.ID:
+      if DEBUG:
+        print('this is not a DRCS character')
+      raise ValueError
+    self._data_unit_size = data_unit._data_unit_size
+    self._characters = []
+    self._number_of_code = read.ucb(f)
+    for i in range(self._number_of_code):
+      self._characters.append(DRCSCharacter(f, context))
+
+  def payload(self):
+    return self._characters
+
+  @staticmethod
+  def Type():
+    return DRCS2ByteCharacter.ID
+
 
 class DataUnit(object):
   '''Data Unit structure as defined in ARIB B-24 Table 9-12 pg 157
   '''
-  def __init__(self, f):
+  def __init__(self, f, context=DEFAULT_CONTEXT):
     self._unit_separator = read.ucb(f)
-    if(self._unit_separator is not 0x1f):
+    if(self._unit_separator != 0x1f):
       if DEBUG:
-        print 'Unit separator not found at start of data unit.'
+        print('Unit separator not found at start of data unit.')
       raise ValueError
     self._data_unit_type = read.ucb(f)
     if DEBUG:
-      print 'data unit type: ' + str(self._data_unit_type)
+      print('data unit type: ' + str(self._data_unit_type))
     self._data_unit_size = read.ui3b(f)
     if DEBUG:
-      print 'DataUnit size found to be: ' + str(self._data_unit_size)
+      print('DataUnit size found to be: ' + str(self._data_unit_size))
     #self._payload = f.read(self._data_unit_size)
-    self._payload = self.load_unit(f)
+    self._payload = self.load_unit(f, context)
 
   def payload(self):
     return self._payload
@@ -263,12 +414,16 @@ class DataUnit(object):
     '''
     return self._data_unit_size + 5
 
-  def load_unit(self, f):
+  def load_unit(self, f, context=DEFAULT_CONTEXT):
     if self._data_unit_type == StatementBody.ID:
+      if context.text_only:
+        return StatementText(f, self)
       return StatementBody(f, self)
     elif self._data_unit_type == DRCS1ByteCharacter.ID:
       # DRCS character data unit
-      return DRCS1ByteCharacter(f, self)
+      return DRCS1ByteCharacter(f, self, context)
+    elif self._data_unit_type == DRCS2ByteCharacter.ID:
+      return DRCS2ByteCharacter(f, self, context)
     else:
       read.buffer(f, self._data_unit_size)
 
@@ -279,7 +434,7 @@ class Language(object):
     self._language_tag = d >> 5
     if DEBUG:
       print("caption management language tag: " + str(self._language_tag))
-    self._DMF = d & 0x7
+    self._DMF = d & 0xf
     if self._DMF == 0b1100 or self._DMF == 0b1101 or self._DMF == 0b1110:
       self._DC = read.ucb(f)
     else:
@@ -289,9 +444,9 @@ class Language(object):
       print("caption managment DC: " + str(self._DC))
 
     self._language_code = ''
-    self._language_code += str(unichr(read.ucb(f)))
-    self._language_code += str(unichr(read.ucb(f)))
-    self._language_code += str(unichr(read.ucb(f)))
+    self._language_code += chr(read.ucb(f))
+    self._language_code += chr(read.ucb(f))
+    self._language_code += chr(read.ucb(f))
     if DEBUG:
       print("caption managment language code: " + str(self._language_code))
     
@@ -368,8 +523,13 @@ class CaptionManagementData(object):
 
   def language_code(self, language):
     return self._languages[language]._language_code
+
+  def language_number(self, language):
+    '''Caption language number (1 to 8) of the data groups carrying a language
+    '''
+    return self._languages[language]._language_tag + 1
  
-  def __init__(self, f):
+  def __init__(self, f, context=DEFAULT_CONTEXT):
     """
     """
     self.TMD = read.ucb(f) >> 6
@@ -378,7 +538,7 @@ class CaptionManagementData(object):
       _ub = read.uic(f) >> 4
       self._OTM = _t | (_ub << 32)
       if DEBUG:
-        print "Caption management OTM: " + str(self._OTM)
+        print("Caption management OTM: " + str(self._OTM))
 
     self._num_languages = read.ucb(f)
     self._languages = []
@@ -387,10 +547,10 @@ class CaptionManagementData(object):
 
     self._data_unit_loop_length = read.ui3b(f)
     if DEBUG:
-      print 'Caption managmentdata : data unit loop length: ' + str(self._data_unit_loop_length)
+      print('Caption managmentdata : data unit loop length: ' + str(self._data_unit_loop_length))
     bytes_read = 0
     self._data_units = []
     while bytes_read < self._data_unit_loop_length:
-      self._data_units.append(DataUnit(f))
+      self._data_units.append(DataUnit(f, context))
       bytes_read += self._data_units[-1].size()
 
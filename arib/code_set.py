@@ -11,8 +11,10 @@ handling for code sets in japanese closed captions
 
 '''
 
-from arib_exceptions import UnimplimentedError
-import read
+from arib.arib_exceptions import UnimplimentedError
+import arib.read as read
+from arib.frozen import frozen
+from arib.frozen import deferred
 
 DEBUG = False
 
@@ -20,7 +22,7 @@ class Gaiji(object):
   #after ARIB std docs pg 54 onwards
   # note that columns and rows are swapped in this table to
   # facilitate reading
-  ENCODING = {
+  ENCODING = deferred(lambda: {
     1  : { 90 : u'⛌', 91 : u'⛣', 92 : u'➡', 93 : u'㈪', 94 : u'Ⅰ',},
     2  : { 90 : u'⛍', 91 : u'⭖', 92 : u'⬅', 93 : u'㈫', 94 : u'Ⅱ',},
     3  : { 90 : u'❗', 91 : u'⭗', 92 : u'⬆', 93 : u'㈬', 94 : u'Ⅲ',},
@@ -115,7 +117,7 @@ class Gaiji(object):
     92  : { 90 : u'◻', 91 : u'◻', 92 : u'◻', 93 : u'◻', 94 : u'⓬',},
     93  : { 90 : u'◻', 91 : u'◻', 92 : u'◻', 93 : u'◻', 94 : u'㉛',},
     94  : { 90 : u'◻', 91 : u'◻', 92 : u'◻', 93 : u'◻', 94 : u'◻',},
-    }
+    })
 
   @staticmethod
   def is_gaiji(v):
@@ -131,7 +133,7 @@ class Gaiji(object):
     row = (v[0] & 0x007f) - 0x20
     col = (v[1] & 0x007f) - 0x20
     if DEBUG:
-      print 'gaiji [{b1}],[{b2}]-->{r},{c},'.format(b1=hex(v[0]), b2=hex(v[1]),r=row, c=col)
+      print('gaiji [{b1}],[{b2}]-->{r},{c},'.format(b1=hex(v[0]), b2=hex(v[1]),r=row, c=col))
     return Gaiji.ENCODING[col][row]
 
 
@@ -164,20 +166,19 @@ class Kanji(object):
       #character is outside the shif-jis code set
       self._character = Gaiji.decode(self._args)
     else:
-      #form utf-8 encoding of character
-      s = u''.join(u'{:02x}'.format(a|0x80) for a in self._args)
-      h = s.decode('hex')
+      #form euc-jisx0213 encoding of character
+      h = bytes(a|0x80 for a in self._args)
       try:
           self._character = h.decode('euc-jisx0213')
-      except:
+      except UnicodeDecodeError:
           self._character = u'◻'
     if DEBUG:
-      print(u'[{b}][{b2}]-->{char}'.format(b=hex(b), b2=hex(b2), char=self._character).encode('utf-8'))
+      print(u'[{b}][{b2}]-->{char}'.format(b=hex(b), b2=hex(b2), char=self._character))
 
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return self._character
@@ -198,16 +199,14 @@ class Alphanumeric(object):
     self._args = []
     self._args.append(b)
 
-    s =''.join('{:02x}'.format(a) for a in self._args)
-    h = s.decode('hex')
-    self._character = h.decode('ascii')
+    self._character = bytes(self._args).decode('ascii')
     if self._character == u'\\':
       self._character = u'¥'
 
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return self._character
@@ -233,7 +232,7 @@ class Hiragana(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return self._character
@@ -243,7 +242,7 @@ class Hiragana(object):
     return Hiragana(b, f)
 
   #single byte hiragana coding table ARIB STD-B24 table 7-7 pg.50
-  ENCODING = {
+  ENCODING = deferred(lambda: {
     0x0 : {0x2 : u' ', 0x3 : u'ぐ', 0x4 : u'だ', 0x5 : u'ば', 0x6 : u'む', 0x7 : u'る',},
     0x1 : {0x2 : u'ぁ', 0x3 : u'け', 0x4 : u'ち', 0x5 : u'ぱ', 0x6 : u'め', 0x7 : u'ゑ',},
     0x2 : {0x2 : u'あ', 0x3 : u'げ', 0x4 : u'ぢ', 0x5 : u'ひ', 0x6 : u'も', 0x7 : u'を',},
@@ -260,7 +259,7 @@ class Hiragana(object):
     0xd : {0x2 : u'き', 0x3 : u'そ', 0x4 : u'ね', 0x5 : u'ぽ', 0x6 : u'ろ', 0x7 : u'、',},
     0xe : {0x2 : u'ぎ', 0x3 : u'ぞ', 0x4 : u'の', 0x5 : u'ま', 0x6 : u'ゎ', 0x7 : u'・',},
     0xf : {0x2 : u'く', 0x3 : u'た', 0x4 : u'は', 0x5 : u'み', 0x6 : u'わ', 0x7 : u'　',},
-  }
+  })
 
 
 class Katakana(object):
@@ -278,7 +277,7 @@ class Katakana(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return self._character
@@ -288,7 +287,7 @@ class Katakana(object):
     return Katakana(b, f)
 
   #single byte katakana coding table ARIB STD-B24 table 7-6 pg.49
-  ENCODING = {
+  ENCODING = deferred(lambda: {
     0x0 : {0x2 : u' ', 0x3 : u'グ', 0x4 : u'ダ', 0x5 : u'バ', 0x6 : u'ム', 0x7 : u'ヰ',},
     0x1 : {0x2 : u'ァ', 0x3 : u'ケ', 0x4 : u'チ', 0x5 : u'パ', 0x6 : u'メ', 0x7 : u'ヱ',},
     0x2 : {0x2 : u'ア', 0x3 : u'ゲ', 0x4 : u'ジ', 0x5 : u'ヒ', 0x6 : u'モ', 0x7 : u'ヲ',},
@@ -305,7 +304,7 @@ class Katakana(object):
     0xd : {0x2 : u'キ', 0x3 : u'ソ', 0x4 : u'ネ', 0x5 : u'ポ', 0x6 : u'ロ', 0x7 : u'、',},
     0xe : {0x2 : u'ギ', 0x3 : u'ゾ', 0x4 : u'ノ', 0x5 : u'マ', 0x6 : u'ヮ', 0x7 : u'・',},
     0xf : {0x2 : u'ク', 0x3 : u'タ', 0x4 : u'ハ', 0x5 : u'ミ', 0x6 : u'ワ', 0x7 : u'　',},
-  }
+  })
 
 
 class MosaicA(object):
@@ -405,7 +404,7 @@ class Macro(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'{n} {s}'.format(n=self.__class__.__name__, s=u' '.join('{:#x}'.format(x) for x in self._args))
@@ -426,10 +425,10 @@ class DRCS0(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
-    #return u'{n} {s}'.format(n=unicode(self.__class__.__name__), s=u' '.join('{:#x}'.format(x) for x in self._args))
+    #return u'{n} {s}'.format(n=str(self.__class__.__name__), s=u' '.join('{:#x}'.format(x) for x in self._args))
     #return self.__class__.__name__ + ' '.join('{:#x}'.format(x) for x in self._args)
     return u'�'
 
@@ -447,7 +446,7 @@ class DRCS1(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -465,7 +464,7 @@ class DRCS2(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify to
     '''
     return u'�'
@@ -483,7 +482,7 @@ class DRCS3(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -501,7 +500,7 @@ class DRCS4(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -519,7 +518,7 @@ class DRCS5(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -537,7 +536,7 @@ class DRCS6(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -555,7 +554,7 @@ class DRCS7(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -573,7 +572,7 @@ class DRCS8(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -591,7 +590,7 @@ class DRCS9(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -609,7 +608,7 @@ class DRCS10(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -627,7 +626,7 @@ class DRCS11(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -645,7 +644,7 @@ class DRCS12(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -663,7 +662,7 @@ class DRCS13(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -681,7 +680,7 @@ class DRCS14(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -699,7 +698,7 @@ class DRCS15(object):
   def __len__(self):
     return len(self._args)
 
-  def __unicode__(self):
+  def __str__(self):
     '''stringify
     '''
     return u'�'
@@ -709,7 +708,7 @@ class DRCS15(object):
     return DRCS15(b, f)
 
 #ARIB STD-B24 Table 7-3 Classification of code set and Final Byte (pg.57)
-CODE_SET_TABLE = {
+CODE_SET_TABLE = frozen({
   Kanji.FINAL_BYTE : Kanji.decode,
   Alphanumeric.FINAL_BYTE : Alphanumeric.decode,
   Hiragana.FINAL_BYTE : Hiragana.decode,
@@ -742,7 +741,7 @@ CODE_SET_TABLE = {
   DRCS13.FINAL_BYTE : DRCS13.decode,
   DRCS14.FINAL_BYTE : DRCS14.decode,
   DRCS15.FINAL_BYTE : DRCS15.decode,
-  }
+  })
 
 def in_code_set_table(b):
   '''Is this in the code table
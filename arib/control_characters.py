@@ -8,13 +8,13 @@ DATE: Sunday, March 9th 2014
 
 ''' 
 
-import read
-from code_set import code_set_handler_from_final_byte
-from code_set import in_code_set_table
-from arib_exceptions import DecodingError
-
-import read
+import arib.read as read
+from arib.code_set import code_set_handler_from_final_byte
+from arib.code_set import in_code_set_table
+from arib.arib_exceptions import DecodingError
+from arib.frozen import frozen
 
+import arib.read as read
 DEBUG = False
 
 class NUL(object):
@@ -32,7 +32,7 @@ class NUL(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'NUL'
 
   @staticmethod
@@ -52,7 +52,7 @@ class SP(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u' '
 
   @staticmethod
@@ -73,7 +73,7 @@ class DEL(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'DEL'
 
   @staticmethod
@@ -95,7 +95,7 @@ class BEL(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'BEL'
 
   @staticmethod
@@ -120,7 +120,7 @@ class APB(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'APB'
 
   @staticmethod
@@ -145,7 +145,7 @@ class APF(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'APF'
 
   @staticmethod
@@ -169,7 +169,7 @@ class APD(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'APD'
 
   @staticmethod
@@ -193,7 +193,7 @@ class APU(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'APU'
 
   @staticmethod
@@ -214,7 +214,7 @@ class CS(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<clear screen>'
 
   @staticmethod
@@ -236,7 +236,7 @@ class APR(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'APR'
 
   @staticmethod
@@ -258,7 +258,7 @@ class LS1(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'LS1'
 
   @staticmethod
@@ -280,7 +280,7 @@ class LS0(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'LS0'
 
   @staticmethod
@@ -307,7 +307,7 @@ class PAPF(object):
     '''
     return 2
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<PAPF>'
 
   @staticmethod
@@ -343,7 +343,7 @@ class SS2(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'SS2'
 
   @staticmethod
@@ -370,7 +370,7 @@ class LS2(object):
    # print 'setting GL to G2 with contents {g}'.format(g=str(type(decoder._G2.get())))
     decoder._GL = decoder._G2
 
-  def __unicode__(self):
+  def __str__(self):
     return u'LS2'
 
   @staticmethod
@@ -396,7 +396,7 @@ class LS3(object):
     '''
     decoder._GL = decoder._G3
 
-  def __unicode__(self):
+  def __str__(self):
     return u'LS3'
 
   @staticmethod
@@ -422,7 +422,7 @@ class LS1R(object):
     '''
     decoder._GR = decoder._G1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'LS1R'
 
   @staticmethod
@@ -448,7 +448,7 @@ class LS2R(object):
     '''
     decoder._GR = decoder._G2
 
-  def __unicode__(self):
+  def __str__(self):
     return u'LS2R'
 
   @staticmethod
@@ -474,20 +474,20 @@ class LS3R(object):
     '''
     decoder._GR = decoder._G3
 
-  def __unicode__(self):
+  def __str__(self):
     return u'LS3R'
 
   @staticmethod
   def handler(f=None):
     return LS3R(f)
 
-INVOCATION_TABLE = {
+INVOCATION_TABLE = frozen({
   LS2.CODE : LS2.handler,
   LS3.CODE : LS3.handler,
   LS1R.CODE : LS1R.handler,
   LS2R.CODE : LS2R.handler,
   LS3R.CODE : LS3R.handler,
-}
+})
 
 class G0(object):
   CODE = 0x28
@@ -503,12 +503,12 @@ class G0(object):
     b = read.ucb(f)
     if b == DRCS.CODE:
       if DEBUG:
-        print 'G0 DRCS {:#x}'.format(b)
+        print('G0 DRCS {:#x}'.format(b))
       esc._args.append(b)
       DRCS.handler(esc, f)
     elif in_code_set_table(b):
       if DEBUG:
-        print 'G0 CODESET {:#x}'.format(b)
+        print('G0 CODESET {:#x}'.format(b))
       esc._args.append(b)
     else:
       raise DecodingError()
@@ -532,12 +532,12 @@ class G1(object):
     b = read.ucb(f)
     if b == DRCS.CODE:
       if DEBUG:
-        print 'G1 DRCS {:#x}'.format(b)
+        print('G1 DRCS {:#x}'.format(b))
       esc._args.append(b)
       DRCS.handler(esc, f)
     elif in_code_set_table(b):
       if DEBUG:
-        print 'G1 CODESET {:#x}'.format(b)
+        print('G1 CODESET {:#x}'.format(b))
       esc._args.append(b)
     else:
       raise DecodingError()
@@ -562,12 +562,12 @@ class G2(object):
     b = read.ucb(f)
     if b == DRCS.CODE:
       if DEBUG:
-        print 'G2 DRCS {:#x}'.format(b)
+        print('G2 DRCS {:#x}'.format(b))
       esc._args.append(b)
       DRCS.handler(esc, f)
     elif in_code_set_table(b):
       if DEBUG:
-        print 'G2 CODESET {:#x}'.format(b)
+        print('G2 CODESET {:#x}'.format(b))
       esc._args.append(b)
     else:
       raise DecodingError()
@@ -590,12 +590,12 @@ class G3(object):
     b = read.ucb(f)
     if b == DRCS.CODE:
       if DEBUG:
-        print 'G3 DRCS {:#x}'.format(b)
+        print('G3 DRCS {:#x}'.format(b))
       esc._args.append(b)
       DRCS.handler(esc, f)
     elif in_code_set_table(b):
       if DEBUG:
-        print 'G3 CODESET {:#x}'.format(b)
+        print('G3 CODESET {:#x}'.format(b))
       esc._args.append(b)
     else:
       raise DecodingError()
@@ -605,12 +605,12 @@ class G3(object):
     '''
     decoder._G3.set(code_set_handler_from_final_byte(final_byte))
 
-DESIGNATION_TABLE = {
+DESIGNATION_TABLE = frozen({
   G0.CODE : G0.factory,
   G1.CODE : G1.factory,
   G2.CODE : G2.factory,
   G3.CODE : G3.factory,
-}
+})
 
 class TwoByte(object):
   CODE = 0x24
@@ -633,7 +633,7 @@ class DRCS(object):
   def handler(esc, f):
     b = read.ucb(f)
     if DEBUG:
-      print 'DRCS {:#x}'.format(b)
+      print('DRCS {:#x}'.format(b))
     if in_code_set_table(b):
       esc._args.append(b)
     else:
@@ -647,7 +647,7 @@ class ESC(object):
   CODE = 0x1b
   #Mapping by ESC led byte patterns to code "designations"
   #refer to ARIB STD B-24 table 7-12 (pg. 56)
-  GRAPHIC_SETS_TABLE = [
+  GRAPHIC_SETS_TABLE = frozen([
     [G0.CODE,],
     [G1.CODE,],
     [G2.CODE,],
@@ -664,7 +664,7 @@ class ESC(object):
     [TwoByte.CODE, G1.CODE, DRCS.CODE,],
     [TwoByte.CODE, G2.CODE, DRCS.CODE,],
     [TwoByte.CODE, G3.CODE, DRCS.CODE,],
-  ]
+  ])
 
   def __init__(self, f):
     '''the interpretation and bytes read
@@ -674,24 +674,24 @@ class ESC(object):
     '''
     b = read.ucb(f)
     if DEBUG:
-      print 'esc first byte is ' + '{:#x}'.format(b)
+      print('esc first byte is ' + '{:#x}'.format(b))
     self._args = []
     self._args.append(b)
     
     if b in INVOCATION_TABLE:
       if DEBUG:
-        print 'ESC INVOCATION {:#x}'.format(b)
+        print('ESC INVOCATION {:#x}'.format(b))
       INVOCATION_TABLE[b](f)
       #self._args.append(next)
     elif b in DESIGNATION_TABLE:
       if DEBUG:
-        print 'ESC DESIGNATION {:#x}'.format(b)
+        print('ESC DESIGNATION {:#x}'.format(b))
       d = DESIGNATION_TABLE[b]()
       d.load(self, f)
       #self._args.append(next)
     elif b == TwoByte.CODE:
       if DEBUG:
-        print 'ESC TWO BYTE {:#x}'.format(b)
+        print('ESC TWO BYTE {:#x}'.format(b))
       TwoByte.handler(self, f)
       #self._args.append(next)
     else:
@@ -703,7 +703,7 @@ class ESC(object):
     '''
     return len(self._args) + 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'ESC {args}'.format(args=u' '.join(u'{:#x}'.format(x) for x in self._args))
 
   def is_invocation(self):
@@ -719,7 +719,7 @@ class ESC(object):
       raise DecodingError('Attempting to get invocation from ESC sequence that has none.')
     invocation = INVOCATION_TABLE[self._args[0]]()
     if DEBUG:
-      print 'invoking {:#x}'.format(self._args[0])
+      print('invoking {:#x}'.format(self._args[0]))
     invocation(decoder)
 
   def is_designation(self):
@@ -727,7 +727,7 @@ class ESC(object):
     if len(self._args) < 2:
       raise DecodingError()
 
-    designation = self._args[:-1]
+    designation = tuple(self._args[:-1])
     return designation in ESC.GRAPHIC_SETS_TABLE
 
   def designate(self, decoder):
@@ -736,9 +736,9 @@ class ESC(object):
     if not self.is_designation():
       raise DecodingError('Attempting to get designation from ESC sequence that has none.')
     final_byte = self._args[-1]
-    byte_pattern = self._args[:-1]
+    byte_pattern = tuple(self._args[:-1])
     if DEBUG:
-      print 'designating via final_byte {:#x}'.format(final_byte)
+      print('designating via final_byte {:#x}'.format(final_byte))
     d = ESC.find_designation(byte_pattern)
     designation = DESIGNATION_TABLE[d]()
     designation.designate(decoder, final_byte)
@@ -749,7 +749,7 @@ class ESC(object):
     as a change in mapping in designation to code set
     '''
     if DEBUG:
-      print 'ESC ' + str(self)
+      print('ESC ' + str(self))
     if len(self._args) < 2:
       raise DecodingError()
 
@@ -757,21 +757,21 @@ class ESC(object):
     #(i.e. the final byte indicates the code set we'll change to)
     final_byte = self._args[-1]
     #TODO: check final_byte to make sure it's code_set or throw
-    designation = self._args[:-1]
+    designation = tuple(self._args[:-1])
     if DEBUG:
-      print 'final byte: {b}'.format(b=final_byte)
-      print 'designation: {d}'.format(d=str(designation))
+      print('final byte: {b}'.format(b=final_byte))
+      print('designation: {d}'.format(d=str(designation)))
     code_set = code_set_handler_from_final_byte(final_byte)
     d = 0
     if designation in ESC.GRAPHIC_SETS_TABLE:
       if DEBUG:
-        print 'designation in table'
+        print('designation in table')
       #for now i'm assuming i only need the designation g0-g3
       #and the final byte (to get the new code set)
       d = ESC.find_designation(designation)
     else:
       if DEBUG:
-        print 'not in table'
+        print('not in table')
       raise DecodingError()
     return (d, code_set)
 
@@ -779,11 +779,11 @@ class ESC(object):
   def find_designation(bytes):
     for i, pattern in enumerate(ESC.GRAPHIC_SETS_TABLE):
       if DEBUG:
-        print '{b} : {i} {p}'.format(b=str(bytes), i=str(i), p=str(pattern))
+        print('{b} : {i} {p}'.format(b=str(bytes), i=str(i), p=str(pattern)))
       if bytes == pattern:
         if DEBUG:
-          print 'found designation match at {p} at index {i} and desig {d}'.format(p=str(pattern), i=str(i), d=str(i%4))
-        return DESIGNATION_TABLE.keys()[i%4]
+          print('found designation match at {p} at index {i} and desig {d}'.format(p=str(pattern), i=str(i), d=str(i%4)))
+        return list(DESIGNATION_TABLE.keys())[i%4]
     #raise decoding error?
     
 
@@ -831,7 +831,7 @@ class APS(object):
     self._args.append(read.ucb(f)&0x3f)#p1
     self._args.append(read.ucb(f)&0x3f)#p2
     if DEBUG:
-      print(u'APS: --> {:#d},{:#d}>'.format(self._args[0], self._args[1]).encode('utf-8'))
+      print(u'APS: --> {:#d},{:#d}>'.format(self._args[0], self._args[1]))
 
   @property
   def col(self):
@@ -847,7 +847,7 @@ class APS(object):
     '''
     return len(self._args) + 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'\n<Screen Posiiton to {:#d},{:#d}>'.format(self._args[0], self._args[1])
 
   @staticmethod
@@ -869,7 +869,7 @@ class SS3(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'SS3'
 
   @staticmethod
@@ -891,7 +891,7 @@ class RS(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'RS'
 
   @staticmethod
@@ -913,7 +913,7 @@ class US(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'US'
 
   @staticmethod
@@ -938,7 +938,7 @@ class BKF(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<black>'
 
   @staticmethod
@@ -968,7 +968,7 @@ class COL(object):
     '''
     return len(self._args) + 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'COL {args}'.format(args=u' '.join(u'{:#x}'.format(x) for x in self._args))
 
   @staticmethod
@@ -989,7 +989,7 @@ class RDF(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<red>'
 
   @staticmethod
@@ -1013,7 +1013,7 @@ class FLC(object):
     '''
     return len(self._args) + 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'FLC {args}'.format(args=u' '.join(u'{:#x}'.format(x) for x in self._args))
 
   @staticmethod
@@ -1034,7 +1034,7 @@ class GRF(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<green>'
 
   @staticmethod
@@ -1069,7 +1069,7 @@ class YLF(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<yellow>'
 
   @staticmethod
@@ -1103,7 +1103,7 @@ class BLF(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<blue>'
 
   @staticmethod
@@ -1140,7 +1140,7 @@ class MGF(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<magenta>'
 
   @staticmethod
@@ -1175,7 +1175,7 @@ class CNF(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<cyan>'
 
   @staticmethod
@@ -1196,7 +1196,7 @@ class WHF(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<white>'
 
   @staticmethod
@@ -1218,7 +1218,7 @@ class HLC(object):
   def __len__(self):
     return 2
 
-  def __unicode__(self):
+  def __str__(self):
     if self._start:
       return u'<Highlight start>'
     else:
@@ -1236,7 +1236,7 @@ class SSZ(object):
   CODE = 0x88
   def __init__(self, f):
     if DEBUG:
-      print(u'SSZ: --> 0x88'.encode('utf-8'))
+      print(u'SSZ: --> 0x88')
 
   def __len__(self):
     '''Defiing len() operator to help
@@ -1244,7 +1244,7 @@ class SSZ(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<Small Text>'
 
   @staticmethod
@@ -1274,7 +1274,7 @@ class MSZ(object):
   CODE = 0x89
   def __init__(self, f):
     if DEBUG:
-      print(u'MSZ: --> 0x89'.encode('utf-8'))
+      print(u'MSZ: --> 0x89')
 
   def __len__(self):
     '''Defiing len() operator to help
@@ -1282,7 +1282,7 @@ class MSZ(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<Medium Text>'
 
   @staticmethod
@@ -1310,7 +1310,7 @@ class NSZ(object):
   CODE = 0x8a
   def __init__(self, f):
     if DEBUG:
-      print(u'NSZ: --> 0x8a'.encode('utf-8'))
+      print(u'NSZ: --> 0x8a')
 
   def __len__(self):
     '''Defiing len() operator to help
@@ -1318,7 +1318,7 @@ class NSZ(object):
     '''
     return 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'<Normal Text>'
 
   @staticmethod
@@ -1351,7 +1351,7 @@ class SZX(object):
   CODE = 0x8b
   def __init__(self, f):
     if DEBUG:
-      print(u'SZX: --> 0x8b'.encode('utf-8'))
+      print(u'SZX: --> 0x8b')
 
   @staticmethod
   def handler(f):
@@ -1369,7 +1369,7 @@ class CSI(object):
     '''
     self._args = []
     c = read.ucb(f)
-    while c is not 0x20:
+    while c != 0x20:
       self._args.append(c)
       c = read.ucb(f)
     self._args.append(c)
@@ -1383,11 +1383,10 @@ class CSI(object):
     '''
     return len(self._args) + 1
 
-  def __unicode__(self):
-    try:
-      return u'<CS:"{seq}">'.format(seq=u''.join(u'{:#c}'.format(x) for x in self._args))
-    except UnicodeDecodeError:
-        return u'<CS:"{seq}">'.format(seq=u''.join(u':{h}'.format(h=hex(x)) for x in self._args))
+  def __str__(self):
+    if all(x < 0x80 for x in self._args):
+      return u'<CS:"{seq}">'.format(seq=u''.join(chr(x) for x in self._args))
+    return u'<CS:"{seq}">'.format(seq=u''.join(u':{h}'.format(h=hex(x)) for x in self._args))
 
   @staticmethod
   def handler(f):
@@ -1410,14 +1409,14 @@ class TIME(object):
     '''
     return len(self._args) + 1
 
-  def __unicode__(self):
+  def __str__(self):
     return u'TIME {args}'.format(args=u' '.join(u'{:#x}'.format(x) for x in self._args))
 
   @staticmethod
   def handler(f):
     return TIME(f)
 
-COMMAND_TABLE = {
+COMMAND_TABLE = frozen({
   NUL.CODE : NUL.handler,
   SP.CODE : SP.handler,
   DEL.CODE : DEL.handler,
@@ -1462,7 +1461,7 @@ COMMAND_TABLE = {
   #SZX.CODE : SZX.handler,
   CSI.CODE : CSI.handler,
   TIME.CODE : TIME.handler,
-}
+})
 
 def is_control_character(char):
   '''return True if this is an ARIB control character
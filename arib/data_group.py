@@ -11,14 +11,14 @@ caption and teletext elementary stream.
   
 ''' 
 import sys
-import read
-from read import EOFError
-import traceback
+import arib.read as read
+from arib.read import EOFError
+from binascii import crc_hqx
 
-from closed_caption import CaptionStatementData
-from closed_caption import CaptionManagementData
-from struct import error as struct_error
-from copy import copy
+from arib.closed_caption import CaptionStatementData
+from arib.closed_caption import CaptionManagementData
+from arib.closed_caption import DEFAULT_CONTEXT
+from arib.frozen import frozen
 
 DEBUG = False
 
@@ -31,6 +31,10 @@ class DataGroupParseError(Exception):
 class DataGroup(object):
   '''Represents an arib Data Group packet structure as
   described in ARIB b-24 Table 9-1 on pg 172
+
+  The CRC is read but not checked here. Data groups from .ts files are
+  checked by parse_data_group() (see check_data_group()) before they are
+  parsed; those read from .es files by next_data_group() are not.
   '''
   GroupA_Caption_Management = 0x0
   GroupB_Caption_Management = 0x20
@@ -43,55 +47,54 @@ class DataGroup(object):
   GroupA_Caption_Statement_lang7 = 0x7
   GroupA_Caption_Statement_lang8 = 0x8
 
-  def __init__(self, f):
+  def __init__(self, f, context=DEFAULT_CONTEXT):
     if DEBUG:
       print("__DATA_GROUP_START__")
 
     self._stuffing_byte = read.ucb(f)
     if DEBUG:
-      print hex(self._stuffing_byte)
-    if(self._stuffing_byte is not 0x80):
+      print(hex(self._stuffing_byte))
+    # the data identifier of the PES data (ARIB STD-B24 Part 3 5.2), really
+    if self._stuffing_byte not in DATA_IDENTIFIERS:
       raise DataGroupParseError("Initial stuffing byte not equal to 0x80: " + hex(self._stuffing_byte))
 
     self._data_identifier = read.ucb(f)
     if DEBUG:
-      print hex(self._data_identifier)
-    if self._data_identifier is not 0xff:
+      print(hex(self._data_identifier))
+    if self._data_identifier != 0xff:
       raise DataGroupParseError("Initial data identifier is not equal to 0xff" + hex(self._data_identifier))
 
     self._private_stream_id = read.ucb(f)
     if DEBUG:
-     print hex(self._private_stream_id)
-    if self._private_stream_id is not 0xf0:
+     print(hex(self._private_stream_id))
+    if self._private_stream_id != 0xf0:
       raise DataGroupParseError("Private stream id not equal to 0xf0: " + hex(self._private_stream_id))
 
     self._group_id = read.ucb(f)
     if DEBUG:
-        print 'group id ' + str((self._group_id >> 2)&(~0x20))
+        print('group id ' + str((self._group_id >> 2)&(~0x20)))
     self._group_link_number = read.ucb(f)
     if DEBUG:
-        print str(self._group_link_number)
+        print(str(self._group_link_number))
     self._last_group_link_number = read.ucb(f)
     if DEBUG:
-      print str(self._last_group_link_number)
+      print(str(self._last_group_link_number))
     if self._group_link_number != self._last_group_link_number:
       print("This is data group packet " + str(self._group_link_number) + " of " + str(self._last_group_link_number))
     self._data_group_size = read.usb(f)
     if DEBUG:
-      print 'data group size found is ' + str(self._data_group_size)
+      print('data group size found is ' + str(self._data_group_size))
 
     if not self.is_management_data():
-      self._payload = CaptionStatementData(f)
+      self._payload = CaptionStatementData(f, context)
     else:
       #self._payload = f.read(self._data_group_size)
       #self._payload = read.buffer(f, self._data_group_size)
-      self._payload = CaptionManagementData(f)
+      self._payload = CaptionManagementData(f, context)
     
     self._crc = read.usb(f)
     if DEBUG:
-      print 'crc value is ' + str(self._crc)
-
-    # TODO: check CRC value
+      print('crc value is ' + str(self._crc))
 
   def payload(self):
     return self._payload
@@ -105,37 +108,107 @@ class DataGroup(object):
     '''
     return ((self._group_id >> 2)&(~0x20))==0
 
+  def language(self):
+    '''Caption language number (1 to 8) of caption statement data, as
+    given by the data group id of either group A or B. 0 for management data.
+    '''
+    return (self._group_id >> 2)&(~0x20)
+
+# data group parse status codes
+OK = 0
+NOT_A_DATA_GROUP = 1
+TRUNCATED = 2
+CRC_ERROR = 3
+DECODE_ERROR = 4
+
+STATUS_NAMES = frozen({
+  OK : 'ok',
+  NOT_A_DATA_GROUP : 'not_a_data_group',
+  TRUNCATED : 'truncated',
+  CRC_ERROR : 'crc_error',
+  DECODE_ERROR : 'decode_error',
+})
+
+# data identifier of closed captions (synchronized PES) and superimpose
+# (asynchronous PES), followed by the private stream id and header length
+SYNCHRONIZED_DATA = 0x80
+ASYNCHRONOUS_DATA = 0x81
+DATA_IDENTIFIERS = frozenset([SYNCHRONIZED_DATA, ASYNCHRONOUS_DATA])
+DATA_GROUP_START = b'\x80\xff\xf0'
+DATA_GROUP_START_TAIL = DATA_GROUP_START[1:]
+# start bytes, group id, link numbers and size
+DATA_GROUP_HEADER_SIZE = 8
+CRC_SIZE = 2
+
+def check_data_group(data):
+  """
+  Validate a raw data group (as found in a caption PES payload) without parsing it.
+  Checks the start bytes, the declared size and the CRC, none of which raise.
+  :param data: bytes holding the data group
+  :return: status code, OK if the data group can be parsed
+  """
+  if not data or data[0] not in DATA_IDENTIFIERS or data[1:3] != DATA_GROUP_START_TAIL:
+    return NOT_A_DATA_GROUP
+  if len(data) < DATA_GROUP_HEADER_SIZE:
+    return TRUNCATED
+  end = DATA_GROUP_HEADER_SIZE + ((data[6] << 8) | data[7]) + CRC_SIZE
+  if len(data) < end:
+    return TRUNCATED
+  # CRC-16 CCITT over group id to CRC inclusive is zero for intact data
+  if crc_hqx(data[3:end], 0):
+    return CRC_ERROR
+  return OK
+
+def parse_data_group(data, context=DEFAULT_CONTEXT):
+  """
+  Parse a DataGroup without raising on damaged or foreign data.
+  Damaged data is rejected by check_data_group() before any parsing, so only
+  intact data using unsupported features gets as far as raising an exception.
+  :param data: bytes holding the data group
+  :param context: closed_caption.Context to decode with
+  :return: tuple of (status code, DataGroup or None, error detail or None)
+  """
+  status = check_data_group(data)
+  if status != OK:
+    return (status, None, None)
+  try:
+    return (OK, DataGroup(read.Cursor(data), context), None)
+  except Exception as ex:
+    return (DECODE_ERROR, None, ex)
+
+
 def find_data_group_start(f):
   """
   Find the start of the next data group in a binary file
   :param f: file descriptor we're reading from typically opened 'rb'
   :return: Boolean describing whether we found a new start pattern or not
   """
-  start_pattern = '\x80\xff\xf0'
-  read_pattern = ''
+  read_pattern = b''
   c = f.read(1)
   while c:
     filepos = f.tell()
     read_pattern += c
     if len(read_pattern) > 3:
       read_pattern = read_pattern[1:]
-    if read_pattern == start_pattern:
+    if read_pattern[1:] == DATA_GROUP_START_TAIL and read_pattern[0] in DATA_IDENTIFIERS:
       f.seek(filepos-3)
       return True
     c = f.read(1)
   return False
 
-def next_data_group(filepath):
+def next_data_group(filepath, context=DEFAULT_CONTEXT):
+  # only .es files need this, not the .ts tools importing this module
+  import traceback
   f = open(filepath, "rb")
   try:
-    data_group = DataGroup(f)
+    data_group = DataGroup(f, context)
     while data_group:
       yield data_group
       try:
-        data_group = DataGroup(f)
+        data_group = DataGroup(f, context)
       except EOFError:
           break
-      except Exception, err:
+      except Exception as err:
         print("Exception throw while parsing data group from .es")
         traceback.print_exc(file=sys.stdout)
         print("Looking for new data group in .es")
@@ -148,7 +221,7 @@ def next_data_group(filepath):
   except EOFError:
     # we can quite rightly run into eof here. in that case just bail
     pass
-  except Exception, err:
+  except Exception as err:
     print("Exception throw while parsing data group from .es")
     traceback.print_exc(file=sys.stdout)
   finally:
@@ -8,12 +8,12 @@ DATE: Friday, March 15th 2014
 
 '''
 
-import read
-from control_characters import is_control_character
-from control_characters import handle_control_character
-import control_characters as control_char
-import code_set
-
+import arib.read as read
+from arib.control_characters import is_control_character
+from arib.control_characters import handle_control_character
+import arib.control_characters as control_char
+import arib.code_set as code_set
+from arib.arib_exceptions import DecodingError
 DEBUG = False
 
 
@@ -70,7 +70,7 @@ class Decoder(object):
     '''
     b = read.ucb(f)
     if DEBUG:
-      print '-->{:02x}'.format(b)
+      print('-->{:02x}'.format(b))
     #the interpretation and how many more bytes we have to read
     #depends upon:
     #1) What code table is this character in? c0? GR? GL? etc.
@@ -150,3 +150,288 @@ class Decoder(object):
     
   
     
+
+
+# decoded statements that are text, as opposed to control codes
+TEXT_STATEMENTS = (code_set.Kanji, code_set.Alphanumeric, code_set.Hiragana, code_set.Katakana)
+
+def decode_text(data):
+  '''Text of an ARIB 8 bit character string from SI, e.g. an EIT event name.
+  SI strings start with alphanumerics in G1 and katakana in G3 (ARIB STD-B24
+  part 2 7.1), rather than the caption defaults. Undecodable characters end
+  the text.
+  :param data: bytes of the string
+  '''
+  decoder = Decoder()
+  decoder._G1 = ref(code_set.Alphanumeric.decode)
+  decoder._G3 = ref(code_set.Katakana.decode)
+  f = read.Cursor(data)
+  text = []
+  while len(f):
+    try:
+      statement = decoder.decode(f)
+    except Exception:
+      break
+    if isinstance(statement, TEXT_STATEMENTS):
+      text.append(str(statement))
+    elif isinstance(statement, control_char.SP):
+      text.append(u' ')
+    elif isinstance(statement, control_char.APR):
+      text.append(u'\n')
+  return u''.join(text)
+
+
+# Text only decoding of caption statement bodies (statement_text).
+# Statements are decoded exactly as Decoder does, designations, invocations
+# and all, but displayable characters go straight into the text instead of
+# each becoming an object, and control codes are only skipped over.
+
+# bytes read ahead of a statement body, for the parameters of its last
+# statement. Read again with more if that's not enough.
+READ_AHEAD = 64
+
+# parameter bytes of the control codes with a fixed number of them
+_PARAMETER_BYTES = {
+  control_char.PAPF.CODE : 1,
+  control_char.APS.CODE : 2,
+  control_char.FLC.CODE : 1,
+  control_char.HLC.CODE : 1,
+  control_char.TIME.CODE : 2,
+}
+# control codes starting a new line of text, as in arib.formats
+_NEW_LINE = frozenset([control_char.APS.CODE, control_char.CS.CODE])
+# final byte of the CSI sequence ACPS (active coordinate position set)
+_CSI_ACPS_FINAL = ord('a')
+_INVOCATIONS = {
+  control_char.LS2.CODE : ('GL', 2),
+  control_char.LS3.CODE : ('GL', 3),
+  control_char.LS1R.CODE : ('GR', 1),
+  control_char.LS2R.CODE : ('GR', 2),
+  control_char.LS3R.CODE : ('GR', 3),
+}
+
+# how the characters of each code set are decoded
+_KANJI = 0
+_TABLE = 1
+_ALPHANUMERIC = 2
+_DRCS_2BYTE = 3
+_DRCS = 4
+_MACRO = 5
+
+_text_code_sets = None
+_kanji_cache = {}
+
+def _code_sets():
+  '''kind, and character table of single byte sets, by code set decode handler
+  '''
+  global _text_code_sets
+  if _text_code_sets is None:
+    def table(encoding):
+      return [encoding.get(b & 0x0f, {}).get((b >> 4) & 0x07) for b in range(256)]
+    sets = {
+      code_set.Kanji.decode : (_KANJI, None),
+      code_set.Alphanumeric.decode : (_ALPHANUMERIC, None),
+      code_set.Hiragana.decode : (_TABLE, table(code_set.Hiragana.ENCODING)),
+      code_set.Katakana.decode : (_TABLE, table(code_set.Katakana.ENCODING)),
+      code_set.Macro.decode : (_MACRO, None),
+      code_set.DRCS0.decode : (_DRCS_2BYTE, None),
+    }
+    for handler in code_set.CODE_SET_TABLE.values():
+      if handler.__qualname__.startswith('DRCS') and handler not in sets:
+        sets[handler] = (_DRCS, None)
+    _text_code_sets = sets
+  return _text_code_sets
+
+
+def statement_text(f, bytes_to_read):
+  '''Text of a caption statement body, decoded without creating an object per
+  statement. Gives the same text (and reads the same bytes) as decoding it
+  with StatementBody.parse_contents and formatting it as arib.formats does:
+  characters and spaces not in small size, with DRCS as U+FFFD and a new line
+  at each APS, ACPS or clear screen. Other control codes are skipped.
+  :param f: file or read.Cursor positioned at the statement body
+  :param bytes_to_read: size of the statement body
+  :return: unicode text, lines separated by newlines
+  '''
+  start = f.tell()
+  size = bytes_to_read + READ_AHEAD
+  while True:
+    data = f.read(size)
+    try:
+      text, consumed = _statement_text(data, bytes_to_read)
+      break
+    except (IndexError, read.EOFError):
+      if len(data) < size:
+        # the data really does end part way through
+        raise read.EOFError()
+      f.seek(start)
+      size *= 2
+  f.seek(start + consumed)
+  return text
+
+
+def _statement_text(data, bytes_to_read):
+  '''statement_text() of bytes holding the statement body
+  :return: tuple of (text, bytes read)
+  :raises IndexError: if the statement body runs past the end of data
+  '''
+  code_sets = _code_sets()
+  kanji_cache = _kanji_cache
+  # designations, and GL and GR invocations as indices into them
+  g = [code_set.Kanji.decode, code_set.Katakana.decode, code_set.Hiragana.decode, code_set.Macro.decode]
+  gl = 0
+  gr = 2
+  # designation saved by a single shift (see Decoder.handle_encoding_change)
+  single_shift = None
+  # text in small size (furigana) is left out
+  small = False
+  lines = []
+  line = []
+  i = 0
+  bytes_read = 0
+  while bytes_read < bytes_to_read:
+    b = data[i]
+    i += 1
+    start = i - 1
+    if b in control_char.COMMAND_TABLE:
+      if single_shift is not None:
+        g[gl] = single_shift
+        single_shift = None
+      new_line = b in _NEW_LINE
+      if b == control_char.SP.CODE:
+        if not small:
+          line.append(u' ')
+      elif b == control_char.SSZ.CODE:
+        small = True
+      elif b == control_char.MSZ.CODE or b == control_char.NSZ.CODE:
+        small = False
+      elif b in _PARAMETER_BYTES:
+        i += _PARAMETER_BYTES[b]
+        _require(data, i)
+      elif b == control_char.COL.CODE:
+        i += 2 if data[i] == 0x20 else 1
+        _require(data, i)
+      elif b == control_char.CSI.CODE:
+        while data[i] != 0x20:
+          i += 1
+        i += 2
+        new_line = data[i - 1] == _CSI_ACPS_FINAL
+      elif b == control_char.LS0.CODE:
+        gl = 0
+      elif b == control_char.LS1.CODE:
+        gl = 1
+      elif b == control_char.SS2.CODE:
+        single_shift = g[gl]
+        gl = 2
+      elif b == control_char.SS3.CODE:
+        single_shift = g[gl]
+        gl = 3
+      elif b == control_char.ESC.CODE:
+        i, gl, gr = _escape(data, i, g, gl, gr)
+      if new_line and line:
+        lines.append(u''.join(line))
+        line = []
+      bytes_read += i - start
+      continue
+    handler = None
+    if is_gl_character(b):
+      handler = g[gl]
+    elif is_gr_character(b):
+      handler = g[gr]
+    # a single shift lasts for one character, decoded with it
+    if single_shift is not None:
+      g[gl] = single_shift
+      single_shift = None
+    if handler is None:
+      # not counted, just as Decoder returns no statement for it
+      continue
+    kind, table = code_sets.get(handler, (None, None))
+    c = None
+    if kind == _KANJI:
+      key = (b << 8) | data[i]
+      i += 1
+      c = kanji_cache.get(key)
+      if c is None:
+        c = kanji_cache[key] = str(code_set.Kanji(b, read.Cursor(data, i - 1)))
+    elif kind == _TABLE:
+      c = table[b]
+    elif kind == _ALPHANUMERIC and b < 0x80:
+      c = u'¥' if b == 0x5c else chr(b)
+    elif kind == _DRCS:
+      c = u'�'
+    elif kind == _DRCS_2BYTE:
+      i += 1
+      _require(data, i)
+      c = u'�'
+    elif kind == _MACRO:
+      pass
+    else:
+      # anything else is rare enough to decode the usual way
+      cursor = read.Cursor(data, i)
+      statement = handler(b, cursor)
+      i = cursor.tell()
+      if isinstance(statement, TEXT_STATEMENTS):
+        c = str(statement)
+    if c is not None and not small:
+      line.append(c)
+    bytes_read += i - start
+  if line:
+    lines.append(u''.join(line))
+  return u'\n'.join(lines), i
+
+
+def _require(data, end):
+  '''Make sure data holds the bytes up to end, which are skipped unread
+  :raises IndexError: if data ends before them
+  '''
+  if end > len(data):
+    raise IndexError(end)
+
+
+def _escape(data, i, g, gl, gr):
+  '''Carry out the ESC sequence at data[i:], just as ESC and
+  Decoder.handle_encoding_change do
+  :return: tuple of (index after it, GL, GR)
+  '''
+  b = data[i]
+  i += 1
+  if b in _INVOCATIONS:
+    area, index = _INVOCATIONS[b]
+    if area == 'GL':
+      return i, index, gr
+    return i, gl, index
+  args = [b]
+  if b in control_char.DESIGNATION_TABLE:
+    i = _designation(data, i, args)
+  elif b == control_char.TwoByte.CODE:
+    b = data[i]
+    i += 1
+    if code_set.in_code_set_table(b):
+      args.append(b)
+    elif b in control_char.DESIGNATION_TABLE:
+      args.append(b)
+      i = _designation(data, i, args)
+    else:
+      raise DecodingError()
+  else:
+    raise DecodingError()
+  pattern = tuple(args[:-1])
+  if len(args) < 2 or pattern not in control_char.ESC.GRAPHIC_SETS_TABLE:
+    raise DecodingError()
+  g[control_char.ESC.GRAPHIC_SETS_TABLE.index(pattern) % 4] = code_set.code_set_handler_from_final_byte(args[-1])
+  return i, gl, gr
+
+
+def _designation(data, i, args):
+  '''Read the rest of a G0 to G3 designation, as G0.load etc. do
+  '''
+  b = data[i]
+  i += 1
+  if b == control_char.DRCS.CODE:
+    args.append(b)
+    b = data[i]
+    i += 1
+  if not code_set.in_code_set_table(b):
+    raise DecodingError()
+  args.append(b)
+  return i
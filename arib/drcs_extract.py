@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: drcs_extract
+Desc: Extract all distinct DRCS character bitmaps from .ts or .es files
+  into a .png sprite sheet and a .json index, to help label new DRCS glyphs.
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+'''
+import os
+import sys
+import argparse
+import json
+import struct
+import zlib
+
+from arib.read import EOFError
+
+from arib.closed_caption import next_data_unit
+from arib.closed_caption import DRCS1ByteCharacter
+from arib.closed_caption import DRCS2ByteCharacter
+from arib.closed_caption import CHARACTER_HASHES
+from arib.data_group import OK
+from arib.data_group import parse_data_group
+from arib.data_group import next_data_group
+
+from arib.mpeg.ts import TS
+from arib.mpeg.ts import ES
+
+DRCS_DATA_UNITS = (DRCS1ByteCharacter, DRCS2ByteCharacter)
+
+
+def write_png(filepath, width, height, rows):
+  '''Write an 8 bit grayscale .png file.
+  Written by hand to avoid pulling in an imaging library dependency.
+  :param rows: list of rows, each a list of width values 0-255
+  '''
+  def chunk(tag, data):
+    c = struct.pack('>I', len(data)) + tag + data
+    return c + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+  raw = b''.join(b'\x00' + bytes(row) for row in rows)
+  with open(filepath, 'wb') as f:
+    f.write(b'\x89PNG\r\n\x1a\n')
+    f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)))
+    f.write(chunk(b'IDAT', zlib.compress(raw, 9)))
+    f.write(chunk(b'IEND', b''))
+
+
+class DRCSCatalog(object):
+  '''Distinct DRCS fonts found across any number of input files,
+  deduplicated by DRCSFont.digest()
+  '''
+  def __init__(self):
+    self._fonts = {}
+    self._entries = []
+
+  def __len__(self):
+    return len(self._entries)
+
+  def entries(self):
+    return self._entries
+
+  def add_font(self, character, font, source):
+    digest = font.digest()
+    entry = self._fonts.get(digest)
+    if entry is None:
+      entry = {
+        'digest' : digest,
+        'character_code' : '{:#06x}'.format(character.character_code()),
+        'width' : font._width,
+        'height' : font._height,
+        'depth' : font._depth,
+        'levels' : font.levels(),
+        'hash' : font._hash,
+        'character' : CHARACTER_HASHES.get(font._hash, None),
+        'count' : 0,
+        'sources' : [],
+        'font' : font,
+      }
+      self._fonts[digest] = entry
+      self._entries.append(entry)
+    entry['count'] += 1
+    if source not in entry['sources']:
+      entry['sources'].append(source)
+
+  def add_data_group(self, data_group, source):
+    '''Add any DRCS fonts carried by a data group
+    :return: number of DRCS data units found
+    '''
+    found = 0
+    for data_unit in next_data_unit(data_group.payload()):
+      if not isinstance(data_unit.payload(), DRCS_DATA_UNITS):
+        continue
+      found += 1
+      for character in data_unit.payload().payload():
+        for font in character.fonts():
+          self.add_font(character, font, source)
+    return found
+
+  def add_es(self, filepath):
+    '''Add DRCS fonts from a previously demuxed closed caption elementary stream
+    '''
+    source = os.path.basename(filepath)
+    for data_group in next_data_group(filepath):
+      self.add_data_group(data_group, source)
+
+  def add_ts(self, filepath, pid=-1):
+    '''Add DRCS fonts from an MPEG TS file.
+    If pid is not given, lock onto the first PID carrying caption management data.
+    '''
+    source = os.path.basename(filepath)
+    state = {'pid' : pid}
+
+    def OnESPacket(current_pid, packet, header_size):
+      if state['pid'] >= 0 and current_pid != state['pid']:
+        return
+      status, data_group, err = parse_data_group(ES.get_pes_payload(packet))
+      if status != OK:
+        # not caption data, or damaged caption data. either way skip it
+        return
+      if data_group.is_management_data():
+        if state['pid'] < 0 and data_group.payload().num_languages() > 0:
+          state['pid'] = current_pid
+        return
+      self.add_data_group(data_group, source)
+
+    ts = TS(filepath)
+    ts.OnESPacket = OnESPacket
+    ts.Parse()
+
+  def add_file(self, filepath, pid=-1):
+    '''Add DRCS fonts from either a .ts or .es file, detected by content
+    '''
+    with open(filepath, 'rb') as f:
+      head = f.read(1)
+    if head and head[0] == TS.SYNC_BYTE:
+      self.add_ts(filepath, pid)
+    else:
+      self.add_es(filepath)
+
+  def write_sheet(self, filepath, columns=16, padding=2):
+    '''Lay out every distinct font on a grid and write it as a .png
+    Fonts are drawn dark on a white background, scaled by gradation level.
+    Sheet position is recorded in each entry as 'x' and 'y'.
+    '''
+    if not self._entries:
+      return
+    cell_w = max(e['width'] for e in self._entries) + padding
+    cell_h = max(e['height'] for e in self._entries) + padding
+    columns = min(columns, len(self._entries))
+    sheet_rows = (len(self._entries) + columns - 1) // columns
+    width = columns * cell_w + padding
+    height = sheet_rows * cell_h + padding
+    rows = [[255] * width for y in range(height)]
+    for i, entry in enumerate(self._entries):
+      x = padding + (i % columns) * cell_w
+      y = padding + (i // columns) * cell_h
+      entry['x'] = x
+      entry['y'] = y
+      full = entry['levels'] - 1
+      for r, line in enumerate(entry['font'].bitmap()):
+        for c, v in enumerate(line):
+          rows[y + r][x + c] = 255 - (255 * v) // full
+    write_png(filepath, width, height, rows)
+
+  def write_index(self, filepath, sheet=None):
+    '''Write a .json index describing every distinct font in the sheet
+    '''
+    index = {
+      'sheet' : sheet,
+      'fonts' : [dict((k, v) for k, v in e.items() if k != 'font') for e in self._entries],
+    }
+    with open(filepath, 'w') as f:
+      json.dump(index, f, indent=2, sort_keys=True)
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description='Extract all distinct DRCS character bitmaps from MPEG TS or closed caption ES files into a .png sprite sheet and .json index.')
+  parser.add_argument('infiles', help='Input filenames (MPEG2 Transport Stream or Elementary Stream files)', type=str, nargs='+')
+  parser.add_argument('-o', '--outfile', help='Output filename prefix. Writes <prefix>.png and <prefix>.json', type=str, default='drcs')
+  parser.add_argument('-p', '--pid',
+                      help='Specify a PID of a PES known to contain closed caption info (tool will attempt to find the proper PID if not specified.).',
+                      type=int, default=-1)
+  parser.add_argument('-c', '--columns', help='Number of characters per row in the sprite sheet.', type=int, default=16)
+  parser.add_argument('-q', '--quiet', help='Does not write to stdout.', action='store_true')
+  args = parser.parse_args()
+
+  catalog = DRCSCatalog()
+  for infilename in args.infiles:
+    if not os.path.exists(infilename):
+      if not args.quiet:
+        print('Input filename :' + infilename + " does not exist.")
+      sys.exit(-1)
+    if not args.quiet:
+      print("Scanning " + infilename)
+    try:
+      catalog.add_file(infilename, args.pid)
+    except EOFError:
+      pass
+
+  if not len(catalog):
+    if not args.quiet:
+      print("*** Sorry. No DRCS characters found in input files. ***")
+    sys.exit(-1)
+
+  sheet = args.outfile + '.png'
+  catalog.write_sheet(sheet, columns=args.columns)
+  catalog.write_index(args.outfile + '.json', os.path.basename(sheet))
+
+  if not args.quiet:
+    unknown = len([e for e in catalog.entries() if e['character'] is None])
+    print("Found {n} distinct DRCS characters ({u} unknown).".format(n=len(catalog), u=unknown))
+    print("Wrote " + sheet + " and " + args.outfile + ".json")
+
+  sys.exit(0)
+
+if __name__ == "__main__":
+  main()
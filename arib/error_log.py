@@ -0,0 +1,58 @@
+# vim: set ts=2 expandtab:
+'''
+Module: error_log.py
+Desc: Rate limited reporting of caption decoding errors
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+A damaged recording can produce an error on every caption packet. Every
+error is counted, but each kind of error is only printed once per interval,
+followed by the number of similar errors suppressed since.
+
+'''
+import sys
+import time
+
+
+class ErrorLog(object):
+  '''
+  :param interval: minimum seconds between messages of the same kind.
+    0 prints every error.
+  :param out: stream to print to. sys.stdout (as it is when printing) if None
+  '''
+  def __init__(self, interval=5.0, out=None):
+    self._interval = interval
+    self._out = out
+    self._last = {}
+    self._suppressed = {}
+    self.counts = {}
+
+  def __len__(self):
+    return sum(self.counts.values())
+
+  def error(self, kind, message, ex=None):
+    '''Count an error and print it unless one of the same kind was printed recently
+    :param kind: short name of the kind of error
+    :param ex: optional exception carrying further detail
+    '''
+    self.counts[kind] = self.counts.get(kind, 0) + 1
+    now = time.time()
+    last = self._last.get(kind)
+    if last is not None and now - last < self._interval:
+      self._suppressed[kind] = self._suppressed.get(kind, 0) + 1
+      return
+    self._last[kind] = now
+    suppressed = self._suppressed.pop(kind, 0)
+    if suppressed:
+      message += ' ({n} similar errors suppressed)'.format(n=suppressed)
+    if ex is not None:
+      message += ': ' + type(ex).__name__ + ' ' + str(ex)
+    (self._out or sys.stdout).write(message + '\n')
+
+  def summary(self):
+    '''One line count of all errors by kind, or None if there were none
+    '''
+    if not self.counts:
+      return None
+    return 'Errors: ' + ', '.join('{k} {n}'.format(k=k, n=n) for k, n in sorted(self.counts.items()))
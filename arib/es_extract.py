@@ -12,8 +12,8 @@ import sys
 import argparse
 import traceback
 
-from mpeg.ts import TS
-from mpeg.ts import ES
+from arib.mpeg.ts import TS
+from arib.mpeg.ts import ES
 
 from arib.closed_caption import next_data_unit
 from arib.closed_caption import StatementBody
@@ -22,9 +22,8 @@ import arib.control_characters as control_characters
 from arib.data_group import DataGroup
 from arib.data_group import next_data_group
 
-# print out some additional info for DRCS values
-from arib.closed_caption import set_DRCS_debug
-set_DRCS_debug(True)
+from arib.closed_caption import Context
+from arib.output import utf8_stdout
 
 
 DISPLAYED_CC_STATEMENTS = [
@@ -73,7 +72,7 @@ def formatter(statements, timestamp):
     into something we want (probably just plain text)
     Note we deal with unicode only here.
   '''
-  line = u''.join([unicode(s) for s in statements if type(s) in DISPLAYED_CC_STATEMENTS])
+  line = u''.join([str(s) for s in statements if type(s) in DISPLAYED_CC_STATEMENTS])
   return line
 
 # GLOBALS TO KEEP TRACK OF STATE
@@ -85,6 +84,7 @@ def main():
   global elapsed_time_s
   global VERBOSE
   global SILENT
+  utf8_stdout()
 
   parser = argparse.ArgumentParser(description='Draw CC Packets from MPG2 Transport Stream file.')
   parser.add_argument('infile', help='Input filename (MPEG2 Transport Stream File)', type=str)
@@ -95,10 +95,12 @@ def main():
   pid = args.pid
 
   if not os.path.exists(infilename):
-    print 'Input filename :' + infilename + " does not exist."
+    print('Input filename :' + infilename + " does not exist.")
     os.exit(-1)
 
-  for data_group in next_data_group(infilename):
+  # print out some additional info for DRCS values
+  context = Context(drcs_debug=True)
+  for data_group in next_data_group(infilename, context):
     try:
       if not data_group.is_management_data():
         #We now have a Data Group that contains caption data.
@@ -113,11 +115,9 @@ def main():
           #formatter function above. This dumps the basic text to stdout.
           cc = formatter(data_unit.payload().payload(), 0)
           if cc and VERBOSE:
-            #according to best practice, always deal internally with UNICODE, and encode to
-            #your encoding of choice as late as possible. Here, i'm encoding as UTF-8 for
-            #my command line.
-            #DECODE EARLY, ENCODE LATE
-            print(cc.encode('utf-8'))
+            #always deal internally with unicode text. print encodes it for the
+            #command line as late as possible.
+            print(cc)
       else:
         # management data
         management_data = data_group.payload()
@@ -126,7 +126,7 @@ def main():
             management_data.language_code(language) + ">")
     except EOFError:
       pass
-    except Exception, err:
+    except Exception as err:
       print("Exception thrown while handling .es datagroup post parsing.")
       traceback.print_exc(file=sys.stdout)
  
@@ -0,0 +1,383 @@
+# vim: set ts=2 expandtab:
+# -*- coding: utf-8 -*-
+'''
+Module: formats.py
+Desc: Subtitle formatters other than .ass and a registry of all formatters
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+A formatter is any object with the methods below. Any number of them can
+be fed the same decoded caption statements, so one pass over a .ts file
+can produce several output formats.
+
+  format(captions, timestamp) -- consume a list of decoded statements
+  file_written() -- whether any output has been produced
+  close() -- finish output and move it into place
+  abort() -- discard any partial output
+
+The formatters in this module reduce captions to timed cues of plain text
+lines. Cues start at one clear screen and end at the next (limited to tmax
+seconds), just as dialog does in ASSFormatter. Lines still on screen at the
+end make a last cue of tmax seconds.
+
+Plain text has no room for furigana (ruby), which are drawn in small size
+above the text they read, so text in small size is left out. A new line is
+started by each active position set, whether by APS or by the CSI sequence
+ACPS. Other CSI sequences only set up the display.
+
+'''
+import abc
+
+import arib.code_set as code_set
+import arib.control_characters as control_characters
+from arib.ass import ASSFormatter
+from arib.ass import MAX_PENDING_LINES
+from arib.ass import MAX_PENDING_CHARACTERS
+from arib.ass import CSI_APS_FINAL
+from arib.output import BufferedFile
+from arib.output import DEFAULT_FLUSH_LINES
+from arib.frozen import frozen
+
+
+def escape(s):
+  '''Escape text for XML. Not xml.sax.saxutils.escape, which would import
+  urllib and http at startup just for this.
+  '''
+  return s.replace(u'&', u'&amp;').replace(u'<', u'&lt;').replace(u'>', u'&gt;')
+
+def character(formatter, c, timestamp):
+  if not formatter._small:
+    formatter._lines[-1].append(str(c))
+
+def space(formatter, c, timestamp):
+  if not formatter._small:
+    formatter._lines[-1].append(u' ')
+
+def drcs(formatter, c, timestamp):
+  if not formatter._small:
+    formatter._lines[-1].append(u'�')
+
+def small(formatter, c, timestamp):
+  formatter._small = True
+
+def not_small(formatter, c, timestamp):
+  formatter._small = False
+
+def new_line(formatter, c, timestamp):
+  '''Any explicit positioning starts a new line of text
+  '''
+  if formatter._lines[-1]:
+    formatter._lines.append([])
+
+def control_sequence(formatter, c, timestamp):
+  if tuple(c._args[-2:]) == CSI_APS_FINAL:
+    new_line(formatter, c, timestamp)
+
+def clear_screen(formatter, c, timestamp):
+  start = formatter._elapsed_time_s
+  end = min(timestamp, start + formatter._tmax)
+  lines = [u''.join(l) for l in formatter._lines if l]
+  if lines and end > start:
+    formatter.open_file()
+    formatter._cues += 1
+    formatter._file.write(formatter.cue(formatter._cues, start, end, lines))
+  formatter._lines = [[]]
+  formatter._elapsed_time_s = timestamp
+
+
+class CaptionFormatter(abc.ABC):
+  '''Base class for formatters that write timed cues of plain text
+  Subclasses provide EXTENSION and cue(), and optionally header() and footer().
+  '''
+  EXTENSION = None
+
+  DISPLAYED_CC_STATEMENTS = frozen({
+    code_set.Kanji : character,
+    code_set.Alphanumeric : character,
+    code_set.Hiragana : character,
+    code_set.Katakana : character,
+    control_characters.SP : space,
+    control_characters.SSZ : small,
+    control_characters.MSZ : not_small,
+    control_characters.NSZ : not_small,
+    control_characters.APS : new_line,
+    control_characters.CSI : control_sequence,
+    control_characters.CS : clear_screen,
+    code_set.DRCS0 : drcs,
+    code_set.DRCS1 : drcs,
+    code_set.DRCS2 : drcs,
+    code_set.DRCS3 : drcs,
+    code_set.DRCS4 : drcs,
+    code_set.DRCS5 : drcs,
+    code_set.DRCS6 : drcs,
+    code_set.DRCS7 : drcs,
+    code_set.DRCS8 : drcs,
+    code_set.DRCS9 : drcs,
+    code_set.DRCS10 : drcs,
+    code_set.DRCS11 : drcs,
+    code_set.DRCS12 : drcs,
+    code_set.DRCS13 : drcs,
+    code_set.DRCS14 : drcs,
+    code_set.DRCS15 : drcs,
+  })
+
+  def __init__(self, tmax=5, video_filename='output', verbose=False, flush_lines=DEFAULT_FLUSH_LINES, atomic=True):
+    '''
+    :param tmax: cue display time limit (seconds)
+    :param video_filename: output filename
+    :param flush_lines: number of cues buffered before they're written to disk
+    :param atomic: only publish the file under its name once complete (see arib.output)
+    '''
+    self._tmax = tmax
+    self._filename = video_filename
+    self._verbose = verbose
+    self._flush_lines = flush_lines
+    self._atomic = atomic
+    self._file = None
+    self._lines = [[]]
+    self._elapsed_time_s = 0.0
+    self._cues = 0
+    # whether characters are in small size, i.e. furigana
+    self._small = False
+    # pending lines dropped at MAX_PENDING_LINES or MAX_PENDING_CHARACTERS
+    self.dropped_lines = 0
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    if exc_type is None:
+      self.close()
+    else:
+      self.abort()
+    return False
+
+  def header(self):
+    return u''
+
+  def footer(self):
+    return u''
+
+  @abc.abstractmethod
+  def cue(self, index, start, end, lines):
+    '''Return the formatted text of a single cue
+    :param index: 1 based cue number
+    :param start: start time in seconds
+    :param end: end time in seconds
+    :param lines: list of unicode text lines
+    '''
+
+  def open_file(self):
+    if not self._file:
+      if self._verbose:
+        print("Writing " + self.EXTENSION + " file: " + self._filename)
+      self._file = BufferedFile(self._filename, flush_lines=self._flush_lines, atomic=self._atomic)
+      self._file.write(self.header())
+
+  def file_written(self):
+    return self._file is not None
+
+  def last_cue(self):
+    '''Write the lines still waiting for a clear screen at the end as a
+    final cue, shown for tmax seconds
+    '''
+    clear_screen(self, None, self._elapsed_time_s + self._tmax)
+
+  def close(self):
+    self.last_cue()
+    if self._file:
+      self._file.write(self.footer())
+      self._file.close()
+
+  def abort(self):
+    if self._file:
+      self._file.abort()
+
+  def keep(self):
+    if self._file:
+      self._file.keep()
+
+  def rename(self, filename):
+    '''Write to another file, e.g. once the caption language is known
+    '''
+    self._filename = filename
+    if self._file:
+      self._file.rename(filename)
+
+  def format(self, captions, timestamp):
+    # each caption statement starts in normal size
+    self._small = False
+    handlers = self.DISPLAYED_CC_STATEMENTS
+    for c in captions:
+      handler = handlers.get(type(c))
+      if handler:
+        handler(self, c, timestamp)
+    if len(self._lines) > MAX_PENDING_LINES:
+      self.dropped_lines += len(self._lines) - MAX_PENDING_LINES
+      del self._lines[:-MAX_PENDING_LINES]
+    if len(self._lines[-1]) > MAX_PENDING_CHARACTERS:
+      self.dropped_lines += 1
+      self._lines[-1] = []
+
+
+def clocktime(seconds, separator=u'.'):
+  '''format floating point seconds elapsed time to 00:02:14.530
+  '''
+  ms = int(round(seconds * 1000))
+  hrs, ms = divmod(ms, 3600000)
+  mins, ms = divmod(ms, 60000)
+  secs, ms = divmod(ms, 1000)
+  return u'{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}'.format(h=hrs, m=mins, s=secs, sep=separator, ms=ms)
+
+
+class SRTFormatter(CaptionFormatter):
+  '''SubRip .srt
+  '''
+  EXTENSION = 'srt'
+
+  def cue(self, index, start, end, lines):
+    return u'{i}\n{s} --> {e}\n{t}\n\n'.format(i=index, s=clocktime(start, u','), e=clocktime(end, u','),
+      t=u'\n'.join(lines))
+
+
+class WebVTTFormatter(CaptionFormatter):
+  '''WebVTT .vtt
+  '''
+  EXTENSION = 'vtt'
+
+  def header(self):
+    return u'WEBVTT\n\n'
+
+  def cue(self, index, start, end, lines):
+    return u'{s} --> {e}\n{t}\n\n'.format(s=clocktime(start), e=clocktime(end), t=u'\n'.join(lines))
+
+
+class TTMLFormatter(CaptionFormatter):
+  '''Timed Text Markup Language .ttml
+  '''
+  EXTENSION = 'ttml'
+
+  def header(self):
+    return (u'<?xml version="1.0" encoding="utf-8"?>\n'
+      u'<tt xmlns="http://www.w3.org/ns/ttml" xml:lang="ja">\n'
+      u'<body>\n<div>\n')
+
+  def footer(self):
+    return u'</div>\n</body>\n</tt>\n'
+
+  def cue(self, index, start, end, lines):
+    return u'<p begin="{s}" end="{e}">{t}</p>\n'.format(s=clocktime(start), e=clocktime(end),
+      t=u'<br/>'.join(escape(l) for l in lines))
+
+
+class JSONLFormatter(CaptionFormatter):
+  '''One JSON object per cue per line
+  '''
+  EXTENSION = 'jsonl'
+
+  def __init__(self, *args, **kwargs):
+    CaptionFormatter.__init__(self, *args, **kwargs)
+    # imported here, once, so that only JSON output pays for importing json
+    import json
+    self._dumps = json.dumps
+
+  def cue(self, index, start, end, lines):
+    cue = {
+      'index' : index,
+      'start' : round(start, 3),
+      'end' : round(end, 3),
+      'text' : u'\n'.join(lines),
+    }
+    return self._dumps(cue, ensure_ascii=False, sort_keys=True) + u'\n'
+
+
+class TextFormatter(CaptionFormatter):
+  '''Caption text only, one line of text per line
+  '''
+  EXTENSION = 'txt'
+
+  def cue(self, index, start, end, lines):
+    return u'\n'.join(lines) + u'\n'
+
+
+# all available formatters by name
+FORMATTERS = frozen({
+  'ass' : ASSFormatter,
+  'srt' : SRTFormatter,
+  'vtt' : WebVTTFormatter,
+  'ttml' : TTMLFormatter,
+  'jsonl' : JSONLFormatter,
+  'txt' : TextFormatter,
+})
+
+def extension(name):
+  '''Filename extension for a formatter name
+  '''
+  return getattr(FORMATTERS[name], 'EXTENSION', None) or name
+
+
+class MultiFormatter(object):
+  '''Feed the same decoded captions to any number of formatters
+  '''
+  def __init__(self, formatters, metrics=None, errors=None):
+    """
+    :param metrics: optional arib.metrics.Worker counting formatted statements
+    :param errors: optional arib.error_log.ErrorLog to report dropped text to
+    """
+    self._formatters = list(formatters)
+    self._metrics = metrics
+    self._errors = errors
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    if exc_type is None:
+      self.close()
+    else:
+      self.abort()
+    return False
+
+  def formatters(self):
+    return self._formatters
+
+  def format(self, captions, timestamp):
+    if self._metrics:
+      self._metrics.inc('arib_caption_statements_total', len(captions))
+      self._metrics.set('arib_caption_last_seconds', timestamp)
+    # the same text is dropped by every formatter, so count it once
+    dropped = 0
+    for f in self._formatters:
+      before = f.dropped_lines
+      f.format(captions, timestamp)
+      dropped = max(dropped, f.dropped_lines - before)
+    if dropped:
+      if self._metrics:
+        self._metrics.inc('arib_caption_lines_dropped_total', dropped)
+      if self._errors is not None:
+        self._errors.error('lines_dropped', str(dropped) + " caption lines dropped, waiting too long for a clear screen")
+
+  def file_written(self):
+    return any(f.file_written() for f in self._formatters)
+
+  def close(self):
+    for f in self._formatters:
+      f.close()
+
+  def abort(self):
+    for f in self._formatters:
+      f.abort()
+
+  def keep(self):
+    '''Leave the partial output to be resumed from a checkpoint
+    '''
+    for f in self._formatters:
+      f.keep()
+
+  def rename(self, filenames):
+    '''Write to other files
+    :param filenames: new filename of each formatter, in order
+    '''
+    for f, filename in zip(self._formatters, filenames):
+      f.rename(filename)
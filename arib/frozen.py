@@ -0,0 +1,70 @@
+# vim: set ts=2 expandtab:
+'''
+Module: frozen.py
+Desc: Read only dictionary for the shared decoding tables
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+The code set, control character and formatter tables are shared by every
+decoder in the process, whatever thread it runs on. Making them read only
+means no decoder can change what another one sees. FrozenDict is a dict, so
+lookups keep their full speed.
+
+Tables only some streams need can be deferred, so that building them is
+not part of the import time of every command line tool.
+
+'''
+
+
+class FrozenDict(dict):
+  '''dict that can't be modified after construction
+  '''
+  def _readonly(self, *args, **kwargs):
+    raise TypeError(type(self).__name__ + ' is read only')
+
+  __setitem__ = _readonly
+  __delitem__ = _readonly
+  __ior__ = _readonly
+  clear = _readonly
+  pop = _readonly
+  popitem = _readonly
+  setdefault = _readonly
+  update = _readonly
+
+  def __repr__(self):
+    return type(self).__name__ + '(' + dict.__repr__(self) + ')'
+
+  def __reduce__(self):
+    return (type(self), (dict(self),))
+
+
+def frozen(table):
+  '''Read only copy of a table: dicts become FrozenDicts and lists tuples, at any depth
+  '''
+  if isinstance(table, dict):
+    return FrozenDict((k, frozen(v)) for k, v in table.items())
+  if isinstance(table, list):
+    return tuple(frozen(v) for v in table)
+  return table
+
+
+class deferred(object):
+  '''Class attribute holding a read only table built on first use
+  Give it (or decorate) a function returning the table, so the table
+  keeps its place and layout in the class. On first lookup its result
+  replaces the descriptor on the class, so later lookups cost nothing extra.
+  Threads racing on the first lookup may each build the table, which is
+  harmless since the results are identical.
+  '''
+  def __init__(self, build):
+    self._build = build
+    self._name = build.__name__
+
+  def __set_name__(self, owner, name):
+    self._name = name
+
+  def __get__(self, instance, owner):
+    table = frozen(self._build())
+    setattr(owner, self._name, table)
+    return table
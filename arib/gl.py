@@ -7,8 +7,7 @@ Email: oneil.john@gmail.com
 DATE: Friday, March 15th 2014
 
 '''
-import read
-
+import arib.read as read
 def in_area(b):
   '''Is this character in the GL area?
   :param b: single byte character to test
@@ -38,12 +37,7 @@ class TwoByteKanji(object):
     return 2
 
   def __str__(self):
-    '''stringify to utf-8
+    '''stringify
     '''
-    s =''.join('{:02x}'.format(a|0x80) for a in self._args)
-    #print 's ' + s
-    by = s.decode('hex')
-    decoded = by.decode('euc-jisx0213')
-    u = decoded.encode('utf-8')
-    return u
+    return bytes(a|0x80 for a in self._args).decode('euc-jisx0213')
     
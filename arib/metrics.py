@@ -0,0 +1,231 @@
+# vim: set ts=2 expandtab:
+'''
+Module: metrics.py
+Desc: Optional Prometheus text exposition of caption extraction metrics
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Only the standard library is used. Each worker (one per thread or per
+input) gets its own Worker object which only that worker writes to, so
+updates take no locks. The HTTP endpoint sums counters over all workers
+when it is scraped.
+
+  registry = Registry()
+  serve(registry, 9464)
+  ts = TS(filename)
+  ts.metrics = registry.worker(channel='nhk')
+  ts.Parse()
+
+'''
+import os
+import threading
+import time
+import http.server
+import socketserver
+
+from arib.frozen import frozen
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+
+# name : (type, help)
+METRICS = frozen({
+  'arib_ts_packets_total' : (COUNTER, 'MPEG TS packets read.'),
+  'arib_ts_bytes_total' : (COUNTER, 'MPEG TS bytes read.'),
+  'arib_ts_transport_errors_total' : (COUNTER, 'TS packets with the transport error indicator set.'),
+  'arib_ts_lag_bytes' : (GAUGE, 'Bytes between the read position and the current end of the input file.'),
+  'arib_ts_lag_seconds' : (GAUGE, 'Stream time between the read position and the current end of the input file, at the mean bitrate read so far.'),
+  'arib_pes_packets_total' : (COUNTER, 'Complete PES packets reassembled.'),
+  'arib_data_groups_total' : (COUNTER, 'Caption data groups parsed.'),
+  'arib_decode_errors_total' : (COUNTER, 'Caption data that could not be decoded, by exception type.'),
+  'arib_caption_statements_total' : (COUNTER, 'Decoded caption statements formatted.'),
+  'arib_caption_lines_dropped_total' : (COUNTER, 'Caption lines dropped for waiting too long for a clear screen.'),
+  'arib_drcs_characters_total' : (COUNTER, 'DRCS character patterns received.'),
+  'arib_drcs_unknown_total' : (COUNTER, 'DRCS character patterns not in the known character table.'),
+  'arib_caption_pid' : (GAUGE, 'PID carrying closed captions, -1 while not yet found.'),
+  'arib_caption_last_seconds' : (GAUGE, 'Stream time of the most recent caption.'),
+})
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# packets counted between updates of the shared counters
+PACKET_BATCH = 256
+
+# wall seconds between looks at the size of the input file for the lag
+LAG_INTERVAL_S = 1.0
+
+
+def escape(value):
+  return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_value(value):
+  if isinstance(value, float):
+    return repr(value)
+  return str(value)
+
+def format_labels(labels):
+  if not labels:
+    return ''
+  return '{' + ','.join('{k}="{v}"'.format(k=k, v=escape(v)) for k, v in labels) + '}'
+
+
+class Worker(object):
+  '''Metric values written by a single worker.
+  :param labels: labels added to every value, e.g. channel
+  '''
+  def __init__(self, **labels):
+    self._labels = tuple(sorted(labels.items()))
+    self._values = {}
+
+  def _key(self, name, labels):
+    if labels:
+      return (name, tuple(sorted(self._labels + tuple(labels.items()))))
+    return (name, self._labels)
+
+  def inc(self, name, value=1, **labels):
+    key = self._key(name, labels)
+    self._values[key] = self._values.get(key, 0) + value
+
+  def set(self, name, value, **labels):
+    self._values[self._key(name, labels)] = value
+
+  def values(self):
+    # copied, since the worker's thread may add keys while it is read
+    return list(self._values.items())
+
+  def packets(self, packets, filepath=None, packet_size=188, offset=0, timeline=None):
+    '''Count packets (and transport errors) read from a packet generator.
+    If filepath is given, also track how far reading lags behind the end of
+    the file, checking its size at most every LAG_INTERVAL_S.
+    :param offset: file offset the packets are read from
+    :param timeline: arib.mpeg.timeline.Timeline of the stream, to give the
+      lag in seconds of stream time as well as in bytes
+    '''
+    packets_key = self._key('arib_ts_packets_total', None)
+    bytes_key = self._key('arib_ts_bytes_total', None)
+    errors_key = self._key('arib_ts_transport_errors_total', None)
+    values = self._values
+    count = 0
+    errors = 0
+    read = 0
+    started = timeline.now() if timeline else 0.0
+    next_lag = 0.0
+    for packet in packets:
+      count += 1
+      if packet[1] & 0x80:
+        errors += 1
+      if count == PACKET_BATCH:
+        read += count * packet_size
+        values[packets_key] = values.get(packets_key, 0) + count
+        values[bytes_key] = values.get(bytes_key, 0) + count * packet_size
+        if errors:
+          values[errors_key] = values.get(errors_key, 0) + errors
+        if filepath and time.monotonic() >= next_lag:
+          next_lag = time.monotonic() + LAG_INTERVAL_S
+          self._lag(max(0, os.path.getsize(filepath) - offset - read), read, timeline, started)
+        count = 0
+        errors = 0
+      yield packet
+    values[packets_key] = values.get(packets_key, 0) + count
+    values[bytes_key] = values.get(bytes_key, 0) + count * packet_size
+    if errors:
+      values[errors_key] = values.get(errors_key, 0) + errors
+    if filepath:
+      self._lag(0, read, timeline, started)
+
+  def _lag(self, lag, read, timeline, started):
+    self.set('arib_ts_lag_bytes', lag)
+    if timeline is None:
+      return
+    # stream time read so far over the bytes it took
+    elapsed = timeline.now() - started
+    if elapsed > 0 and read:
+      self.set('arib_ts_lag_seconds', lag * elapsed / read)
+    elif not lag:
+      self.set('arib_ts_lag_seconds', 0.0)
+
+  def counted(self, name, func):
+    '''Wrap a function so that every call increments a counter
+    '''
+    key = self._key(name, None)
+    values = self._values
+
+    def wrapper(*args):
+      values[key] = values.get(key, 0) + 1
+      return func(*args)
+    return wrapper
+
+
+class Registry(object):
+  '''All workers of a process, rendered together in the text exposition format
+  '''
+  def __init__(self):
+    self._workers = []
+    self._lock = threading.Lock()
+
+  def worker(self, **labels):
+    worker = Worker(**labels)
+    # only registration locks. workers update their own values freely.
+    with self._lock:
+      self._workers.append(worker)
+    return worker
+
+  def collect(self):
+    '''Counters summed and gauges merged across all workers
+    :return: dict of name to dict of label tuples to value
+    '''
+    with self._lock:
+      workers = list(self._workers)
+    metrics = {}
+    for worker in workers:
+      for (name, labels), value in worker.values():
+        samples = metrics.setdefault(name, {})
+        if METRICS.get(name, (COUNTER,))[0] == COUNTER:
+          samples[labels] = samples.get(labels, 0) + value
+        else:
+          samples[labels] = value
+    return metrics
+
+  def exposition(self):
+    lines = []
+    for name, samples in sorted(self.collect().items()):
+      kind, description = METRICS.get(name, (GAUGE, name))
+      lines.append('# HELP {n} {h}'.format(n=name, h=description))
+      lines.append('# TYPE {n} {t}'.format(n=name, t=kind))
+      for labels, value in sorted(samples.items()):
+        lines.append('{n}{l} {v}'.format(n=name, l=format_labels(labels), v=format_value(value)))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+  def do_GET(self):
+    if self.path.split('?')[0] not in ('/', '/metrics'):
+      self.send_error(404)
+      return
+    body = self.server.registry.exposition().encode('utf-8')
+    self.send_response(200)
+    self.send_header('Content-Type', CONTENT_TYPE)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass
+
+
+class MetricsServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+  daemon_threads = True
+  allow_reuse_address = True
+
+
+def serve(registry, port, host='127.0.0.1'):
+  '''Serve the registry at http://host:port/metrics from a daemon thread
+  :return: the server. call shutdown() to stop it.
+  '''
+  server = MetricsServer((host, port), MetricsHandler)
+  server.registry = registry
+  thread = threading.Thread(target=server.serve_forever)
+  thread.daemon = True
+  thread.start()
+  return server
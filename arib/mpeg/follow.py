@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+'''
+Module: follow
+Desc: Read the TS packets of a recording that is still being written
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+A FollowReader is a packet source for TS (like arib.mpeg.reader.BlockReader)
+that keeps reading as the file grows, so captions can be extracted while a
+programme is still being recorded. At the end of what has been written so
+far it waits for more:
+
+  inotify   (Linux, through ctypes) woken as soon as the file is written to,
+            and told when the recorder closes it or it's renamed or deleted
+  polling   elsewhere, or if inotify can't be set up. Checks every
+            poll_interval seconds, and notices a rename or deletion by the
+            path no longer naming the file being read
+
+Either way it finishes once the file has been read to the end after being
+closed or renamed, or once it hasn't grown for idle_timeout seconds (a
+recorder may hold the file open after it's done with it). A partial packet
+at the end is kept until the rest of it is written.
+
+'''
+import os
+import select
+import struct
+import time
+
+from arib.mpeg.reader import BlockReader
+
+# most bytes read at once
+DEFAULT_READ_SIZE = 1024 * 1024
+
+DEFAULT_POLL_INTERVAL_S = 1.0
+DEFAULT_IDLE_TIMEOUT_S = 60.0
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+# events after which the file won't be written to any more
+IN_FINISHED = IN_CLOSE_WRITE | IN_DELETE_SELF | IN_MOVE_SELF
+# wd, mask, cookie and name length, followed by the name
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+class Inotify(object):
+  '''Waits for changes to one file with inotify
+  :raises OSError: if inotify isn't available
+  '''
+  def __init__(self, filename):
+    import ctypes
+    import ctypes.util
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+    if not hasattr(libc, 'inotify_init1'):
+      raise OSError('inotify is not available')
+    self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if self._fd < 0:
+      raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+    if libc.inotify_add_watch(self._fd, os.fsencode(filename), IN_MODIFY | IN_FINISHED) < 0:
+      errno = ctypes.get_errno()
+      os.close(self._fd)
+      raise OSError(errno, 'inotify_add_watch failed')
+
+  def wait(self, timeout):
+    '''Wait up to timeout seconds for the file to change
+    :return: whether the writer has finished with it
+    '''
+    mask = 0
+    if select.select([self._fd], [], [], timeout)[0]:
+      try:
+        events = os.read(self._fd, 4096)
+      except BlockingIOError:
+        events = b''
+      i = 0
+      while i + INOTIFY_EVENT.size <= len(events):
+        wd, event_mask, cookie, length = INOTIFY_EVENT.unpack_from(events, i)
+        mask |= event_mask
+        i += INOTIFY_EVENT.size + length
+    return bool(mask & IN_FINISHED)
+
+  def close(self):
+    os.close(self._fd)
+
+
+class Poll(object):
+  '''Waits for changes to one file by checking on it every so often
+  :param f: the open file, to tell whether the path still names it
+  '''
+  def __init__(self, filename, f, interval=DEFAULT_POLL_INTERVAL_S):
+    self._filename = filename
+    self._file = os.fstat(f.fileno())
+    self._interval = interval
+
+  def wait(self, timeout):
+    '''Wait up to timeout seconds, then check the file is still there
+    :return: whether the file has been renamed or deleted
+    '''
+    time.sleep(min(self._interval, timeout))
+    try:
+      named = os.stat(self._filename)
+    except OSError:
+      return True
+    return (named.st_dev, named.st_ino) != (self._file.st_dev, self._file.st_ino)
+
+  def close(self):
+    pass
+
+
+class FollowReader(object):
+  '''Read the packets of a .ts file as it's written
+  :param read_size: most bytes read at once
+  :param poll_interval: seconds between checks for more data without inotify
+  :param idle_timeout: finish once the file hasn't grown for this many seconds
+    (0 waits for ever, until it's closed or renamed)
+  :param inotify: use inotify where available
+  '''
+  def __init__(self, filename, read_size=DEFAULT_READ_SIZE, poll_interval=DEFAULT_POLL_INTERVAL_S,
+               idle_timeout=DEFAULT_IDLE_TIMEOUT_S, inotify=True):
+    self._filename = filename
+    self._read_size = read_size
+    self._poll_interval = poll_interval
+    self._idle_timeout = idle_timeout
+    self._inotify = inotify
+
+  def _watch(self, f):
+    if self._inotify:
+      try:
+        return Inotify(self._filename)
+      except (OSError, AttributeError):
+        pass
+    return Poll(self._filename, f, self._poll_interval)
+
+  def packets(self, start=0, skipped=None):
+    '''Generator of 188 byte packets, as bytes, until the file is finished with.
+    Lost sync is recovered just as BlockReader does.
+    :param start: file offset to start reading from
+    :param skipped: optional one item list, added to with the number of bytes
+      skipped regaining lost sync
+    '''
+    # [position, lost sync, [bytes skipped]] carried from one scan to the next
+    state = [0, False, skipped if skipped is not None else [0]]
+    tail = b''
+    with open(self._filename, 'rb', buffering=0) as f:
+      # watched before reading, so no write after the last read is missed
+      watch = self._watch(f)
+      try:
+        if start:
+          f.seek(start)
+        finished = False
+        last_data = time.time()
+        while True:
+          data = f.read(self._read_size)
+          if data:
+            last_data = time.time()
+            data = tail + data
+            state[0] = 0
+            for packet in BlockReader.scan(data, data, len(data), len(data), False, state):
+              yield packet
+            tail = data[state[0]:]
+            continue
+          if finished:
+            # read to the end after it was closed or renamed
+            break
+          timeout = self._poll_interval
+          if self._idle_timeout:
+            idle = time.time() - last_data
+            if idle >= self._idle_timeout:
+              break
+            timeout = min(timeout, self._idle_timeout - idle)
+          finished = watch.wait(timeout)
+      finally:
+        watch.close()
+    if tail:
+      state[0] = 0
+      for packet in BlockReader.scan(tail, tail, len(tail), len(tail), True, state):
+        yield packet
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+'''
+Module: psi
+Desc: MPEG ts program specific information (PAT and PMT) parsing
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+A multiplex (MPTS) carries several services (programs), each with its own
+PIDs. The PAT on PID 0 lists the PMT PID of every program, and each PMT
+lists the PIDs of the program's streams and its PCR PID. ARIB identifies
+caption and superimpose streams by the component tag of their stream
+identifier descriptor (ARIB TR-B14):
+
+  0x30 - 0x37   closed captions
+  0x38 - 0x3f   superimpose (character super)
+
+A ProgramMap follows the PAT and PMTs as TS.Parse hands it the packets of
+their PIDs. Tables are repeated every 100ms or so, but a section that is
+byte for byte the last one seen is dropped before any CRC check or parsing,
+so following them costs next to nothing. Other tables can be followed with
+watch().
+
+'''
+import zlib
+from collections import namedtuple
+
+from arib.mpeg.ts import TS
+
+PAT_PID = 0x0000
+
+STREAM_IDENTIFIER_DESCRIPTOR = 0x52
+CAPTION = 'caption'
+SUPERIMPOSE = 'superimpose'
+
+# header bytes before section_length counts
+SECTION_HEADER_SIZE = 3
+# set in the second byte of long form sections, which carry a CRC
+SECTION_SYNTAX_INDICATOR = 0x80
+# table id to last_section_number of long form sections
+LONG_HEADER_SIZE = 8
+CRC_SIZE = 4
+STUFFING = 0xff
+
+# CRC32/MPEG-2 is CRC32 with unreflected bits and no final xor. zlib's CRC32
+# reflects them, so feeding it bit reversed bytes and reversing the result
+# gives the MPEG-2 CRC at C speed.
+_REVERSED = bytes(int('{b:08b}'.format(b=b)[::-1], 2) for b in range(256))
+
+def crc32(data):
+  '''CRC32/MPEG-2 of a PSI section. 0 over a whole intact section.
+  '''
+  crc = zlib.crc32(bytes(data).translate(_REVERSED)) ^ 0xffffffff
+  return int('{c:032b}'.format(c=crc)[::-1], 2)
+
+
+class Sections(object):
+  '''Reassembles the PSI sections of one PID from its TS packets
+  '''
+  def __init__(self):
+    self._buffer = None
+
+  def push(self, packet):
+    '''Add a TS packet
+    :return: list of the sections it completed, as bytes
+    '''
+    sections = []
+    payload = TS.get_payload(packet)
+    if TS.get_payload_start(packet):
+      if not payload:
+        return sections
+      pointer = payload[0]
+      if self._buffer is not None:
+        # the end of the section in progress comes before the pointer
+        self._buffer += payload[1:1 + pointer]
+        self._complete(sections)
+      self._buffer = bytearray(payload[1 + pointer:])
+    elif self._buffer is not None:
+      self._buffer += payload
+    else:
+      return sections
+    self._complete(sections)
+    return sections
+
+  def _complete(self, sections):
+    buffer = self._buffer
+    while len(buffer) >= SECTION_HEADER_SIZE and buffer[0] != STUFFING:
+      end = SECTION_HEADER_SIZE + (((buffer[1] & 0x0f) << 8) | buffer[2])
+      if len(buffer) < end:
+        return
+      sections.append(bytes(buffer[:end]))
+      del buffer[:end]
+    if buffer[:1] == bytes([STUFFING]):
+      # the rest of the packet is stuffing
+      self._buffer = None
+
+
+Stream = namedtuple('Stream', ['stream_type', 'pid', 'component_tag'])
+Stream.__doc__ = '''Elementary stream of a program. component_tag is None
+without a stream identifier descriptor.'''
+
+
+def descriptors(data):
+  '''(tag, body) of each descriptor in a descriptor loop
+  '''
+  i = 0
+  while i + 2 <= len(data):
+    tag = data[i]
+    length = data[i + 1]
+    yield tag, data[i + 2:i + 2 + length]
+    i += 2 + length
+
+
+class PAT(object):
+  '''Program association table section (ISO 13818-1 2.4.4.3)
+  '''
+  TABLE_ID = 0x00
+
+  def __init__(self, section):
+    self.transport_stream_id = (section[3] << 8) | section[4]
+    self.version = (section[5] >> 1) & 0x1f
+    self.section_number = section[6]
+    # PMT PID by program number. Program 0 is the network PID.
+    self.programs = {}
+    for i in range(LONG_HEADER_SIZE, len(section) - CRC_SIZE - 3, 4):
+      program_number = (section[i] << 8) | section[i + 1]
+      if program_number:
+        self.programs[program_number] = ((section[i + 2] & 0x1f) << 8) | section[i + 3]
+
+
+class PMT(object):
+  '''Program map table section (ISO 13818-1 2.4.4.8)
+  '''
+  TABLE_ID = 0x02
+
+  def __init__(self, section):
+    self.program_number = (section[3] << 8) | section[4]
+    self.version = (section[5] >> 1) & 0x1f
+    self.pcr_pid = ((section[8] & 0x1f) << 8) | section[9]
+    program_info_length = ((section[10] & 0x0f) << 8) | section[11]
+    self.streams = []
+    i = 12 + program_info_length
+    end = len(section) - CRC_SIZE
+    while i + 5 <= end:
+      stream_type = section[i]
+      pid = ((section[i + 1] & 0x1f) << 8) | section[i + 2]
+      info_length = ((section[i + 3] & 0x0f) << 8) | section[i + 4]
+      component_tag = None
+      for tag, body in descriptors(section[i + 5:i + 5 + info_length]):
+        if tag == STREAM_IDENTIFIER_DESCRIPTOR and body:
+          component_tag = body[0]
+      self.streams.append(Stream(stream_type, pid, component_tag))
+      i += 5 + info_length
+
+  def caption_streams(self):
+    '''(kind, Stream) of the caption and superimpose streams, in PMT order
+    '''
+    return [(caption_kind(s), s) for s in self.streams if caption_kind(s)]
+
+
+def caption_kind(stream):
+  '''CAPTION, SUPERIMPOSE or None for a PMT stream, from its component tag
+  '''
+  tag = stream.component_tag
+  if tag is None:
+    return None
+  if 0x30 <= tag <= 0x37:
+    return CAPTION
+  if 0x38 <= tag <= 0x3f:
+    return SUPERIMPOSE
+  return None
+
+
+class ProgramMap(object):
+  '''
+  Follows the PAT and PMTs of a transport stream. Give it to TS (as ts.psi)
+  and TS.Parse hands it the packets of every PID in pids.
+  OnPMT(pmt) is called whenever a program map is new or has changed.
+  A new version of the PAT replaces the programs listed by the last one:
+  PMT PIDs and programs it no longer lists are dropped.
+  '''
+  def __init__(self):
+    # PIDs of the tables followed. TS.Parse keeps a reference, so it's only
+    # ever changed in place.
+    self.pids = set([PAT_PID])
+    # PMT by program number
+    self.programs = {}
+    self.OnPMT = None
+    # program number by PMT PID, from the PAT sections of the current version
+    self._pmt_pids = {}
+    self._pat_sections = {}
+    self._sections = {}
+    self._last = {}
+    self._watchers = {}
+
+  def watch(self, pid, callback, table_ids=None):
+    '''Also follow the sections of another PID, e.g. the SDT or EIT.
+    callback(pid, section) gets every new intact section.
+    :param table_ids: only these tables, so others sharing the PID (e.g. EIT
+      schedules) are dropped before any CRC check
+    '''
+    self._watchers[pid] = (callback, table_ids)
+    self.pids.add(pid)
+
+  def checkpoint(self):
+    '''Tables seen and sections in progress, to carry on from in another run.
+    Callbacks aren't included.
+    '''
+    return {
+      'pids': self.pids,
+      'programs': self.programs,
+      'pmt_pids': self._pmt_pids,
+      'pat_sections': self._pat_sections,
+      'sections': self._sections,
+      'last': self._last,
+    }
+
+  def restore(self, state):
+    self.pids.update(state['pids'])
+    self.programs = state['programs']
+    self._pmt_pids = state['pmt_pids']
+    self._pat_sections = state['pat_sections']
+    self._sections = state['sections']
+    self._last = state['last']
+
+  def packet(self, pid, packet):
+    sections = self._sections.get(pid)
+    if sections is None:
+      sections = self._sections[pid] = Sections()
+    for section in sections.push(packet):
+      self.section(pid, section)
+
+  def section(self, pid, section):
+    table_id = section[0]
+    watcher = self._watchers.get(pid)
+    if watcher and watcher[1] is not None and table_id not in watcher[1]:
+      return
+    if section[1] & SECTION_SYNTAX_INDICATOR:
+      if len(section) < LONG_HEADER_SIZE + CRC_SIZE:
+        return
+      # table id, table id extension and section number
+      key = (pid, table_id, section[3], section[4], section[6])
+      if self._last.get(key) == section:
+        return
+      if crc32(section):
+        return
+    else:
+      # short form, e.g. the TDT, which has no CRC
+      key = (pid, table_id)
+      if self._last.get(key) == section:
+        return
+    self._last[key] = section
+    try:
+      if pid == PAT_PID and table_id == PAT.TABLE_ID:
+        self._pat(PAT(section))
+      elif pid in self._pmt_pids and table_id == PMT.TABLE_ID:
+        self._pmt(PMT(section))
+      elif watcher:
+        watcher[0](pid, section)
+    except (IndexError, ValueError):
+      # intact but not what it claims to be
+      pass
+
+  def _pat(self, pat):
+    if any(s.version != pat.version for s in self._pat_sections.values()):
+      self._pat_sections = {}
+    self._pat_sections[pat.section_number] = pat
+    pmt_pids = {}
+    for section in self._pat_sections.values():
+      for program_number, pmt_pid in section.programs.items():
+        pmt_pids[pmt_pid] = program_number
+    for pid in set(self._pmt_pids) - set(pmt_pids):
+      # forget all about it, so a PMT there is new should it come back
+      if pid not in self._watchers and pid != PAT_PID:
+        self.pids.discard(pid)
+      self._sections.pop(pid, None)
+      for key in [key for key in self._last if key[0] == pid]:
+        del self._last[key]
+    listed = set(pmt_pids.values())
+    for program_number in [n for n in self.programs if n not in listed]:
+      del self.programs[program_number]
+    self._pmt_pids = pmt_pids
+    self.pids.update(pmt_pids)
+
+  def _pmt(self, pmt):
+    self.programs[pmt.program_number] = pmt
+    if self.OnPMT:
+      self.OnPMT(pmt)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+'''
+Module: reader
+Desc: Large block MPEG ts file reader
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+An alternative to memory mapping the .ts file. The file is read with
+readinto() in large blocks (8MB by default) into a small ring of reusable
+bytearrays. Packets are handed out either as memoryview slices of those
+blocks, or (the default, which is faster to parse) as bytes slices of a
+single copy of each block. Large sequential reads suit
+readahead on network filesystems far better than page faulting through a
+memory map. An optional prefetch thread reads the next blocks while the
+current one is being parsed; reads release the GIL, so disk or network
+latency overlaps with parsing.
+
+Packets are only valid until the next block is read. Copy any packet data
+that has to be kept (e.g. with tobytes()).
+
+'''
+import os
+import io
+import threading
+import queue
+
+PACKET_SIZE = 188
+SYNC_BYTE = 0x47
+
+# 1024 packets are exactly 47 pages of 4096 bytes, so blocks of a multiple
+# of this size keep reads both packet and page aligned.
+BLOCK_ALIGNMENT = PACKET_SIZE * 1024
+
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024
+
+# number of blocks read ahead by the prefetch thread
+DEFAULT_PREFETCH_BLOCKS = 2
+
+# seconds between checks whether the consumer has gone away
+PREFETCH_POLL_S = 0.1
+
+
+def aligned_block_size(block_size):
+  '''Round a block size down to a multiple of BLOCK_ALIGNMENT (at least one)
+  '''
+  return max(1, block_size // BLOCK_ALIGNMENT) * BLOCK_ALIGNMENT
+
+
+def copy(data):
+  '''bytes copy of a memoryview (bytes are returned as they are)
+  '''
+  if isinstance(data, memoryview):
+    return data.tobytes()
+  return data
+
+
+class BlockReader(object):
+  '''Read an MPEG ts file in large aligned blocks
+  :param block_size: bytes per read, rounded down to a multiple of BLOCK_ALIGNMENT
+  :param prefetch: number of blocks to read ahead on a background thread (0 for none)
+  :param views: yield packets as memoryviews of the read buffers rather than bytes
+  '''
+  def __init__(self, filename, block_size=DEFAULT_BLOCK_SIZE, prefetch=0, views=False):
+    self._filename = filename
+    self._views = views
+    self._block_size = aligned_block_size(block_size)
+    self._prefetch = prefetch
+    # the consumer holds one block and the reader fills another while
+    # up to prefetch more wait in the queue.
+    count = prefetch + 2 if prefetch else 1
+    self._blocks = [bytearray(self._block_size) for i in range(count)]
+
+  def block_size(self):
+    return self._block_size
+
+  def _fill(self, f, block):
+    '''Fill a block from the file, looping over short reads
+    :return: number of bytes read. less than the block size only at end of file
+    '''
+    view = memoryview(block)
+    filled = 0
+    while filled < len(block):
+      n = f.readinto(view[filled:])
+      if not n:
+        break
+      filled += n
+    return filled
+
+  def _read_blocks(self, f, start=0):
+    fadvise = getattr(os, 'posix_fadvise', None)
+    if fadvise:
+      fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    offset = start
+    i = 0
+    while True:
+      block = self._blocks[i]
+      n = self._fill(f, block)
+      if fadvise and offset:
+        # pages of the previous block are no longer needed
+        fadvise(f.fileno(), 0, offset, os.POSIX_FADV_DONTNEED)
+      offset += n
+      if not n:
+        return
+      yield i, n
+      i = (i + 1) % len(self._blocks)
+
+  def _prefetch_blocks(self, f, start=0):
+    '''Read blocks on a background thread, at most prefetch blocks ahead
+    '''
+    blocks = queue.Queue(self._prefetch)
+    stop = threading.Event()
+
+    def put(item):
+      while not stop.is_set():
+        try:
+          blocks.put(item, timeout=PREFETCH_POLL_S)
+          return True
+        except queue.Full:
+          pass
+      return False
+
+    def producer():
+      try:
+        for item in self._read_blocks(f, start):
+          if not put(item):
+            return
+        put(None)
+      except Exception as ex:
+        put(ex)
+
+    thread = threading.Thread(target=producer)
+    thread.daemon = True
+    thread.start()
+    try:
+      while True:
+        item = blocks.get()
+        if item is None:
+          return
+        if isinstance(item, Exception):
+          raise item
+        yield item
+    finally:
+      stop.set()
+      thread.join()
+
+  def _filled_blocks(self, start=0):
+    with io.open(self._filename, 'rb', buffering=0) as f:
+      if start:
+        f.seek(start)
+      if self._prefetch:
+        items = self._prefetch_blocks(f, start)
+      else:
+        items = self._read_blocks(f, start)
+      for i, n in items:
+        yield self._blocks[i], n
+
+  def blocks(self):
+    '''Generator of memoryviews of successive blocks of the file.
+    Each is only valid until the next is requested.
+    '''
+    for block, n in self._filled_blocks():
+      yield memoryview(block)[:n]
+
+  def packets(self, start=0, skipped=None):
+    '''Generator of 188 byte packets, as bytes or memoryview slices.
+    Lost sync is recovered at the next sync byte that is followed by another
+    one a packet later (or by the end of the file), just as TS.next_packet does.
+    :param start: file offset to start reading from
+    :param skipped: optional one item list, added to with the number of bytes
+      skipped regaining lost sync
+    '''
+    # [position, lost sync, [bytes skipped]] carried from one scan to the next
+    state = [0, False, skipped if skipped is not None else [0]]
+    tail = b''
+    for block, n in self._filled_blocks(start):
+      if self._views:
+        view = memoryview(block)
+      else:
+        block = view = memoryview(block)[:n].tobytes()
+      state[0] = 0
+      if tail:
+        # packets straddling two blocks (only after a lost sync) are copied
+        joined = tail + copy(view[:min(n, 2 * PACKET_SIZE)])
+        for packet in BlockReader.scan(joined, joined, len(tail), len(joined), False, state):
+          yield packet
+        if state[0] < len(tail):
+          tail = tail[state[0]:] + copy(view[:n])
+          continue
+        state[0] -= len(tail)
+      for packet in BlockReader.scan(block, view, n, n, False, state):
+        yield packet
+      tail = copy(view[state[0]:n])
+    if tail:
+      state[0] = 0
+      for packet in BlockReader.scan(tail, tail, len(tail), len(tail), True, state):
+        yield packet
+
+  @staticmethod
+  def scan(data, view, limit, n, final, state):
+    '''Yield the packets of data starting before limit
+    :param data: bytearray or bytes of n bytes
+    :param view: the same data to slice packets from
+    :param final: whether the data runs to the end of the file
+    :param state: [start position, lost sync, [bytes skipped]]. updated to
+      where scanning stopped, which is where the next scan must carry on.
+    '''
+    i, lost, skipped = state
+    while i < limit:
+      if lost:
+        # the next sync byte followed by another one a packet later
+        j = data.find(SYNC_BYTE, i, n)
+        while j >= 0 and j + PACKET_SIZE < n and data[j + PACKET_SIZE] != SYNC_BYTE:
+          j = data.find(SYNC_BYTE, j + 1, n)
+        if j < 0:
+          skipped[0] += n - i
+          i = n
+          break
+        skipped[0] += j - i
+        i = j
+        if j + PACKET_SIZE >= n and not final:
+          # can't tell yet whether this is a real sync byte
+          break
+        lost = False
+      if i + PACKET_SIZE > n and not (final and view[i] != SYNC_BYTE):
+        # the rest waits for the next block, or at the end of the file is a
+        # partial packet. garbage before one is skipped all the same
+        break
+      if view[i] != SYNC_BYTE:
+        lost = True
+        skipped[0] += 1
+        i += 1
+        continue
+      yield view[i:i + PACKET_SIZE]
+      i += PACKET_SIZE
+    state[0] = i
+    state[1] = lost
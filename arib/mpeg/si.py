@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+'''
+Module: si
+Desc: ARIB service information (SDT, EIT present/following, TDT/TOT) parsing
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Broadcast recordings carry a programme guide alongside the programmes:
+
+  SDT       service names (ARIB STD-B10 5.2.6)
+  EIT p/f   the present and following event (programme) of each service,
+            with its title, start time and duration (5.2.7)
+  TDT/TOT   the current date and time, JST (5.2.8, 5.2.9)
+
+A Guide follows these through an arib.mpeg.psi.ProgramMap. Event times are
+wall clock times, so each TDT/TOT is tied to the stream time of every
+timeline as it arrives, which places any stream time on the wall clock and
+so within a programme.
+
+'''
+from collections import namedtuple
+import datetime
+
+from arib.decoder import decode_text
+from arib.mpeg.psi import descriptors
+
+SDT_PID = 0x0011
+EIT_PID = 0x0012
+TDT_PID = 0x0014
+
+SERVICE_DESCRIPTOR = 0x48
+SHORT_EVENT_DESCRIPTOR = 0x4d
+
+# EIT sections of the present and following events
+PRESENT = 0
+FOLLOWING = 1
+
+Service = namedtuple('Service', ['service_id', 'provider', 'name'])
+
+Event = namedtuple('Event', ['service_id', 'event_id', 'start', 'duration', 'title'])
+Event.__doc__ = '''Programme from the EIT. start is a naive JST datetime and
+duration in seconds, either None if undefined.'''
+
+
+def bcd(b):
+  return (b >> 4) * 10 + (b & 0x0f)
+
+
+def mjd_time(data):
+  '''datetime of a 40 bit MJD date and BCD time, None if undefined (all 1s)
+  '''
+  if data[:5] == b'\xff\xff\xff\xff\xff':
+    return None
+  mjd = (data[0] << 8) | data[1]
+  date = datetime.date(1858, 11, 17) + datetime.timedelta(days=mjd)
+  return datetime.datetime(date.year, date.month, date.day, bcd(data[2]), bcd(data[3]), bcd(data[4]))
+
+
+def bcd_duration(data):
+  '''Seconds of a 24 bit BCD hhmmss duration, None if undefined (all 1s)
+  '''
+  if data[:3] == b'\xff\xff\xff':
+    return None
+  return bcd(data[0]) * 3600 + bcd(data[1]) * 60 + bcd(data[2])
+
+
+class SDT(object):
+  '''Service description table section, actual transport stream
+  '''
+  TABLE_ID = 0x42
+
+  def __init__(self, section):
+    self.transport_stream_id = (section[3] << 8) | section[4]
+    # Service by service id
+    self.services = {}
+    i = 11
+    end = len(section) - 4
+    while i + 5 <= end:
+      service_id = (section[i] << 8) | section[i + 1]
+      length = ((section[i + 3] & 0x0f) << 8) | section[i + 4]
+      provider = name = u''
+      for tag, body in descriptors(section[i + 5:i + 5 + length]):
+        if tag == SERVICE_DESCRIPTOR:
+          provider_length = body[1]
+          provider = decode_text(body[2:2 + provider_length])
+          name_length = body[2 + provider_length]
+          name = decode_text(body[3 + provider_length:3 + provider_length + name_length])
+      self.services[service_id] = Service(service_id, provider, name)
+      i += 5 + length
+
+
+class EIT(object):
+  '''Event information table section, present/following of the actual
+  transport stream. Section 0 holds the present event, section 1 the following.
+  '''
+  TABLE_ID = 0x4e
+
+  def __init__(self, section):
+    self.service_id = (section[3] << 8) | section[4]
+    self.section_number = section[6]
+    self.events = []
+    i = 14
+    end = len(section) - 4
+    while i + 12 <= end:
+      event_id = (section[i] << 8) | section[i + 1]
+      start = mjd_time(section[i + 2:i + 7])
+      duration = bcd_duration(section[i + 7:i + 10])
+      length = ((section[i + 10] & 0x0f) << 8) | section[i + 11]
+      title = u''
+      for tag, body in descriptors(section[i + 12:i + 12 + length]):
+        if tag == SHORT_EVENT_DESCRIPTOR:
+          # ISO 639 language code, then the event name
+          title = decode_text(body[4:4 + body[3]])
+      self.events.append(Event(self.service_id, event_id, start, duration, title))
+      i += 12 + length
+
+
+# TDT is the time alone, TOT adds local time offsets
+TDT_TABLE_ID = 0x70
+TOT_TABLE_ID = 0x73
+
+def section_time(section):
+  '''JST datetime of a TDT or TOT section
+  '''
+  return mjd_time(section[3:8])
+
+
+class Guide(object):
+  '''
+  Follows the SDT, EIT present/following and TDT/TOT of a transport stream.
+  :param psi: arib.mpeg.psi.ProgramMap handed the packets by TS.Parse
+  :param ts: the TS, whose timelines are tied to the wall clock
+  '''
+  def __init__(self, psi, ts):
+    self._ts = ts
+    # Service by service id
+    self.services = {}
+    # present and following Event by service id
+    self.events = {}
+    # latest wall clock time and the stream time of each timeline then
+    self._wall = None
+    psi.watch(SDT_PID, self._sdt, (SDT.TABLE_ID,))
+    psi.watch(EIT_PID, self._eit, (EIT.TABLE_ID,))
+    psi.watch(TDT_PID, self._time, (TDT_TABLE_ID, TOT_TABLE_ID))
+
+  def checkpoint(self):
+    '''Services, events and wall clock so far, to carry on from in another
+    run. Pickled along with the TS checkpoint, so the timelines are the same.
+    '''
+    return {'services': self.services, 'events': self.events, 'wall': self._wall}
+
+  def restore(self, state):
+    self.services = state['services']
+    self.events = state['events']
+    self._wall = state['wall']
+
+  def _sdt(self, pid, section):
+    self.services.update(SDT(section).services)
+
+  def _eit(self, pid, section):
+    eit = EIT(section)
+    if eit.section_number in (PRESENT, FOLLOWING) and eit.events:
+      self.events.setdefault(eit.service_id, {})[eit.section_number] = eit.events[0]
+
+  def _time(self, pid, section):
+    wall = section_time(section)
+    if wall is None:
+      return
+    timelines = [self._ts.timeline] + list(self._ts.timelines.values())
+    self._wall = (wall, [(clock, clock.now()) for clock in timelines])
+
+  def wall_time(self, clock, seconds):
+    '''JST datetime of a stream time on a timeline, None until a TDT/TOT is seen
+    '''
+    if self._wall is None:
+      return None
+    wall, times = self._wall
+    for timeline, now in times:
+      if timeline is clock:
+        return wall + datetime.timedelta(seconds=seconds - now)
+    return None
+
+  def event(self, service_id, wall=None):
+    '''Event of a service on air at a wall clock time, or the present event
+    if the time is unknown or outside both the present and following events.
+    None before the service's EIT is seen.
+    '''
+    events = self.events.get(service_id)
+    if not events:
+      return None
+    if wall is not None:
+      for number in (FOLLOWING, PRESENT):
+        event = events.get(number)
+        if event and event.start is not None and event.start <= wall and (
+          event.duration is None or wall < event.start + datetime.timedelta(seconds=event.duration)):
+          return event
+    return events.get(PRESENT) or events.get(FOLLOWING)
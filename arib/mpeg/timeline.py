@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+'''
+Module: timeline
+Desc: Monotonic media clock from 33 bit MPEG PCR and PTS values
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+PCR bases and PTS values are 33 bit counts of a 90kHz clock, so they wrap
+to zero about every 26.5 hours. Recordings are also spliced (commercial
+breaks, channel changes, concatenated files) with the clock jumping to an
+unrelated value, flagged by the discontinuity_indicator of the adaptation
+field, or not flagged at all.
+
+A Timeline follows the PCR of a program and keeps a media time that only
+ever moves forward:
+
+  * each PCR advances media time by its distance from the previous PCR,
+    taken modulo 2^33, so wraparound is invisible
+  * a flagged discontinuity, a backwards step or a jump larger than
+    max_gap is a splice: media time carries on from where it was
+  * a PTS is placed relative to the latest PCR, so it follows the clock
+    of the segment it belongs to
+
+Every sample is O(1). Before the first PCR (or in streams without one)
+PTS values themselves are followed the same way, minus the max_gap check:
+a backwards step is a splice, so media time never goes back. The first PCR
+then carries on from the last PTS, unless it is more than max_gap away.
+
+'''
+
+CLOCK = 90000
+WRAP = 1 << 33
+HALF_WRAP = 1 << 32
+
+# PCRs are at most 100ms apart (ISO 13818-1 2.7.2). Larger jumps are taken
+# as splices, unless packets were lost for longer than this.
+DEFAULT_MAX_GAP_S = 5.0
+
+
+def delta(t1, t2):
+  '''Signed distance from t1 to t2 of two 33 bit clock values,
+  assuming they are less than half the wrap period (13.25 hours) apart.
+  '''
+  return (t2 - t1 + HALF_WRAP) % WRAP - HALF_WRAP
+
+
+class Timeline(object):
+  '''
+  :param max_gap_s: largest forward PCR step (seconds) not taken as a splice
+  '''
+  def __init__(self, max_gap_s=DEFAULT_MAX_GAP_S):
+    self._max_gap = int(max_gap_s * CLOCK)
+    # latest reference sample (33 bit) and its media time in 90kHz ticks
+    self._reference = None
+    self._media = 0
+    self._has_pcr = False
+    self.wraps = 0
+    self.discontinuities = 0
+
+  def pcr(self, pcr, discontinuity=False):
+    '''Add a PCR base sample
+    :param discontinuity: discontinuity_indicator of the packet carrying it
+    '''
+    if self._reference is None:
+      self._reference = pcr
+      self._has_pcr = True
+      return
+    step = delta(self._reference, pcr)
+    if not self._has_pcr:
+      # the reference so far was a PTS, which leads the PCR a little, so a
+      # small step back is no splice. One larger than max_gap either way is.
+      self._has_pcr = True
+      if discontinuity or abs(step) > self._max_gap:
+        self.discontinuities += 1
+        step = 0
+      step = max(0, step)
+    elif discontinuity or step < 0 or step > self._max_gap:
+      self.discontinuities += 1
+      step = 0
+    if pcr < self._reference and step > 0:
+      self.wraps += 1
+    self._reference = pcr
+    self._media += step
+
+  def time(self, pts):
+    '''Media time in seconds of a PTS (never negative)
+    '''
+    if not self._has_pcr:
+      if self._reference is not None:
+        step = delta(self._reference, pts)
+        if step < 0:
+          self.discontinuities += 1
+          step = 0
+        if pts < self._reference and step > 0:
+          self.wraps += 1
+        self._media += step
+      self._reference = pts
+      return self._media / float(CLOCK)
+    return max(0, self._media + delta(self._reference, pts)) / float(CLOCK)
+
+  def now(self):
+    '''Media time in seconds of the latest sample
+    '''
+    return self._media / float(CLOCK)
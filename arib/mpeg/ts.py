@@ -6,48 +6,70 @@ Author: John O'Neil
 Email: oneil.john@gmail.com
 DATE: Thursday, October 20th 2016
 
+Packets are bytes (or memoryviews of a read buffer) and are parsed in
+place: indexing gives ints and fields are read with int.from_bytes.
+
 '''
 import os
 import sys
 import argparse
-import struct
 
 # memorymap file on 64 bit systems
 import mmap
 
+import arib.mpeg.timeline as timeline
+
 
 class ES:
   """ very minimalistic Elementary Stream handling
   """
+  PACKET_START_CODE_PREFIX = b'\x00\x00\x01'
+  # PES packet length of 0 (video only) means unbounded, i.e. 6 header bytes
+  UNBOUNDED_PES_PACKET_SIZE = 6
+  MAX_PES_PACKET_SIZE = 0xffff + 6
   STREAM_ID_INDEX = 3
+  # stream id of synchronized PES, carrying ARIB closed captions
+  PRIVATE_STREAM_1 = 0xbd
+  # stream id of asynchronous PES, carrying ARIB superimpose (character super)
+  PRIVATE_STREAM_2 = 0xbf
+  # stream ids of PES without the optional header (ISO 13818-1 2.4.3.7):
+  # program stream map, padding, private_stream_2, ECM, EMM, directory,
+  # DSM-CC and H.222.1 type E. Their data follows the packet length.
+  NO_OPTIONAL_HEADER_STREAM_IDS = frozenset([0xbc, 0xbe, 0xbf, 0xf0, 0xf1, 0xf2, 0xf8, 0xff])
+
+  # optional PES header: '10' marker bits, then PTS_DTS_flags
+  OPTIONAL_HEADER_INDEX = 6
+  OPTIONAL_HEADER_MASK = 0xc0
+  OPTIONAL_HEADER_MARKER = 0x80
+  PTS_FLAG_INDEX = 7
+  PTS_FLAG_MASK = 0x80
+  PTS_INDEX = 9
+  PTS_SIZE_BYTES = 5
 
   @staticmethod
   def pes_packet_check_formedness(payload):
     """ Check formedness of pes packet and indicate we have the entire payload
     """
-    b1 = ord(payload[0])
-    b2 = ord(payload[1])
-    b3 = ord(payload[2])
-
-    b4 = ord(payload[3])
-    if b1 != 0 or b2 != 0 or b3 != 1:
-      return False
-    return True
+    return payload[:3] == ES.PACKET_START_CODE_PREFIX
 
   @staticmethod
   def get_pes_stream_id(payload):
-    return ord(payload[ES.STREAM_ID_INDEX])
+    return payload[ES.STREAM_ID_INDEX]
 
   @staticmethod
   def get_pes_packet_length(payload):
     if len(payload)<6:
       return 0
     # we add 6 for start code, stream id and pes packet length itself
-    return struct.unpack('>H', payload[4:6])[0] + 6
+    return ((payload[4] << 8) | payload[5]) + 6
+
+  @staticmethod
+  def has_optional_header(payload):
+    return payload[ES.STREAM_ID_INDEX] not in ES.NO_OPTIONAL_HEADER_STREAM_IDS
 
   @staticmethod
   def get_pes_flags(payload):
-    return struct.unpack('>H', payload[6:8])[0]
+    return (payload[6] << 8) | payload[7]
 
   @staticmethod
   def get_pes_header_length(payload):
@@ -56,7 +78,27 @@ class ES:
     # value at byte 8 gives the remaining bytes in the header including stuffing
     if len(payload) < 9:
       return 0
-    return 6 + 3 + ord(payload[8])
+    if not ES.has_optional_header(payload):
+      return ES.OPTIONAL_HEADER_INDEX
+    return 6 + 3 + payload[8]
+
+  @staticmethod
+  def get_pes_pts(payload):
+    """ Get the 33 bit Presentation Time Stamp (90kHz) of a PES packet.
+    Returns None if the packet has no PTS.
+    """
+    if len(payload) < ES.PTS_INDEX + ES.PTS_SIZE_BYTES:
+      return None
+    if not ES.has_optional_header(payload):
+      # e.g. private_stream_2, whose data could pass for the marker bits
+      return None
+    if payload[ES.OPTIONAL_HEADER_INDEX] & ES.OPTIONAL_HEADER_MASK != ES.OPTIONAL_HEADER_MARKER:
+      return None
+    if not payload[ES.PTS_FLAG_INDEX] & ES.PTS_FLAG_MASK:
+      return None
+    p = payload[ES.PTS_INDEX:ES.PTS_INDEX + ES.PTS_SIZE_BYTES]
+    # 3 + 15 + 15 bits, each followed by a marker bit
+    return ((p[0] & 0x0e) << 29) | (p[1] << 22) | ((p[2] & 0xfe) << 14) | (p[3] << 7) | (p[4] >> 1)
 
   @staticmethod
   def get_pes_payload_length(payload):
@@ -78,10 +120,13 @@ class TS(object):
   """ very minimalistic Transport stream handling
   """
   PACKET_SIZE = 188
+
+  # read buffer size used when streaming rather than memory mapping
+  STREAM_WINDOW = 4 * 1024 * 1024
   
   # Sync byte
   SYNC_BYTE_INDEX = 0
-  SYNC_BYTE = 'G'
+  SYNC_BYTE = 0x47
   
   # Transport Error Indicator (TEI)
   TEI_INDEX = 1
@@ -107,6 +152,8 @@ class TS(object):
   ADAPTATION_FIELD_ONLY = 0b10
   ADAPTATION_FIELD_AND_PAYLOAD = 0b11
   ADAPTATION_FIELD_RESERVED = 0b00
+  # set in both control values with an adaptation field
+  ADAPTATION_FIELD_PRESENT_MASK = 0x20
 
   # Continuity counter
   CONTINUITY_COUNTER_INDEX = 3
@@ -116,6 +163,10 @@ class TS(object):
   ADAPTATION_FIELD_LENGTH_INDEX = 4
   ADAPTATION_FIELD_DATA_INDEX = 5
 
+  # Discontinuity indicator: the PCR (and PTS) time base changes at this packet
+  # Tagged in ADAPTATION_FIELD_DATA_INDEX byte
+  DISCONTINUITY_MASK = 0x80
+
   # Program Clock Reference (PCR)
   # Present flag tagged in ADAPTATION_FIELD_DATA_INDEX byte
   PCR_FLAG_MASK = 0x10
@@ -123,44 +174,85 @@ class TS(object):
   PCR_SIZE_BYTES = 6
 
   @staticmethod
-  def next_packet(filename, memorymap=True):
+  def next_packet(filename, memorymap=True, window=None, start=0, skipped=None):
     """ Generator to remove a series of TS packets from a TS file
+    :param window: stream the file through a read buffer of this many bytes
+      instead of memory mapping all of it. Pages already read are dropped from
+      the page cache as we go (where posix_fadvise is available), so memory
+      use stays bounded however long the recording is.
+    :param start: file offset to start reading from
+    :param skipped: optional one item list, added to with the number of bytes
+      skipped regaining lost sync
     """
-    with open(filename, 'rb') as f:
+    with open(filename, 'rb', window or -1) as f:
       
       #memory map the file if necessary (prob requires 64 bit systems)
       _file = f
-      if memorymap:
+      if memorymap and not window:
         _file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
-      
+
+      fadvise = getattr(os, 'posix_fadvise', None) if window else None
+      if fadvise:
+        fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+      unreleased = 0
+      if start:
+        _file.seek(start)
+
       while True:
         packet = _file.read(TS.PACKET_SIZE)
-        if packet:
-          # first byte SHOULD be the sync byte
-          # but if it isn't find one.
-          if packet[0] != TS.SYNC_BYTE:
-            start_byte = 0
-            print packet[0]
-            for i in range(start_byte, TS.PACKET_SIZE):
-              if packet[i] == TS.SYNC_BYTE:
-                start_byte = i
-                break
-            # didn't find a new start? FAIL
-            if start_byte == 0:
-              raise Exception("failure to find sync byte in ts packet size.")
-              continue
-            remainder = _file.read(TS.PACKET_SIZE - start_byte)
-            packet = packet[start_byte:] + remainder
-          yield packet
-        else:
+        if not packet:
+          break
+        if fadvise:
+          unreleased += TS.PACKET_SIZE
+          if unreleased >= window:
+            fadvise(f.fileno(), 0, _file.tell(), os.POSIX_FADV_DONTNEED)
+            unreleased = 0
+        # first byte SHOULD be the sync byte
+        # but if it isn't find one.
+        if packet[0] != TS.SYNC_BYTE:
+          position = _file.tell() - len(packet)
+          packet = TS.resync(_file, packet)
+          if skipped is not None:
+            skipped[0] += _file.tell() - len(packet) - position
+        # a trailing partial packet can't be parsed
+        if len(packet) < TS.PACKET_SIZE:
           break
+        yield packet
+
+  @staticmethod
+  def resync(f, packet):
+    """ Recover from lost sync by skipping ahead to the next sync byte that
+    is followed by another one a packet later (or by the end of the file).
+    :param f: file or mmap positioned just after packet
+    :param packet: the packet that didn't start with a sync byte
+    :return: the next whole packet, or a short or empty bytes at end of file
+    """
+    pos = f.tell() - len(packet) + 1
+    while True:
+      f.seek(pos)
+      window = f.read(TS.PACKET_SIZE * 8)
+      if not window:
+        return b''
+      i = window.find(TS.SYNC_BYTE)
+      if i < 0:
+        pos += len(window)
+        continue
+      # the packet and the byte after it, read rather than sought to, as a
+      # memory map can't seek past its end
+      f.seek(pos + i)
+      packet = f.read(TS.PACKET_SIZE + 1)
+      if len(packet) <= TS.PACKET_SIZE or packet[TS.PACKET_SIZE] == TS.SYNC_BYTE:
+        packet = packet[:TS.PACKET_SIZE]
+        f.seek(pos + i + len(packet))
+        return packet
+      pos += i + 1
 
   @staticmethod
   def check_packet_formedness(packet):
     """Check some features of this packet and see if it's well formed or not
     """
     if len(packet) != TS.PACKET_SIZE:
-      raise Exception("Provided input packet string not of correct size")
+      raise Exception("Provided input packet not of correct size")
 
     if packet[0] != TS.SYNC_BYTE:
       raise Exception("Provided input packet does not begin with correct sync byte.")
@@ -168,37 +260,37 @@ class TS(object):
  
   @staticmethod
   def get_transport_error_indicator(packet):
-    return (ord(packet[TS.TEI_INDEX]) & TS.TEI_MASK) != 0
+    return (packet[TS.TEI_INDEX] & TS.TEI_MASK) != 0
 
   @staticmethod
   def get_payload_start(packet):
-    return (ord(packet[TS.PUSI_INDEX]) & TS.PUSI_MASK) != 0
+    return (packet[TS.PUSI_INDEX] & TS.PUSI_MASK) != 0
 
   @staticmethod
   def get_pid(packet):
-    """Given a stringified MPEG TS packet, extract the PID value
+    """Given an MPEG TS packet, extract the PID value
     and return it as a simple integer value.
     Do this as quickly as possible for performance
     """
-    return ((ord(packet[TS.PID_START_INDEX]) & 0x1f)<<8) | ord(packet[TS.PID_START_INDEX+1])
+    return ((packet[TS.PID_START_INDEX] & 0x1f)<<8) | packet[TS.PID_START_INDEX+1]
 
   @staticmethod
   def get_tsc(packet):
     """get value of Transport Scrambling Control indicato
     """
-    return (ord(packet[TS.TSC_INDEX]) & TS.TSC_MASK) >> 6
+    return (packet[TS.TSC_INDEX] & TS.TSC_MASK) >> 6
 
   @staticmethod
   def get_adaptation_field_control(packet):
     """ get the adaptation field control value for this packet
     """
-    return (ord(packet[TS.ADAPTATION_FIELD_CONTROL_INDEX]) & TS.ADAPTATION_FIELD_CONTROL_MASK) >> 4
+    return (packet[TS.ADAPTATION_FIELD_CONTROL_INDEX] & TS.ADAPTATION_FIELD_CONTROL_MASK) >> 4
 
   @staticmethod
   def get_continuity_counter(packet):
     """ Get the continuity counter value for this packet
     """
-    return ord(packet[TS.CONTINUITY_COUNTER_INDEX]) & TS.CONTINUITY_COUNTER_MASK
+    return packet[TS.CONTINUITY_COUNTER_INDEX] & TS.CONTINUITY_COUNTER_MASK
 
   @staticmethod
   def get_adaptation_field_length(packet):
@@ -209,12 +301,20 @@ class TS(object):
       return 0
 
     #we add one byte here for the adaptation field length data itself
-    return ord(packet[TS.ADAPTATION_FIELD_LENGTH_INDEX]) + 1
+    return packet[TS.ADAPTATION_FIELD_LENGTH_INDEX] + 1
 
   @staticmethod
   def adaptation_field_present(packet):
     return TS.get_adaptation_field_control(packet) != TS.NO_ADAPTATION_FIELD
 
+  @staticmethod
+  def get_discontinuity_indicator(packet):
+    """ Whether the adaptation field (if any) flags a time base discontinuity
+    """
+    if not TS.adaptation_field_present(packet) or not packet[TS.ADAPTATION_FIELD_LENGTH_INDEX]:
+      return False
+    return bool(packet[TS.ADAPTATION_FIELD_DATA_INDEX] & TS.DISCONTINUITY_MASK)
+
   @staticmethod
   def get_pcr(packet):
     """ Get the Program Clock Reference for this packet if present.
@@ -222,12 +322,14 @@ class TS(object):
     """
     if not TS.adaptation_field_present(packet):
       return 0
-    if not ord(packet[TS.ADAPTATION_FIELD_DATA_INDEX]) & TS.PCR_FLAG_MASK:
+    if not packet[TS.ADAPTATION_FIELD_LENGTH_INDEX]:
+      # a zero length adaptation field has no flags
       return 0
-    b1 = struct.unpack('>L', packet[TS.PCR_START_INDEX:TS.PCR_START_INDEX+4])[0]
-    b2 = struct.unpack('>H', packet[TS.PCR_START_INDEX+4:TS.PCR_START_INDEX+6])[0]
-    base = (b1 << 1) | (b2 >> 15) # 33 bit base
-    extension = b2 & 0x1ff # 9 bit extension
+    if not packet[TS.ADAPTATION_FIELD_DATA_INDEX] & TS.PCR_FLAG_MASK:
+      return 0
+    pcr = int.from_bytes(packet[TS.PCR_START_INDEX:TS.PCR_START_INDEX+TS.PCR_SIZE_BYTES], 'big')
+    base = pcr >> 15 # 33 bit base
+    extension = pcr & 0x1ff # 9 bit extension
     # TODO: proper extension handling as per the spec
     # returning the base gives us good results currently
     #return base * 300 + extension
@@ -235,10 +337,10 @@ class TS(object):
 
   @staticmethod
   def pcr_delta_time_ms(pcr_t1, pcr_t2, offset = 0):
-    """Return a floating point time in milliseconds representing the
-    Difference in time between two PCR timestamps
+    """Return a floating point time in seconds representing the
+    Difference in time between two PCR timestamps, across 33 bit wraparound
     """
-    return float(pcr_t2-pcr_t1)/90000.0 + offset
+    return float(timeline.delta(pcr_t1, pcr_t2))/90000.0 + offset
 
 
   @staticmethod
@@ -258,66 +360,209 @@ class TS(object):
     return packet[header_size:]
 
 
-  def __init__(self, filename):
+  def __init__(self, filename, stats=None, window=None, reader=None):
+    """
+    :param stats: optional arib.stats.Stats object. When given, Parse() records
+      time spent reading packets, reassembling PES and in each callback, and
+      counts packets per PID.
+    :param window: read the file in windows of this many bytes rather than
+      memory mapping it whole (see next_packet)
+    :param reader: optional packet source to use instead of next_packet, e.g.
+      an arib.mpeg.reader.BlockReader. Its packets() may yield memoryviews.
+    """
     self._filename = filename
+    self._window = window
+    self._reader = reader
     self._total_filesize = os.path.getsize(filename)
     self._read_size = 0
+    # [bytes skipped regaining lost sync], updated by the packet reader
+    self._skipped = [0]
     self.Progress = None
     self.OnTSPacket = None
     self.OnESPacket = None
     self.OnTSPacketError = None
     self.OnESPacketError = None
     self._elementary_streams = {}
+    self.stats = stats
+    # optional arib.metrics.Worker updated with packet counts and read lag
+    self.metrics = None
+    # media clock following the PCRs of pcr_pid, for placing PES time stamps.
+    # Without a pcr_pid the first PID carrying a PCR is used.
+    self.timeline = timeline.Timeline()
+    self.pcr_pid = None
+    # Timeline by PCR PID, for the other programs of a multiplex (see timeline_for)
+    self.timelines = {}
+    # optional arib.mpeg.psi.ProgramMap handed the packets of its table PIDs
+    self.psi = None
+    # PCR PIDs with a discontinuity flagged ahead of their next PCR
+    self._discontinuities = set()
+    # OnCheckpoint(offset) is called every checkpoint_interval bytes between
+    # two packets, when everything before offset has been handled and nothing
+    # after it (see arib.checkpoint)
+    self.OnCheckpoint = None
+    self.checkpoint_interval = 0
+
+  def offset(self):
+    """ File offset of the next packet to be parsed
+    """
+    return self._read_size + self._skipped[0]
+
+  def checkpoint(self):
+    """ State needed to carry on parsing from offset() in another run
+    """
+    return {
+      'read_size': self._read_size,
+      'skipped': self._skipped[0],
+      'elementary_streams': self._elementary_streams,
+      'timeline': self.timeline,
+      'pcr_pid': self.pcr_pid,
+      'timelines': self.timelines,
+      'discontinuities': self._discontinuities,
+    }
+
+  def restore(self, state):
+    """ Carry on from a checkpoint(). Parse() then starts reading at its offset.
+    """
+    self._read_size = state['read_size']
+    self._skipped[0] = state['skipped']
+    self._elementary_streams = state['elementary_streams']
+    self.timeline = state['timeline']
+    self.pcr_pid = state['pcr_pid']
+    self.timelines = state['timelines']
+    self._discontinuities = state['discontinuities']
+
+  def timeline_for(self, pcr_pid):
+    """ Timeline following the PCRs of a PID, from the next PCR on it
+    """
+    if pcr_pid == self.pcr_pid or (self.pcr_pid is None and not self.timelines):
+      # the first one asked for is the main timeline
+      self.pcr_pid = pcr_pid
+      self.timelines[pcr_pid] = self.timeline
+    return self.timelines.setdefault(pcr_pid, timeline.Timeline())
 
   def Parse(self):
     """ Go through the .ts file, and invoke a callback on each TS packet and ES packet
     Also invoke progress callbacks and packet error callbacks as appropriate
     """
+    if self._reader is not None:
+      packets = self._reader.packets(start=self.offset(), skipped=self._skipped)
+    else:
+      packets = TS.next_packet(self._filename, window=self._window, start=self.offset(), skipped=self._skipped)
+    on_ts_packet = self.OnTSPacket
+    on_es_packet = self.OnESPacket
+    if self.metrics is not None:
+      packets = self.metrics.packets(packets, self._filename, TS.PACKET_SIZE,
+        offset=self.offset(), timeline=self.timeline)
+      if on_es_packet:
+        on_es_packet = self.metrics.counted('arib_pes_packets_total', on_es_packet)
+
+    stats = self.stats
+    if stats is None:
+      return self._parse(packets, on_ts_packet, on_es_packet)
+
+    # instrumented: everything not spent reading or in callbacks is PES reassembly
+    packets = stats.packets('read', packets, TS.get_pid, TS.PACKET_SIZE)
+    on_ts_packet = on_ts_packet and stats.timed('ts_packet', on_ts_packet)
+    on_es_packet = on_es_packet and stats.timed('es_packet', on_es_packet, lambda pid, es, size: len(es))
+    return stats.timed('pes', self._parse)(packets, on_ts_packet, on_es_packet)
+
+  def _parse(self, packets, OnTSPacket, OnESPacket):
     prev_percent_read = 0
-    for packet in TS.next_packet(self._filename):
+    timelines = self.timelines
+    if self.pcr_pid is not None:
+      timelines[self.pcr_pid] = self.timeline
+    pcr_pid = self.pcr_pid
+    discontinuities = self._discontinuities
+    psi = self.psi
+    psi_pids = psi.pids if psi is not None else ()
+    # the file size is taken when opened, so there's no progress to report
+    # of a file that's still growing (see arib.mpeg.follow)
+    progress = self.Progress if self._total_filesize else None
+    on_checkpoint = self.OnCheckpoint
+    next_checkpoint = self._read_size + self.checkpoint_interval
+    for packet in packets:
+      if on_checkpoint is not None and self._read_size >= next_checkpoint:
+        on_checkpoint(self.offset())
+        next_checkpoint = self._read_size + self.checkpoint_interval
       #check_packet_formedness(packet)
       pei = TS.get_transport_error_indicator(packet)
       pusi = TS.get_payload_start(packet)
       pid = TS.get_pid(packet)
       tsc = TS.get_tsc(packet)
 
+      # feed the timeline. Checked inline, since few packets have an
+      # adaptation field and fewer a PCR.
+      if packet[TS.ADAPTATION_FIELD_CONTROL_INDEX] & TS.ADAPTATION_FIELD_PRESENT_MASK and packet[TS.ADAPTATION_FIELD_LENGTH_INDEX] and not pei:
+        flags = packet[TS.ADAPTATION_FIELD_DATA_INDEX]
+        if pcr_pid is None and flags & TS.PCR_FLAG_MASK:
+          # unless timeline_for() has picked one meanwhile
+          pcr_pid = self.pcr_pid
+          if pcr_pid is None:
+            pcr_pid = self.pcr_pid = pid
+            timelines[pid] = self.timeline
+        clock = timelines.get(pid)
+        if clock is not None:
+          if flags & TS.DISCONTINUITY_MASK:
+            discontinuities.add(pid)
+          if flags & TS.PCR_FLAG_MASK:
+            clock.pcr(TS.get_pcr(packet), pid in discontinuities)
+            discontinuities.discard(pid)
+
       # per .ts packet handler
-      if self.OnTSPacket:
-        self.OnTSPacket(packet)
+      if OnTSPacket and not pei:
+        OnTSPacket(packet)
 
       # Update a progress callback
       self._read_size += TS.PACKET_SIZE
-      percent_read = ((self._read_size  / float(self._total_filesize)) * 100)
-      new_percent_read = int(percent_read * 100)
-      if new_percent_read != prev_percent_read and self.Progress:
-        self.Progress(self._read_size, self._total_filesize, percent_read)
-        prev_percent_read = new_percent_read
+      if progress is not None:
+        percent_read = ((self._read_size  / float(self._total_filesize)) * 100)
+        new_percent_read = int(percent_read * 100)
+        if new_percent_read != prev_percent_read:
+          progress(self._read_size, self._total_filesize, percent_read)
+          prev_percent_read = new_percent_read
+
+      if pei:
+        # damaged packet. drop it along with any partial PES it belongs to
+        if pid in self._elementary_streams:
+          del self._elementary_streams[pid]
+        continue
+
+      if pid in psi_pids:
+        # PSI sections, not PES
+        psi.packet(pid, packet)
+        continue
 
       adaptation_field_control = TS.get_adaptation_field_control(packet)
       continuity_counter = TS.get_continuity_counter(packet)
 
       # put together PES from payloads
+      # only PES that can still be completed are buffered, so each PID holds
+      # at most one PES of at most ES.MAX_PES_PACKET_SIZE bytes.
       payload = TS.get_payload(packet)
+      streams = self._elementary_streams
       if pusi == True:
-        if not ES.pes_packet_check_formedness(payload):
-          if pid in self._elementary_streams:
-            elementary_streams[pid] = None
+        if not ES.pes_packet_check_formedness(payload) or ES.get_pes_packet_length(payload) == ES.UNBOUNDED_PES_PACKET_SIZE:
+          # malformed, or of unbounded length (video) and so never complete
+          if pid in streams:
+            del streams[pid]
           continue
-        pes_id = ES.get_pes_stream_id(payload)
-        self._elementary_streams[pid] = payload
+        # copied, as packets may be views into a reused read buffer
+        streams[pid] = bytearray(payload)
+      elif pid in streams:
+        # TODO: check packet sequence counter
+        streams[pid] += payload
       else:
-        if pid in self._elementary_streams:
-          # TODO: check packet sequence counter
-          self._elementary_streams[pid] += payload
-        else:
-          # TODO: throw. this situaiton means out of order packets
-          pass
-      if pid in self._elementary_streams and ES.pes_packet_complete(self._elementary_streams[pid]):
-        # TODO: handle packet contents here (callback)
-        es = self._elementary_streams[pid]
-        if self.OnESPacket:
-          header_size = ES.get_pes_header_length(es)
-          self.OnESPacket(pid, es, header_size)
+        # TODO: throw. this situaiton means out of order packets
+        continue
+      es = streams[pid]
+      pes_packet_len = ES.get_pes_packet_length(es)
+      if not pes_packet_len or len(es) < pes_packet_len:
+        continue
+      del streams[pid]
+      if len(es) == pes_packet_len and OnESPacket:
+        es = bytes(es)
+        header_size = ES.get_pes_header_length(es)
+        OnESPacket(pid, es, header_size)
 
 
 # GLOBALS TO KEEP TRACK OF STATE
@@ -340,7 +585,7 @@ def OnProgress(bytes_read, total_bytes, percent):
 def OnTSPacket(packet):
   """
   Callback invoked on the successful extraction of a single TS packet from a ts file
-  :param packet: The entire packet (header and payload) as a string
+  :param packet: The entire packet (header and payload) as bytes
   :return: None
   """
   global initial_timestamp
@@ -374,8 +619,8 @@ def main():
   infilename = args.infile
 
   if not os.path.exists(infilename):
-    print 'Input filename :' + infilename + " does not exist."
-    os.exit(-1)
+    print('Input filename :' + infilename + " does not exist.")
+    sys.exit(-1)
 
   ts = TS(infilename)
 
@@ -0,0 +1,171 @@
+# vim: set ts=2 expandtab:
+'''
+Module: output.py
+Desc: Buffered, atomically finalized subtitle output files
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Lines are kept in memory and encoded and written to disk in batches.
+Output goes to a temporary '.part' file alongside the target, which is only
+renamed to the target filename on close(). A conversion that dies part way
+through therefore never leaves a truncated file under the final name.
+Callers must close() (or use a with block) to publish the output.
+
+A BufferedFile can be pickled part way through (see arib.checkpoint). The
+temporary file is synced to disk and its length saved along with the lines
+still buffered. Unpickling reopens it and truncates anything written since,
+so the output carries on exactly where the checkpoint was taken.
+
+'''
+import os
+import io
+import sys
+
+from arib.arib_exceptions import FileOpenError
+
+# default number of buffered lines before they're written to disk.
+DEFAULT_FLUSH_LINES = 256
+
+TEMP_SUFFIX = '.part'
+
+
+def utf8_stdout():
+  '''Make print() write UTF-8 whatever the locale, as the command line tools always have
+  '''
+  if (sys.stdout.encoding or '').lower().replace('-', '') != 'utf8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=sys.stdout.line_buffering)
+
+
+class BufferedFile(object):
+  '''Output sink for lines of unicode text
+  :param filepath: final output path
+  :param flush_lines: write buffered lines once this many are pending.
+    0 keeps everything in memory until close().
+  :param atomic: write to a temporary file and rename it into place on close().
+    Otherwise the file is written in place, for reading as it grows, so each
+    batch of lines is flushed through to the OS.
+  '''
+  def __init__(self, filepath, flush_lines=DEFAULT_FLUSH_LINES, atomic=True, encoding='utf-8'):
+    self._filepath = filepath
+    self._flush_lines = flush_lines
+    self._encoding = encoding
+    self._lines = []
+    self._f = None
+    self._path = filepath + TEMP_SUFFIX if atomic else filepath
+    try:
+      self._f = open(self._path, 'wb')
+    except (IOError, OSError):
+      raise FileOpenError("Could not open file " + repr(filepath) + " for writing.")
+
+  def __del__(self):
+    # an atomic file that was never explicitly closed is incomplete, so it
+    # is discarded rather than published under the final name.
+    try:
+      if self._path != self._filepath:
+        self.abort()
+      else:
+        self.close()
+    except AttributeError:
+      pass
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    if exc_type is None:
+      self.close()
+    else:
+      self.abort()
+    return False
+
+  def __getstate__(self):
+    state = dict(self.__dict__)
+    del state['_f']
+    state['_position'] = None
+    if self._f:
+      self._f.flush()
+      os.fsync(self._f.fileno())
+      state['_position'] = self._f.tell()
+    return state
+
+  def __setstate__(self, state):
+    position = state.pop('_position')
+    self.__dict__.update(state)
+    self._f = None
+    if position is None:
+      return
+    try:
+      self._f = open(self._path, 'r+b')
+    except (IOError, OSError):
+      raise FileOpenError("Could not reopen " + repr(self._path) + " to resume writing.")
+    self._f.truncate(position)
+    self._f.seek(position)
+
+  @property
+  def filepath(self):
+    return self._filepath
+
+  def closed(self):
+    return self._f is None
+
+  def write(self, line):
+    '''Buffer indicated string. usually a line of dialog.
+    '''
+    self._lines.append(line)
+    if self._flush_lines and len(self._lines) >= self._flush_lines:
+      self.flush()
+
+  def flush(self):
+    '''Encode and write all buffered lines in a single write
+    '''
+    if self._lines and self._f:
+      self._f.write(u''.join(self._lines).encode(self._encoding))
+      self._lines = []
+      if self._path == self._filepath:
+        self._f.flush()
+
+  def close(self):
+    '''Write any buffered lines and move the file into place
+    '''
+    if not self._f:
+      return
+    self.flush()
+    self._f.close()
+    self._f = None
+    if self._path != self._filepath:
+      os.replace(self._path, self._filepath)
+
+  def rename(self, filepath):
+    '''Publish the output under another name. An atomic file is only moved
+    there on close(), while one written in place is renamed now.
+    '''
+    if self._path == self._filepath and self._f:
+      self.flush()
+      self._f.close()
+      os.replace(self._path, filepath)
+      self._path = filepath
+      self._f = open(filepath, 'ab')
+    elif self._path == self._filepath:
+      self._path = filepath
+    self._filepath = filepath
+
+  def keep(self):
+    '''Close without publishing or discarding the temporary file, which a
+    later run carries on from its last checkpoint
+    '''
+    if not self._f:
+      return
+    self._f.close()
+    self._f = None
+
+  def abort(self):
+    '''Discard buffered lines and any partially written temporary file
+    '''
+    if not self._f:
+      return
+    self._lines = []
+    self._f.close()
+    self._f = None
+    if self._path != self._filepath and os.path.exists(self._path):
+      os.remove(self._path)
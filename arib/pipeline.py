@@ -0,0 +1,105 @@
+# vim: set ts=2 expandtab:
+'''
+Module: pipeline.py
+Desc: Run TS demuxing and caption decoding on separate threads
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Normally TS.Parse does everything on one thread: reading, packet parsing,
+PES reassembly and (through OnESPacket) caption decoding, formatting and
+writing. A Pipeline splits this into stages connected by bounded queues:
+
+  I/O       the TS reader, e.g. a BlockReader with a prefetch thread
+  demux     TS.Parse on a background thread, queueing the PES wanted
+  decode    the OnESPacket handler, called on the thread calling run()
+
+Blocking reads release the GIL, so disk and network latency overlaps with
+parsing and decoding. Each stage only communicates through its queue, so
+stages can later be moved to separate processes.
+
+'''
+import threading
+import queue
+
+DEFAULT_QUEUE_SIZE = 64
+
+# seconds between checks whether the other end has gone away
+POLL_S = 0.1
+
+_DONE = object()
+
+
+class Pipeline(object):
+  '''
+  :param ts: TS object to demux. Its OnTSPacket callback (if any) runs on
+    the demux thread.
+  :param queue_size: maximum number of PES waiting to be decoded
+  '''
+  def __init__(self, ts, queue_size=DEFAULT_QUEUE_SIZE):
+    self._ts = ts
+    self._queue = queue.Queue(queue_size)
+    self._stop = threading.Event()
+
+  def _put(self, item):
+    while not self._stop.is_set():
+      try:
+        self._queue.put(item, timeout=POLL_S)
+        return
+      except queue.Full:
+        pass
+    # the decode stage has stopped, so stop demuxing too
+    raise StopPipeline()
+
+  def _demux(self, accept, clock):
+    def OnESPacket(pid, packet, header_size):
+      if accept and not accept(pid, packet):
+        return
+      self._put((pid, packet, header_size, clock(pid, packet) if clock else None))
+
+    self._ts.OnESPacket = OnESPacket
+    try:
+      self._ts.Parse()
+      self._put(_DONE)
+    except StopPipeline:
+      pass
+    except Exception as ex:
+      try:
+        self._put(ex)
+      except StopPipeline:
+        pass
+
+  def run(self, OnESPacket, accept=None, clock=None):
+    '''Demux on a background thread and call OnESPacket for each PES on this one.
+    :param OnESPacket: handler called as OnESPacket(pid, packet, header_size),
+      or OnESPacket(pid, packet, header_size, timestamp) if clock is given
+    :param accept: optional filter accept(pid, packet) run on the demux thread,
+      so unwanted PES are never queued
+    :param clock: optional function clock(pid, packet) run on the demux thread
+      when a PES is complete, e.g. placing it on the TS timeline. Its value is
+      passed to OnESPacket, since the demux thread will have moved on by then.
+    '''
+    thread = threading.Thread(target=self._demux, args=(accept, clock))
+    thread.daemon = True
+    thread.start()
+    try:
+      while True:
+        item = self._queue.get()
+        if item is _DONE:
+          break
+        if isinstance(item, Exception):
+          raise item
+        pid, packet, header_size, timestamp = item
+        if clock:
+          OnESPacket(pid, packet, header_size, timestamp)
+        else:
+          OnESPacket(pid, packet, header_size)
+    finally:
+      self._stop.set()
+      thread.join()
+
+
+class StopPipeline(Exception):
+  '''Raised on the demux thread when the decode stage has gone away
+  '''
+  pass
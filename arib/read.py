@@ -6,8 +6,10 @@ Author: John O'Neil
 Email: oneil.john@gmail.com
 DATE: Thursday, March 13th 2014
 
+Everything here reads from a file like object: an open binary file, or a
+Cursor over bytes already in memory (e.g. a PES payload).
+
 '''
-import struct
 
 DEBUG = False
 
@@ -16,17 +18,34 @@ class EOFError(Exception):
   """
   pass
 
-def split_buffer(length, buf):
-  '''split provided array at index x
+class Cursor(object):
+  '''Read position in bytes (or a memoryview) held in memory.
+  Provides the read() and tell() of a binary file, without copying the data.
   '''
-  #print "split-buffer******"
-  a = []
-  if len(buf)<length:
-    return (a, buf)
-  #print "length of buf is" + str(len(buf))
-  for i in range(length):
-    a.append(buf.pop(0))
-  return (a,buf)
+  __slots__ = ('_data', '_pos')
+
+  def __init__(self, data, pos=0):
+    self._data = data
+    self._pos = pos
+
+  def read(self, size=-1):
+    start = self._pos
+    if size < 0:
+      self._pos = len(self._data)
+    else:
+      self._pos = min(start + size, len(self._data))
+    return self._data[start:self._pos]
+
+  def __len__(self):
+    '''Number of bytes left to read
+    '''
+    return len(self._data) - self._pos
+
+  def tell(self):
+    return self._pos
+
+  def seek(self, pos):
+    self._pos = pos
 
 def dump_list(list):
   print(u' '.join(u'{:#x}'.format(x) for x in list))
@@ -34,79 +53,50 @@ def dump_list(list):
 def ucb(f):
   '''Read unsigned char byte from binary file
   '''
-  if isinstance(f, list):
-    if len(f) < 1:
-      raise EOFError()
-    b, f = split_buffer(1, f)
-    return struct.unpack('B', ''.join(b))[0]
-  else:
-    _f = f.read(1)
-    if len(_f) < 1:
-      raise EOFError()
-    return struct.unpack('B', _f)[0]
+  _f = f.read(1)
+  if len(_f) < 1:
+    raise EOFError()
+  return _f[0]
 
 def usb(f):
   '''Read unsigned short from binary file
   '''
-  if isinstance(f, list):
-    n, f = split_buffer(2, f)
-    return struct.unpack('>H', ''.join(n))[0]
-  else:
-    _f = f.read(2)
-    if DEBUG:
-      print("usb: " + hex(ord(_f[0])) + ":" + hex(ord(_f[1])))
-    if len(_f) < 2:
-      raise EOFError()
-    return struct.unpack('>H', _f)[0]
+  _f = f.read(2)
+  if DEBUG:
+    print("usb: " + hex(_f[0]) + ":" + hex(_f[1]))
+  if len(_f) < 2:
+    raise EOFError()
+  return int.from_bytes(_f, 'big')
 
 def ui3b(f):
   '''Read 3 byte unsigned short from binary file
   '''
-  if isinstance(f, list):
-    n, f = split_buffer(3, f)
-    return struct.unpack('>I', '\x00'+ ''.join(n))[0]
-  else:
-    _f = f.read(3)
-    if len(_f) < 3:
-      raise EOFError()
- 
-    return struct.unpack('>I', '\x00'+ (_f))[0]
+  _f = f.read(3)
+  if len(_f) < 3:
+    raise EOFError()
+  return int.from_bytes(_f, 'big')
 
 def uib(f):
   '''
   '''
-  if isinstance(f, list):
-    n, f = split_buffer(4, f)
-    return struct.unpack('>L', ''.join(n))[0]
-  else:
-    _f = f.read(4)
-    if len(_f) < 4:
-      raise EOFError()
- 
-    return struct.unpack('>L', _f)[0]
+  _f = f.read(4)
+  if len(_f) < 4:
+    raise EOFError()
+  return int.from_bytes(_f, 'big')
 
 def ulb(f):
   '''Read unsigned long long (64bit integer) from binary file
   '''
-  if isinstance(f, list):
-    n, f = split_buffer(8, f)
-    return struct.unpack('>Q', ''.join(n))[0]
-  else:
-    _f = f.read(8)
-    if len(_f) < 8:
-      raise EOFError()
-    return struct.unpack('>Q', _f)[0]
+  _f = f.read(8)
+  if len(_f) < 8:
+    raise EOFError()
+  return int.from_bytes(_f, 'big')
 
 
 def buffer(f, size):
-  '''Read N bytes from either a file or list
+  '''Read N bytes from a file
   '''
-  if isinstance(f, list):
-    n, f = split_buffer(size, f)
-    return ''.join(n)
-  else:
-    _f = f.read(size)
-    if len(_f) < size:
-      raise EOFError()
- 
-    return _f
+  _f = f.read(size)
+  if len(_f) < size:
+    raise EOFError()
+  return _f
@@ -0,0 +1,210 @@
+# vim: set ts=2 expandtab:
+'''
+Module: stats.py
+Desc: Opt-in per-stage timing and counters for the TS to caption pipeline
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Nothing here is used unless asked for. Instrumentation works by wrapping
+functions (TS callbacks, the packet reader, or methods of parsing classes)
+in timing wrappers, so code that runs without a Stats object is untouched
+and pays nothing.
+
+Stage times are exclusive: when an instrumented function calls another
+instrumented function, the inner time is only counted against the inner
+stage. The stages therefore add up to the total.
+
+  stats = Stats()
+  stats.instrument(DataGroup, '__init__', 'data_group')
+  ts = TS(filename, stats=stats)
+  ts.Parse()
+  stats.restore()
+  print(stats.report())
+
+'''
+import sys
+import threading
+import timeit
+
+try:
+  import resource
+except ImportError:
+  resource = None
+
+timer = timeit.default_timer
+
+
+def peak_memory_kb():
+  '''Peak resident set size of this process in KB, or None where unavailable
+  '''
+  if resource is None:
+    return None
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # bytes on OS X, KB elsewhere
+  if sys.platform == 'darwin':
+    peak //= 1024
+  return peak
+
+
+class Stage(object):
+  '''Cumulative counters of a single pipeline stage
+  '''
+  def __init__(self, name):
+    self.name = name
+    self.calls = 0
+    self.seconds = 0.0
+    self.bytes = 0
+
+  def as_dict(self):
+    return {'calls' : self.calls, 'seconds' : self.seconds, 'bytes' : self.bytes}
+
+
+class Stats(object):
+  '''Per stage timings, exception counts by type and packet counts by PID
+  '''
+  def __init__(self):
+    self._stages = {}
+    self._order = []
+    # stack of inner stage time, per thread
+    self._local = threading.local()
+    self._last_exception = None
+    self._patched = []
+    self.exceptions = {}
+    self.pids = {}
+
+  def stage(self, name):
+    '''Counters for the named stage, created on first use
+    '''
+    stage = self._stages.get(name)
+    if stage is None:
+      stage = Stage(name)
+      self._stages[name] = stage
+      self._order.append(name)
+    return stage
+
+  def _stack(self):
+    try:
+      return self._local.stack
+    except AttributeError:
+      self._local.stack = []
+      return self._local.stack
+
+  def stages(self):
+    return [self._stages[name] for name in self._order]
+
+  def exception(self, ex):
+    '''Count an exception by type. An exception passing up through several
+    instrumented stages is only counted once.
+    '''
+    if ex is self._last_exception:
+      return
+    self._last_exception = ex
+    name = type(ex).__name__
+    self.exceptions[name] = self.exceptions.get(name, 0) + 1
+
+  def timed(self, name, func, size=None):
+    '''Wrap a function so that calls to it are timed against a stage
+    :param size: optional function of the call arguments returning bytes processed
+    '''
+    stage = self.stage(name)
+
+    def wrapper(*args, **kwargs):
+      stack = self._stack()
+      if size:
+        stage.bytes += size(*args, **kwargs)
+      stack.append(0.0)
+      start = timer()
+      try:
+        return func(*args, **kwargs)
+      except Exception as ex:
+        self.exception(ex)
+        raise
+      finally:
+        elapsed = timer() - start
+        inner = stack.pop()
+        stage.calls += 1
+        stage.seconds += elapsed - inner
+        if stack:
+          stack[-1] += elapsed
+    return wrapper
+
+  def packets(self, name, packets, get_pid, packet_size):
+    '''Time reading packets from a generator and count them by PID
+    '''
+    stage = self.stage(name)
+    stack = self._stack()
+    pids = self.pids
+    packets = iter(packets)
+    while True:
+      start = timer()
+      try:
+        packet = next(packets)
+      except StopIteration:
+        return
+      finally:
+        elapsed = timer() - start
+        stage.seconds += elapsed
+        if stack:
+          stack[-1] += elapsed
+      stage.calls += 1
+      stage.bytes += packet_size
+      pid = get_pid(packet)
+      pids[pid] = pids.get(pid, 0) + 1
+      yield packet
+
+  def instrument(self, cls, attribute, name, size=None):
+    '''Replace a class attribute (method or staticmethod) by a timed version
+    until restore() is called.
+    '''
+    original = cls.__dict__[attribute]
+    if isinstance(original, staticmethod):
+      setattr(cls, attribute, staticmethod(self.timed(name, original.__get__(None, cls), size)))
+    else:
+      setattr(cls, attribute, self.timed(name, original, size))
+    self._patched.append((cls, attribute, original))
+
+  def restore(self):
+    '''Undo all instrument() calls
+    '''
+    for cls, attribute, original in reversed(self._patched):
+      setattr(cls, attribute, original)
+    self._patched = []
+
+  def total_seconds(self):
+    return sum(s.seconds for s in self._stages.values())
+
+  def as_dict(self):
+    return {
+      'stages' : dict((s.name, s.as_dict()) for s in self.stages()),
+      'exceptions' : dict(self.exceptions),
+      'pids' : dict(self.pids),
+    }
+
+  def report(self):
+    '''Human readable summary
+    '''
+    lines = []
+    total = self.total_seconds()
+    lines.append('{s:<12} {c:>10} {t:>10} {p:>6} {b:>12} {r:>10}'.format(s='stage', c='calls', t='seconds',
+      p='%', b='bytes', r='MB/s'))
+    for s in self.stages():
+      percent = 100.0 * s.seconds / total if total else 0.0
+      rate = s.bytes / s.seconds / 1000000.0 if s.bytes and s.seconds else 0.0
+      lines.append('{s:<12} {c:>10d} {t:>10.4f} {p:>6.1f} {b:>12d} {r:>10.2f}'.format(s=s.name, c=s.calls,
+        t=s.seconds, p=percent, b=s.bytes, r=rate))
+    lines.append('{s:<12} {c:>10} {t:>10.4f}'.format(s='total', c='', t=total))
+    peak = peak_memory_kb()
+    if peak is not None:
+      lines.append('peak memory: {m:.1f} MB'.format(m=peak / 1024.0))
+    if self.exceptions:
+      lines.append('')
+      lines.append('exceptions:')
+      for name, count in sorted(self.exceptions.items(), key=lambda e: -e[1]):
+        lines.append('  {n:<30} {c:>10d}'.format(n=name, c=count))
+    if self.pids:
+      lines.append('')
+      lines.append('packets per PID:')
+      for pid, count in sorted(self.pids.items()):
+        lines.append('  {h:#06x} ({p:>4d}) {c:>12d}'.format(h=pid, p=pid, c=count))
+    return '\n'.join(lines)
@@ -13,111 +13,279 @@ import os
 import errno
 import sys
 import argparse
-import traceback
-
-from read import EOFError
 
 from arib.closed_caption import next_data_unit
 from arib.closed_caption import StatementBody
+from arib.closed_caption import DRCS1ByteCharacter
+from arib.closed_caption import DRCS2ByteCharacter
+from arib.closed_caption import DEFAULT_CONTEXT
 from arib.data_group import DataGroup
-from arib_exceptions import FileOpenError
-
-from mpeg.ts import TS
-from mpeg.ts import ES
-
-from arib.ass import ASSFormatter
-from arib.ass import ASSFile
-
-# GLOBALS TO KEEP TRACK OF STATE
-initial_timestamp = None
-elapsed_time_s = 0
-pid = -1
-VERBOSE = False
-SILENT = False
-DEBUG = False
-ass = None
-infilename = ""
-outfilename = ""
-tmax = 0
-
-
-def OnProgress(bytes_read, total_bytes, percent):
-  """
-  Callback method invoked on a change in file progress percent (not every packet)
-  Meant as a lower frequency callback to update onscreen progress percent or something.
-  :param bytes_read:
-  :param total_bytes:
-  :param percent:
-  :return:
-  """
-  global VERBOSE
-  global SILENT
-  if not VERBOSE and not SILENT:
-    sys.stdout.write("progress: %.2f%%   \r" % (percent))
-    sys.stdout.flush()
-
-def OnTSPacket(packet):
-  """
-  Callback invoked on the successful extraction of a single TS packet from a ts file
-  :param packet: The entire packet (header and payload) as a string
-  :return: None
-  """
-  global initial_timestamp
-  global elapsed_time_s
-  global time_offset
-
-  #pcr (program count record) can be used to calculate elapsed time in seconds
-  # we've read through the .ts file
-  pcr = TS.get_pcr(packet)
-  if pcr > 0:
-    current_timestamp = pcr
-    initial_timestamp = initial_timestamp or current_timestamp
-    delta = current_timestamp - initial_timestamp
-    elapsed_time_s = float(delta) / 90000.0 + time_offset
-
-def OnESPacket(current_pid, packet, header_size):
+from arib.data_group import parse_data_group
+from arib.data_group import OK
+from arib.data_group import STATUS_NAMES
+from arib.error_log import ErrorLog
+from arib.arib_exceptions import CheckpointError
+from arib.arib_exceptions import FileOpenError
+import arib.checkpoint as checkpoint
+
+from arib.mpeg.ts import TS
+from arib.mpeg.ts import ES
+from arib.mpeg.reader import BlockReader
+from arib.mpeg.reader import DEFAULT_BLOCK_SIZE
+from arib.mpeg.reader import DEFAULT_PREFETCH_BLOCKS
+from arib.mpeg.follow import DEFAULT_IDLE_TIMEOUT_S
+from arib.mpeg.psi import ProgramMap
+from arib.mpeg.psi import CAPTION
+
+from arib.formats import FORMATTERS
+from arib.formats import MultiFormatter
+from arib.formats import extension
+from arib.output import BufferedFile
+from arib.output import DEFAULT_FLUSH_LINES
+from arib.stats import Stats
+from arib.stats import peak_memory_kb
+from arib.pipeline import Pipeline
+
+# stream ids of PES carrying captions (private_stream_1) and superimpose
+# (private_stream_2)
+CAPTION_STREAM_IDS = frozenset([ES.PRIVATE_STREAM_1, ES.PRIVATE_STREAM_2])
+
+class Extraction(object):
   """
-  Callback invoked on the successful extraction of an Elementary Stream packet from the
-  Transport Stream file packets.
-  :param current_pid: The TS Program ID for the TS packets this info originated from
-  :param packet: The ENTIRE ES packet, header and payload-- which may have been assembled
-    from multiple TS packet payloads.
-  :param header_size: Size of the header in bytes (characters in the string). Provided to more
-    easily separate the packet into header and payload.
-  :return: None
+  State of extracting the closed captions of one .ts file.
+  All state lives here rather than in module globals, so any number of
+  extractions can run at once, one per thread.
   """
-  global pid
-  global VERBOSE
-  global SILENT
-  global elapsed_time_s
-  global ass
-  global infilename
-  global outfilename
-  global tmax
-  global time_offset
-
-  if pid >= 0 and current_pid != pid:
-    return
-
-  try:
-    payload = ES.get_pes_payload(packet)
-    f = list(payload)
-    data_group = DataGroup(f)
+  def __init__(self, infilename, outfilenames, formats=('ass',), pid=-1, tmax=5, time_offset=0.0,
+               flush_lines=DEFAULT_FLUSH_LINES, verbose=False, silent=False, errors=None, metrics=None,
+               context=DEFAULT_CONTEXT, languages=False, all_pids=False, services=False, split_programmes=False,
+               checkpoint_interval=0, resume=False, live=False):
+    """
+    :param outfilenames: dict of output filename by format
+    :param errors: ErrorLog reporting decoding errors
+    :param metrics: optional arib.metrics.Worker
+    :param context: closed_caption.Context to decode with
+    :param languages: write each caption language to its own files, named
+      after its language code (see labelled_filename)
+    :param all_pids: extract every PID carrying caption management data
+      (captions and superimpose) to its own files, rather than only the first
+    :param services: extract the captions of every service of a multiplex to
+      its own files, finding their PIDs through the PAT and PMTs
+    :param split_programmes: write each programme (EIT event) to its own files,
+      named after its start time and title, with times from its start
+    :param checkpoint_interval: save a checkpoint every this many bytes of
+      input (0 for none), and keep partial output on failure to resume from it
+    :param resume: carry on from the last checkpoint, if there is one
+    :param live: write each caption straight to the output files as soon as
+      it's complete, e.g. while following a recording, rather than publishing
+      them once complete
+    """
+    self.infilename = infilename
+    self.outfilenames = outfilenames
+    self.formats = list(formats)
+    self.pid = pid
+    self.tmax = tmax
+    self.time_offset = time_offset
+    self.flush_lines = flush_lines
+    self.verbose = verbose
+    self.silent = silent
+    self.errors = errors if errors is not None else ErrorLog()
+    self.metrics = metrics
+    self.context = context
+    self.languages = languages
+    self.all_pids = all_pids
+    self.services = services
+    self.split_programmes = split_programmes
+    self.checkpoint_interval = checkpoint_interval
+    self.resume = resume
+    self.live = live
+    # arib.mpeg.si.Guide following the EIT, only used with split_programmes
+    self.guide = None
+    # stream time of the start of each programme by (service id, event id)
+    self.programme_starts = {}
+    # service id by caption PID, once found
+    self.pid_services = {}
+    # (program number, kind, PCR PID) by PID of the caption streams of each
+    # service, from the PMTs. Only used with services.
+    self.service_pids = {}
+    self.elapsed_time_s = time_offset
+    # PIDs found carrying caption management data, in order found
+    self.caption_pids = []
+    # MultiFormatter by (service, programme, PID, caption language number).
+    # Service, programme and PID are None unless services, split_programmes
+    # and all_pids, and language 0 unless languages, so that they share one.
+    self.formatters = {}
+    # ISO 639 language code by (PID, caption language number), from management data
+    self.language_codes = {}
+    # (PID, filename labels) of each formatter by key, with languages. The
+    # language label is last, and changed once its code is known.
+    self.formatter_labels = {}
+    self.ts = None
+
+  def OnProgress(self, bytes_read, total_bytes, percent):
+    """
+    Callback method invoked on a change in file progress percent (not every packet)
+    Meant as a lower frequency callback to update onscreen progress percent or something.
+    :param bytes_read:
+    :param total_bytes:
+    :param percent:
+    :return:
+    """
+    if not self.verbose and not self.silent:
+      sys.stdout.write("progress: %.2f%%   \r" % (percent))
+      sys.stdout.flush()
+
+  def place(self, current_pid, packet):
+    """
+    Stream time in seconds of a caption PES, from its own PTS placed on the
+    TS timeline, so times count from the first PCR of the file and carry on
+    across PCR wraparound and splices. Superimpose is sent in asynchronous
+    PES, which have no PTS and are shown as they arrive, so they get the time
+    of the latest PCR. Any other PES without a PTS gets the time of the one
+    before. Must run as the PES is demuxed, while the timeline (and
+    programme guide) is at the PES.
+    :param packet: the entire PES packet
+    :return: tuple of (stream time, EIT event of the programme or None).
+      The event is only looked up with split_programmes.
+    """
+    clock = self.ts.timeline
+    service = self.service_pids.get(current_pid)
+    if service:
+      clock = self.ts.timelines.get(service[2], clock)
+    pts = ES.get_pes_pts(packet)
+    if pts is not None:
+      self.elapsed_time_s = clock.time(pts) + self.time_offset
+    elif ES.get_pes_stream_id(packet) == ES.PRIVATE_STREAM_2:
+      self.elapsed_time_s = clock.now() + self.time_offset
+    if self.guide is None:
+      return self.elapsed_time_s, None
+    return self.elapsed_time_s, self.programme(current_pid, clock, self.elapsed_time_s - self.time_offset)
+
+  def service_of(self, pid):
+    """
+    Service id of a caption PID, from the PMTs, or None while unknown
+    """
+    service = self.pid_services.get(pid)
+    if service is None and self.ts.psi is not None:
+      for number, pmt in self.ts.psi.programs.items():
+        if any(stream.pid == pid for stream in pmt.streams):
+          service = self.pid_services[pid] = number
+    return service
+
+  def programme(self, pid, clock, seconds):
+    """
+    EIT event on air at a stream time on a timeline, recording the stream
+    time of its start, from the wall clock if a TDT/TOT has been seen, or
+    else from the first caption in it.
+    """
+    service = self.service_of(pid)
+    wall = self.guide.wall_time(clock, seconds)
+    event = self.guide.event(service, wall)
+    if event is None:
+      return None
+    key = (event.service_id, event.event_id)
+    if key not in self.programme_starts:
+      start = seconds
+      if wall is not None and event.start is not None:
+        start = seconds - (wall - event.start).total_seconds()
+      self.programme_starts[key] = start
+    return event
+
+  def formatter(self, pid, language, event=None):
+    """
+    MultiFormatter writing the captions of a PID and language (1 to 8), and
+    with split_programmes of a programme (EIT event), created on first use.
+    """
+    service = self.service_pids[pid][0] if self.services else None
+    programme = (event.service_id, event.event_id) if event else None
+    key = (service, programme, pid if self.all_pids else None, language if self.languages else 0)
+    formatter = self.formatters.get(key)
+    if formatter is None:
+      labels = []
+      if self.services:
+        labels.append('sid' + str(service))
+      if event:
+        labels.append(programme_label(event))
+        if not self.silent:
+          name = self.guide.services.get(event.service_id)
+          print("Programme: " + event.title + (" on " + name.name if name else "")
+            + (" from " + str(event.start) if event.start else ""))
+      if self.all_pids:
+        labels.append('pid' + str(pid))
+      if self.languages:
+        labels.append(self.language_codes.get((pid, language), 'lang' + str(language)))
+      if self.languages:
+        self.formatter_labels[key] = (pid, labels)
+      outfilenames = dict((f, labelled_filename(name, labels)) for f, name in self.outfilenames.items())
+      if labels and not self.silent:
+        print("Found closed captions in PID " + str(pid) + ", language " + str(language) + ": " + '.'.join(labels))
+      v = not self.silent
+      flush_lines = 1 if self.live else self.flush_lines
+      formatter = MultiFormatter((FORMATTERS[f](tmax=self.tmax, video_filename=outfilenames[f],
+        verbose=v, flush_lines=flush_lines, atomic=not self.live) for f in self.formats),
+        metrics=self.metrics, errors=None if self.silent else self.errors)
+      self.formatters[key] = formatter
+    return formatter
+
+  def OnESPacket(self, current_pid, packet, header_size, place=None):
+    """
+    Callback invoked on the successful extraction of an Elementary Stream packet from the
+    Transport Stream file packets.
+    :param current_pid: The TS Program ID for the TS packets this info originated from
+    :param packet: The ENTIRE ES packet, header and payload-- which may have been assembled
+      from multiple TS packet payloads.
+    :param header_size: Size of the header in bytes (characters in the string). Provided to more
+      easily separate the packet into header and payload.
+    :param place: (stream time, programme) of the packet if already known (see place())
+    :return: None
+    """
+    metrics = self.metrics
+    if not self.accept(current_pid, packet):
+      return
+    # whether errors are worth reporting: until the caption PID is known
+    # most PES aren't caption data at all.
+    known = self.pid >= 0 or current_pid in self.caption_pids or current_pid in self.service_pids
+
+    status, data_group, err = parse_data_group(ES.get_pes_payload(packet), self.context)
+    if status != OK:
+      if known:
+        kind = STATUS_NAMES[status]
+        if metrics:
+          metrics.inc('arib_decode_errors_total', type=type(err).__name__ if err else kind)
+        if not self.silent:
+          self.errors.error(kind, "Could not decode DataGroup in PID " + str(current_pid)
+            + " (" + kind + "). This may be due to file corruption or as yet unsupported features", err)
+      return
+
+    if metrics and known:
+      metrics.inc('arib_data_groups_total')
     if not data_group.is_management_data():
       #We now have a Data Group that contains caption data.
       #We take out its payload, but this is further divided into 'Data Unit' structures
       caption = data_group.payload()
+      formatter = None
+      if place is None:
+        place = self.place(current_pid, packet)
+      timestamp, event = place
+      if event:
+        # times count from the start of the programme
+        timestamp = max(0.0, timestamp - self.programme_starts[(event.service_id, event.event_id)])
       #iterate through the Data Units in this payload via another generator.
       for data_unit in next_data_unit(caption):
+        if metrics and isinstance(data_unit.payload(), (DRCS1ByteCharacter, DRCS2ByteCharacter)):
+          for character in data_unit.payload().payload():
+            for font in character.fonts():
+              metrics.inc('arib_drcs_characters_total')
+              if font._hash not in self.context.character_hashes:
+                metrics.inc('arib_drcs_unknown_total')
+
         #we're only interested in those Data Units which are "statement body" to get CC data.
         if not isinstance(data_unit.payload(), StatementBody):
           continue
 
-        if not ass:
-          v = not SILENT
-          ass = ASSFormatter(tmax=tmax, video_filename=outfilename, verbose=v)
-
-        ass.format(data_unit.payload().payload(), elapsed_time_s)
+        if not formatter:
+          formatter = self.formatter(current_pid, data_group.language(), event)
+        formatter.format(data_unit.payload().payload(), timestamp)
 
         # this code used to sed the PID we're scanning via first successful ARIB decode
         # but i've changed it below to draw present CC language info form ARIB
@@ -131,89 +299,463 @@ def OnESPacket(current_pid, packet, header_size):
       # management data
       management_data = data_group.payload()
       numlang = management_data.num_languages()
-      if pid < 0 and numlang > 0:
+      for language in range(numlang):
+        key = (current_pid, management_data.language_number(language))
+        code = management_data.language_code(language)
+        if self.language_codes.get(key) != code:
+          self.language_codes[key] = code
+          self.relabel(*key)
+      if self.pid < 0 and numlang > 0 and current_pid not in self.caption_pids:
         for language in range(numlang):
-          if not SILENT:
+          if not self.silent:
             print("Closed caption management data for language: "
               + management_data.language_code(language)
               + " available in PID: " + str(current_pid))
-            print("Will now only process this PID to improve performance.")
-        pid = current_pid
+            if not self.all_pids and not self.services:
+              print("Will now only process this PID to improve performance.")
+        self.caption_pids.append(current_pid)
+        if not self.all_pids and not self.services:
+          self.pid = current_pid
+        if metrics and len(self.caption_pids) == 1:
+          metrics.set('arib_caption_pid', current_pid)
+
+  def relabel(self, pid, language):
+    """
+    Name the files of a caption language after its language code, once
+    management data gives it. Captions often come first, e.g. at the start
+    of a recording, and are written under 'lang' and the language number
+    until then.
+    """
+    code = self.language_codes[(pid, language)]
+    for key, formatter in self.formatters.items():
+      labelled = self.formatter_labels.get(key)
+      if labelled is None or key[3] != language or labelled[0] != pid or labelled[1][-1] == code:
+        continue
+      labels = labelled[1]
+      labels[-1] = code
+      if not self.silent:
+        print("Language " + str(language) + " of PID " + str(pid) + " is " + code + ": " + '.'.join(labels))
+      formatter.rename([labelled_filename(self.outfilenames[f], labels) for f in self.formats])
+
+  def accept(self, current_pid, packet):
+    """
+    Whether a PES could be caption data, checked before it's handed to another thread
+    """
+    # pid is only read here. OnESPacket sets it.
+    if self.services:
+      return current_pid in self.service_pids
+    if self.pid >= 0:
+      return current_pid == self.pid
+    if self.all_pids:
+      # captions are carried in synchronized PES, superimpose in asynchronous PES
+      return current_pid in self.caption_pids or ES.get_pes_stream_id(packet) in CAPTION_STREAM_IDS
+    return True
+
+  def OnPMT(self, pmt):
+    """
+    Callback on a new or changed program map: route the caption streams of its
+    service (only the first caption stream unless all_pids), each timed by the
+    PCR of the service.
+    """
+    if not self.services:
+      return
+    streams = pmt.caption_streams()
+    if not self.all_pids:
+      streams = [(kind, stream) for kind, stream in streams if kind == CAPTION][:1]
+    if streams:
+      self.ts.timeline_for(pmt.pcr_pid)
+    for kind, stream in streams:
+      if stream.pid not in self.service_pids and not self.silent:
+        print("Service " + str(pmt.program_number) + ": " + kind + " in PID " + str(stream.pid))
+      self.service_pids[stream.pid] = (pmt.program_number, kind, pmt.pcr_pid)
+
+  def checkpoint_filename(self):
+    return checkpoint.checkpoint_filename(self.outfilenames[self.formats[0]])
+
+  def options(self):
+    """
+    Options a checkpoint can only be resumed with
+    """
+    return (os.path.abspath(self.infilename), self.formats, self.languages, self.all_pids, self.services, self.split_programmes)
+
+  def save_checkpoint(self, offset):
+    """
+    Callback every checkpoint_interval bytes, between two TS packets: save
+    everything needed to carry on from offset in another run.
+    """
+    ts = self.ts
+    checkpoint.save(self.checkpoint_filename(), {
+      'ts': ts.checkpoint(),
+      'psi': ts.psi.checkpoint() if ts.psi else None,
+      'guide': self.guide.checkpoint() if self.guide else None,
+      'pid': self.pid,
+      'caption_pids': self.caption_pids,
+      'language_codes': self.language_codes,
+      'formatter_labels': self.formatter_labels,
+      'elapsed_time_s': self.elapsed_time_s,
+      'programme_starts': self.programme_starts,
+      'pid_services': self.pid_services,
+      'service_pids': self.service_pids,
+      'formatters': dict((key, f.formatters()) for key, f in self.formatters.items()),
+    }, self.options())
+    if self.verbose:
+      print("Checkpoint at " + str(offset) + " bytes")
+
+  def restore_checkpoint(self):
+    """
+    Carry on from the last checkpoint saved by an earlier run, if any
+    """
+    state = checkpoint.load(self.checkpoint_filename(), self.options())
+    if state is None:
+      if not self.silent:
+        print("No checkpoint " + self.checkpoint_filename() + " to resume from. Starting from the beginning.")
+      return
+    ts = self.ts
+    ts.restore(state['ts'])
+    if ts.psi:
+      ts.psi.restore(state['psi'])
+    if self.guide:
+      self.guide.restore(state['guide'])
+    self.pid = state['pid']
+    self.caption_pids = state['caption_pids']
+    self.language_codes = state['language_codes']
+    self.formatter_labels = state['formatter_labels']
+    self.elapsed_time_s = state['elapsed_time_s']
+    self.programme_starts = state['programme_starts']
+    self.pid_services = state['pid_services']
+    self.service_pids = state['service_pids']
+    errors = None if self.silent else self.errors
+    self.formatters = dict((key, MultiFormatter(formatters, metrics=self.metrics, errors=errors))
+      for key, formatters in state['formatters'].items())
+    if not self.silent:
+      print("Resuming from checkpoint at " + str(ts.offset()) + " bytes")
+
+  def discard(self):
+    """
+    Abort the output after a failure or interruption, or with checkpoints
+    leave it to be resumed from the last one
+    """
+    for formatter in self.formatters.values():
+      if self.checkpoint_interval:
+        formatter.keep()
+      else:
+        formatter.abort()
+
+  def run(self, ts, threads=False):
+    """
+    Extract the captions, either all on this thread or with reading and demuxing
+    on their own threads.
+    :param ts: TS object reading the input file
+    :return: False if extraction failed
+    """
+    self.ts = ts
+    ts.OnESPacket = self.OnESPacket
+    if self.services or self.split_programmes:
+      ts.psi = ProgramMap()
+      ts.psi.OnPMT = self.OnPMT
+    if self.split_programmes:
+      from arib.mpeg.si import Guide
+      self.guide = Guide(ts.psi, ts)
+    if self.resume:
+      try:
+        self.restore_checkpoint()
+      except (CheckpointError, FileOpenError) as ex:
+        if not self.silent:
+          print("*** Sorry, " + str(ex))
+        return False
+    if self.checkpoint_interval:
+      ts.OnCheckpoint = self.save_checkpoint
+      ts.checkpoint_interval = self.checkpoint_interval
+    try:
+      if threads:
+        Pipeline(ts).run(self.OnESPacket, accept=self.accept, clock=self.place)
+      else:
+        ts.Parse()
+    except KeyboardInterrupt:
+      self.discard()
+      raise
+    except Exception as ex:
+      self.discard()
+      if not self.silent:
+        print("*** Sorry, " + str(ex))
+      return False
+
+    for formatter in self.formatters.values():
+      formatter.close()
+    if self.checkpoint_interval:
+      checkpoint.remove(self.checkpoint_filename())
+    clock = ts.timeline
+    if self.verbose and (clock.wraps or clock.discontinuities):
+      print("Timeline: {w} PCR wraparounds, {d} discontinuities, {t:.3f}s of media".format(
+        w=clock.wraps, d=clock.discontinuities, t=clock.now()))
+    return True
+
+  def status(self):
+    """
+    Report on what was found once run() has succeeded
+    :return: process exit status
+    """
+    if self.pid < 0 and not self.caption_pids and not self.silent:
+      print("*** Sorry. No ARIB subtitle content was found in file: " + self.infilename + " ***")
+      return -1
+
+    if self.formatters and not any(f.file_written() for f in self.formatters.values()) and not self.silent:
+      print("*** Sorry. No nonempty ARIB closed caption content found in file " + self.infilename + " ***")
+      return -1
+
+    return 0
+
+
+def output_filenames(infilename, outfile, formats):
+  """
+  Output filename for each format. With several formats, the extension of
+  outfile (if given) is replaced per format.
+  """
+  outfilenames = {}
+  for f in formats:
+    outfilenames[f] = infilename + "." + extension(f)
+    if outfile is not None:
+      if len(formats) == 1:
+        outfilenames[f] = outfile
+      else:
+        outfilenames[f] = os.path.splitext(outfile)[0] + "." + extension(f)
+  return outfilenames
+
+
+def labelled_filename(outfilename, labels):
+  """
+  Output filename for one PID and/or caption language, with its labels inserted
+  before the extension, e.g. file.ts.ass becomes file.ts.pid304.jpn.ass
+  """
+  root, ext = os.path.splitext(outfilename)
+  return '.'.join([root] + list(labels)) + ext
 
-  except EOFError:
-    pass
-  except FileOpenError as ex:
-    # allow IOErrors to kill application
-    raise ex
-  except Exception, err:
-    if not SILENT and pid >= 0:
-      print("Exception thrown while handling DataGroup in ES. This may be due to many factors"
-        + "such as file corruption or the .ts file using as yet unsupported features.")
-      traceback.print_exc(file=sys.stdout)
 
+# longest programme title used in a filename
+MAX_TITLE_LABEL = 40
 
-def main():
-  global pid
-  global VERBOSE
-  global SILENT
-  global infilename
-  global outfilename
-  global tmax
-  global time_offset
+def programme_label(event):
+  """
+  Filename label of a programme: its start time and title, e.g. 20261019-2100.相棒
+  """
+  start = event.start.strftime('%Y%m%d-%H%M') if event.start else 'event' + str(event.event_id)
+  title = u''.join(c if c.isalnum() or c in u'-_' else u'_' for c in event.title).strip(u'_')
+  return start + (u'.' + title[:MAX_TITLE_LABEL] if title else u'')
+
+
+def open_ts(infilename, args, stats=None):
+  """
+  TS object reading infilename with the reader chosen on the command line
+  """
+  reader = None
+  if args.follow:
+    from arib.mpeg.follow import FollowReader
+    reader = FollowReader(infilename, idle_timeout=args.follow_timeout)
+  elif args.reader == 'block' or args.threads:
+    prefetch = args.prefetch or (DEFAULT_PREFETCH_BLOCKS if args.threads else 0)
+    reader = BlockReader(infilename, block_size=args.block_size * 1024 * 1024, prefetch=prefetch)
+  return TS(infilename, stats=stats, window=TS.STREAM_WINDOW if args.stream else None, reader=reader)
+
+
+def batch(extractions, args, registry=None):
+  """
+  Run several extractions on a pool of args.jobs threads. Nothing is shared
+  between them apart from the read only decoding tables.
+  :return: process exit status
+  """
+  # multiprocessing is slow to import, and most runs convert a single file
+  from multiprocessing.pool import ThreadPool
+
+  def extract(extraction):
+    # a file that can't be read fails on its own, not the whole batch
+    try:
+      ts = open_ts(extraction.infilename, args)
+    except Exception as ex:
+      if not extraction.silent:
+        print("*** Sorry, " + str(ex))
+      return -1
+    if registry:
+      ts.metrics = extraction.metrics
+    if not extraction.run(ts, args.threads):
+      return -1
+    return extraction.status()
+
+  pool = ThreadPool(max(1, args.jobs))
+  try:
+    results = pool.map(extract, extractions)
+  finally:
+    pool.close()
+    pool.join()
+
+  failed = 0
+  for extraction, result in zip(extractions, results):
+    if result != 0:
+      failed += 1
+    if not extraction.silent:
+      summary = extraction.errors.summary()
+      print(extraction.infilename + ": " + ("ok" if result == 0 else "failed")
+        + (" (" + summary + ")" if summary else ""))
+  if args.stream and not args.quiet and peak_memory_kb() is not None:
+    print("Peak memory: {m:.1f} MB".format(m=peak_memory_kb() / 1024.0))
+  if failed:
+    if not args.quiet:
+      print("*** " + str(failed) + " of " + str(len(extractions)) + " files failed ***")
+    return -1
+  return 0
 
+
+def main():
   parser = argparse.ArgumentParser(
     description='Remove ARIB formatted Closed Caption information from an MPEG TS file and format the results as a standard .ass subtitle file.')
-  parser.add_argument('infile', help='Input filename (MPEG2 Transport Stream File)', type=str)
-  parser.add_argument('-o', '--outfile', help='Output filename (.ass subtitle file)', type=str, default=None)
+  parser.add_argument('infile', help='Input filename (MPEG2 Transport Stream File). Several may be given for batch conversion.',
+                      type=str, nargs='+')
+  parser.add_argument('-o', '--outfile',
+                      help='Output filename (.ass subtitle file). With several output formats, the extension is replaced per format.',
+                      type=str, default=None)
+  parser.add_argument('-f', '--format',
+                      help='Output format. May be given several times to write several formats in a single pass (default: ass).',
+                      choices=sorted(FORMATTERS.keys()), action='append', default=None)
   parser.add_argument('-p', '--pid',
                       help='Specify a PID of a PES known to contain closed caption info (tool will attempt to find the proper PID if not specified.).',
                       type=int, default=-1)
+  parser.add_argument('-l', '--languages',
+                      help='Write each caption language to its own file (e.g. file.ts.jpn.ass and file.ts.eng.ass) in a single pass.',
+                      action='store_true')
+  parser.add_argument('-a', '--all-pids',
+                      help='Extract every PID carrying caption data (e.g. closed captions and superimposed text) to its own file, e.g. file.ts.pid304.ass, in a single pass.',
+                      action='store_true')
+  parser.add_argument('--services',
+                      help='Extract the captions of every service of a multiplex (MPTS), found through its PAT and PMTs, to its own file, e.g. file.ts.sid1024.ass, in a single pass.',
+                      action='store_true')
+  parser.add_argument('--split-programmes',
+                      help='Write each programme (EIT event) to its own file, named after its start time and title, e.g. file.ts.20261019-2100.Title.ass, with times from the start of the programme.',
+                      action='store_true')
+  parser.add_argument('--follow',
+                      help='Follow a recording that is still being written: keep reading as the file grows and write each caption to the output as soon as it is complete, until the file is closed or renamed.',
+                      action='store_true')
+  parser.add_argument('--follow-timeout',
+                      help='With --follow, also stop once the file has not grown for this many seconds (0 waits until it is closed or renamed).',
+                      type=float, default=DEFAULT_IDLE_TIMEOUT_S)
+  parser.add_argument('--checkpoint',
+                      help='Save a checkpoint every --checkpoint-interval MB of input (to OUTFILE.checkpoint), and keep partial output if interrupted, so that --resume can carry on from there.',
+                      action='store_true')
+  parser.add_argument('--checkpoint-interval', help='MB of input between checkpoints.', type=int,
+                      default=checkpoint.DEFAULT_CHECKPOINT_INTERVAL_MB)
+  parser.add_argument('--resume',
+                      help='Carry on from the last checkpoint of an interrupted conversion with the same options (implies --checkpoint).',
+                      action='store_true')
   parser.add_argument('-v', '--verbose', help='Verbose output.', action='store_true')
   parser.add_argument('-q', '--quiet', help='Does not write to stdout.', action='store_true')
   parser.add_argument('-t', '--tmax', help='Subtitle display time limit (seconds).', type=int, default=5)
   parser.add_argument('-m', '--timeoffset',
                       help='Shift all time values in generated .ass file by indicated floating point offset in seconds.',
                       type=float, default=0.0)
+  parser.add_argument('--flush-lines',
+                      help='Number of subtitle lines buffered in memory before being written to disk (0 writes only on completion).',
+                      type=int, default=DEFAULT_FLUSH_LINES)
+  parser.add_argument('--stream',
+                      help='Bounded memory mode for very long recordings: read the file through a fixed size window instead of memory mapping it, and report peak memory use.',
+                      action='store_true')
+  parser.add_argument('--reader',
+                      help='How the .ts file is read: memory mapped (mmap) or in large blocks (block), which suits network filesystems better.',
+                      choices=['mmap', 'block'], default='mmap')
+  parser.add_argument('--block-size', help='Block size in MB for the block reader.', type=int,
+                      default=DEFAULT_BLOCK_SIZE // (1024 * 1024))
+  parser.add_argument('--prefetch', help='Number of blocks the block reader reads ahead on a background thread.',
+                      type=int, default=0)
+  parser.add_argument('--threads',
+                      help='Read, demux and decode on separate threads so that I/O overlaps with decoding. Implies the block reader.',
+                      action='store_true')
+  parser.add_argument('-j', '--jobs', help='Number of input files converted at once, each on its own thread.',
+                      type=int, default=1)
+  parser.add_argument('--error-interval',
+                      help='Print each kind of decoding error at most once in this many seconds (0 prints all).',
+                      type=float, default=5.0)
+  parser.add_argument('--stats', help='Print time spent in each processing stage, exceptions and packets per PID.',
+                      action='store_true')
+  parser.add_argument('--metrics-port', help='Serve Prometheus metrics at http://127.0.0.1:PORT/metrics while running.',
+                      type=int, default=None)
+  parser.add_argument('--channel', help='Channel label for metrics (default: input filename).', type=str, default=None)
   args = parser.parse_args()
 
-  pid = args.pid
-  infilename = args.infile
-  outfilename = infilename + ".ass"
-  if args.outfile is not None:
-    outfilename = args.outfile
-
-  SILENT = args.quiet
-  VERBOSE = args.verbose
-  tmax = args.tmax
-  time_offset = args.timeoffset
-
-  if not os.path.exists(infilename) and not SILENT:
-    print 'Input filename :' + infilename + " does not exist."
-    sys.exit(-1)
-
-  ts = TS(infilename)
-
-  ts.Progress = OnProgress
-  ts.OnTSPacket = OnTSPacket
-  ts.OnESPacket = OnESPacket
+  infilenames = args.infile
+  if (args.all_pids or args.services) and args.pid >= 0:
+    parser.error('--all-pids and --services can not be used with --pid')
+  if len(infilenames) > 1 and args.outfile is not None:
+    parser.error('--outfile can only be used with a single input file')
+  if len(infilenames) > 1 and args.stats:
+    # --stats times the decoding classes themselves, which all files share
+    parser.error('--stats can only be used with a single input file')
+  if (args.checkpoint or args.resume) and args.threads:
+    # demuxing runs ahead of decoding, so there's no point where both agree
+    parser.error('--checkpoint and --resume can not be used with --threads')
+
+  # each format once, in the order given. Two formatters of one format
+  # would write the same file.
+  formats = list(dict.fromkeys(args.format)) if args.format else ['ass']
+  flush_lines = args.flush_lines
+  if args.stream and not flush_lines:
+    # keeping all output until the end isn't bounded
+    flush_lines = DEFAULT_FLUSH_LINES
+
+  for infilename in infilenames:
+    if not os.path.exists(infilename) and not args.quiet:
+      print('Input filename :' + infilename + " does not exist.")
+      sys.exit(-1)
+
+  registry = None
+  if args.metrics_port is not None:
+    from arib import metrics as arib_metrics
+    registry = arib_metrics.Registry()
+    arib_metrics.serve(registry, args.metrics_port)
+
+  extractions = []
+  for infilename in infilenames:
+    metrics = None
+    if registry:
+      channel = args.channel if args.channel and len(infilenames) == 1 else os.path.basename(infilename)
+      metrics = registry.worker(channel=channel)
+      metrics.set('arib_caption_pid', args.pid)
+    extractions.append(Extraction(infilename, output_filenames(infilename, args.outfile, formats), formats,
+      pid=args.pid, tmax=args.tmax, time_offset=args.timeoffset, flush_lines=flush_lines,
+      verbose=args.verbose, silent=args.quiet, errors=ErrorLog(interval=args.error_interval), metrics=metrics,
+      languages=args.languages, all_pids=args.all_pids, services=args.services,
+      split_programmes=args.split_programmes,
+      checkpoint_interval=args.checkpoint_interval * 1024 * 1024 if args.checkpoint or args.resume else 0,
+      resume=args.resume, live=args.follow))
+
+  if len(extractions) > 1:
+    sys.exit(batch(extractions, args, registry))
+
+  extraction = extractions[0]
+
+  stats = None
+  if args.stats:
+    stats = Stats()
+    stats.instrument(DataGroup, '__init__', 'data_group', lambda self, f, context=None: len(f))
+    stats.instrument(StatementBody, 'parse_contents', 'decode', lambda f, bytes_to_read: bytes_to_read)
+    stats.instrument(MultiFormatter, 'format', 'format')
+    stats.instrument(BufferedFile, 'flush', 'write')
+
+  ts = open_ts(extraction.infilename, args, stats)
+  ts.metrics = extraction.metrics
+  if not args.follow:
+    # the file keeps growing, so there's no percentage to show
+    ts.Progress = extraction.OnProgress
 
   try:
-    ts.Parse()
-  except Exception as ex:
-    if not SILENT:
-      print("*** Sorry, " + str(ex))
-    sys.exit(-1)
-
-  if pid < 0 and not SILENT:
-    print("*** Sorry. No ARIB subtitle content was found in file: " + infilename + " ***")
-    sys.exit(-1)
-
-  if ass and not ass.file_written() and not SILENT:
-    print("*** Sorry. No nonempty ARIB closed caption content found in file " + infilename + " ***")
-    sys.exit(-1)
-
-  sys.exit(0)
+    if not extraction.run(ts, args.threads):
+      sys.exit(-1)
+  finally:
+    if stats:
+      stats.restore()
+      print(stats.report())
+    if extraction.errors.summary() and not args.quiet:
+      print(extraction.errors.summary())
+    if args.stream and not stats and not args.quiet and peak_memory_kb() is not None:
+      print("Peak memory: {m:.1f} MB".format(m=peak_memory_kb() / 1024.0))
+
+  sys.exit(extraction.status())
 
 if __name__ == "__main__":
   main()
-
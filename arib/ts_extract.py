@@ -10,21 +10,26 @@ DATE: Thursday, October 20th 2016
 import os
 import sys
 import argparse
+import functools
 import traceback
-from read import EOFError
+import arib.read as read
+from arib.read import EOFError
 
-from mpeg.ts import TS
-from mpeg.ts import ES
+from arib.mpeg.ts import TS
+from arib.mpeg.ts import ES
 
 from arib.closed_caption import next_data_unit
 from arib.closed_caption import StatementBody
+from arib.closed_caption import StatementText
 import arib.code_set as code_set
 import arib.control_characters as control_characters
 from arib.data_group import DataGroup
+from arib.data_group import check_data_group
+from arib.data_group import OK
 
-# print out some additional info for DRCS values
-from arib.closed_caption import set_DRCS_debug
-set_DRCS_debug(True)
+from arib.closed_caption import Context
+from arib.closed_caption import DEFAULT_CONTEXT
+from arib.output import utf8_stdout
 
 
 
@@ -83,10 +88,16 @@ def formatter(statements, timestamp):
     Note we deal with unicode only here.
   '''
   print('File elapsed time seconds: {s}'.format(s=timestamp))
-  line = u''.join([unicode(s) for s in statements if type(s) in DISPLAYED_CC_STATEMENTS])
+  line = u''.join([str(s) for s in statements if type(s) in DISPLAYED_CC_STATEMENTS])
   return line
 
 
+def text_formatter(text, timestamp):
+  '''Lines of the text of a StatementText, each after the elapsed time
+  '''
+  return u'\n'.join(u'{t:.3f}\t{line}'.format(t=timestamp, line=line) for line in text.split(u'\n'))
+
+
 def OnProgress(bytes_read, total_bytes, percent):
   """
   Callback method invoked on a change in file progress percent (not every packet)
@@ -120,7 +131,7 @@ def OnTSPacket(packet):
     delta = current_timestamp - initial_timestamp
     elapsed_time_s = float(delta) / 90000.0
 
-def OnESPacket(current_pid, packet, header_size):
+def OnESPacket(current_pid, packet, header_size, context=DEFAULT_CONTEXT):
   """
   Callback invoked on the successful extraction of an Elementary Stream packet from the
   Transport Stream file packets.
@@ -129,6 +140,7 @@ def OnESPacket(current_pid, packet, header_size):
     from multiple TS packet payloads.
   :param header_size: Size of the header in bytes (characters in the string). Provided to more
     easily separate the packet into header and payload.
+  :param context: closed_caption.Context to decode with
   :return: None
   """
   global pid
@@ -139,10 +151,13 @@ def OnESPacket(current_pid, packet, header_size):
   if pid >= 0 and current_pid != pid:
     return
 
+  # skip foreign and damaged data without the cost of raising
+  payload = ES.get_pes_payload(packet)
+  if check_data_group(payload) != OK:
+    return
+
   try:
-    payload = ES.get_pes_payload(packet)
-    f = list(payload)
-    data_group = DataGroup(f)
+    data_group = DataGroup(read.Cursor(payload), context)
     if not data_group.is_management_data():
       #We now have a Data Group that contains caption data.
       #We take out its payload, but this is further divided into 'Data Unit' structures
@@ -150,6 +165,11 @@ def OnESPacket(current_pid, packet, header_size):
       #iterate through the Data Units in this payload via another generator.
       for data_unit in next_data_unit(caption):
         #we're only interested in those Data Units which are "statement body" to get CC data.
+        if isinstance(data_unit.payload(), StatementText):
+          text = data_unit.payload().payload()
+          if text and VERBOSE:
+            print(text_formatter(text, elapsed_time_s))
+          continue
         if not isinstance(data_unit.payload(), StatementBody):
           continue
 
@@ -164,11 +184,9 @@ def OnESPacket(current_pid, packet, header_size):
         #formatter function above. This dumps the basic text to stdout.
         cc = formatter(data_unit.payload().payload(), elapsed_time_s)
         if cc and VERBOSE:
-          #according to best practice, always deal internally with UNICODE, and encode to
-          #your encoding of choice as late as possible. Here, i'm encoding as UTF-8 for
-          #my command line.
-          #DECODE EARLY, ENCODE LATE
-          print(cc.encode('utf-8'))
+          #always deal internally with unicode text. print encodes it for the
+          #command line as late as possible.
+          print(cc)
     else:
       # management data
       management_data = data_group.payload()
@@ -184,7 +202,7 @@ def OnESPacket(current_pid, packet, header_size):
 
   except EOFError:
     pass
-  except Exception, err:
+  except Exception as err:
     if VERBOSE and not SILENT and pid >= 0:
       print("Exception thrown while handling DataGroup in ES. This may be due to many factors"
          + "such as file corruption or the .ts file using as yet unsupported features.")
@@ -193,24 +211,31 @@ def OnESPacket(current_pid, packet, header_size):
 
 def main():
   global pid
+  utf8_stdout()
 
   parser = argparse.ArgumentParser(description='Draw CC Packets from MPG2 Transport Stream file.')
   parser.add_argument('infile', help='Input filename (MPEG2 Transport Stream File)', type=str)
   parser.add_argument('-p', '--pid', help='Specify a PID of a PES known to contain closed caption info (tool will attempt to find the proper PID if not specified.).', type=int, default=-1)
+  parser.add_argument('--text-only', help='Print only the text of each caption, after its elapsed time in seconds. Decodes much faster.', action='store_true')
   args = parser.parse_args()
 
   infilename = args.infile
   pid = args.pid
+  # print out some additional info for DRCS values, unless only after the text
+  if args.text_only:
+    context = Context(text_only=True)
+  else:
+    context = Context(drcs_debug=True)
 
   if not os.path.exists(infilename):
-    print 'Input filename :' + infilename + " does not exist."
+    print('Input filename :' + infilename + " does not exist.")
     os.exit(-1)
 
   ts = TS(infilename)
 
   ts.Progress = OnProgress
   ts.OnTSPacket = OnTSPacket
-  ts.OnESPacket = OnESPacket
+  ts.OnESPacket = functools.partial(OnESPacket, context=context)
 
   ts.Parse()
 
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: bench_corpus
+Desc: Time each stage of closed caption processing over the tests/*.es corpus
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Stages timed separately for every file:
+  read        reading the .es and splitting it into data groups
+  data_group  DataGroup/DataUnit parsing, excluding statement decoding
+  decode      decoding statement bodies into characters and control codes
+  format      ASSFormatter formatting of the decoded statements
+  write       encoding and writing the buffered .ass output
+
+Results are written as JSON. A previous result can be given as a baseline,
+in which case each stage is compared and the exit code is 1 if any stage
+is slower than the baseline by more than the tolerance. To ignore noise in
+the short stages, the slowdown must also be more than MIN_SHARE of the
+baseline's total time (and at least MIN_DELTA seconds): a few milliseconds
+of scheduling jitter easily makes a 15ms stage 20% slower.
+
+usage:
+  python benchmarks/bench_corpus.py -o baseline.json
+  python benchmarks/bench_corpus.py -b baseline.json
+
+'''
+import os
+import sys
+import argparse
+import glob
+import json
+import platform
+import shutil
+import struct
+import tempfile
+import timeit
+
+try:
+  import resource
+except ImportError:
+  resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from arib.closed_caption import next_data_unit
+from arib.closed_caption import StatementBody
+from arib.data_group import DataGroup
+import arib.read as read
+from arib.ass import ASSFormatter
+
+timer = timeit.default_timer
+
+STAGES = ['read', 'data_group', 'decode', 'format', 'write']
+
+DATA_GROUP_START = b'\x80\xff\xf0'
+
+# stage slowdowns smaller than this share of the total time, or than
+# MIN_DELTA seconds, are treated as noise
+MIN_SHARE = 0.02
+MIN_DELTA = 0.01
+
+DEFAULT_REPEAT = 5
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', '*.es')
+
+
+class Timed(object):
+  '''Accumulate time spent in a function
+  '''
+  def __init__(self, func):
+    self._func = func
+    self.elapsed = 0.0
+
+  def __call__(self, *args):
+    start = timer()
+    try:
+      return self._func(*args)
+    finally:
+      self.elapsed += timer() - start
+
+
+def split_data_groups(data):
+  '''Split a closed caption elementary stream into raw data group bytes
+  '''
+  groups = []
+  i = data.find(DATA_GROUP_START)
+  while i >= 0 and i + 8 <= len(data):
+    size = struct.unpack('>H', data[i + 6:i + 8])[0]
+    groups.append(data[i:i + 10 + size])
+    i = data.find(DATA_GROUP_START, i + 10 + size)
+  return groups
+
+
+def bench_file(filepath, outdir):
+  '''Run every stage once over a single .es file
+  :return: dict of stage timings and counts
+  '''
+  result = {'bytes' : os.path.getsize(filepath)}
+
+  start = timer()
+  with open(filepath, 'rb') as f:
+    groups = split_data_groups(f.read())
+  result['read'] = timer() - start
+
+  # statement decoding happens inside data group parsing, so time it
+  # separately and subtract it out.
+  decode = Timed(StatementBody.parse_contents)
+  parse_contents = StatementBody.__dict__['parse_contents']
+  StatementBody.parse_contents = staticmethod(decode)
+  captions = []
+  errors = 0
+  start = timer()
+  try:
+    for i, g in enumerate(groups):
+      try:
+        data_group = DataGroup(read.Cursor(g))
+      except Exception:
+        errors += 1
+        continue
+      if data_group.is_management_data():
+        continue
+      for data_unit in next_data_unit(data_group.payload()):
+        if isinstance(data_unit.payload(), StatementBody):
+          captions.append((data_unit.payload().payload(), float(i)))
+  finally:
+    StatementBody.parse_contents = parse_contents
+  result['data_group'] = timer() - start - decode.elapsed
+  result['decode'] = decode.elapsed
+
+  outfile = os.path.join(outdir, os.path.basename(filepath) + '.ass')
+  formatter = ASSFormatter(video_filename=outfile, flush_lines=0)
+  start = timer()
+  for statements, timestamp in captions:
+    formatter.format(statements, timestamp)
+  result['format'] = timer() - start
+
+  start = timer()
+  formatter.close()
+  result['write'] = timer() - start
+
+  result['data_groups'] = len(groups)
+  result['errors'] = errors
+  result['statements'] = sum(len(s) for s, t in captions)
+  return result
+
+
+def bench(files, repeat=DEFAULT_REPEAT):
+  '''Benchmark a list of .es files, keeping the best time of each stage
+  '''
+  outdir = tempfile.mkdtemp(prefix='arib-bench-')
+  results = {}
+  try:
+    for filepath in files:
+      best = None
+      for r in range(repeat):
+        result = bench_file(filepath, outdir)
+        if best is None:
+          best = result
+        else:
+          for stage in STAGES:
+            best[stage] = min(best[stage], result[stage])
+      results[os.path.basename(filepath)] = best
+  finally:
+    shutil.rmtree(outdir, ignore_errors=True)
+
+  totals = {}
+  for key in STAGES + ['bytes', 'data_groups', 'errors', 'statements']:
+    totals[key] = sum(r[key] for r in results.values())
+  elapsed = sum(totals[stage] for stage in STAGES)
+  totals['elapsed'] = elapsed
+  totals['bytes_per_s'] = totals['bytes'] / elapsed if elapsed else 0.0
+  totals['statements_per_s'] = totals['statements'] / elapsed if elapsed else 0.0
+
+  report = {
+    'python' : platform.python_version(),
+    'implementation' : platform.python_implementation(),
+    'repeat' : repeat,
+    'files' : results,
+    'totals' : totals,
+    # peak resident set size of the whole run in KB (linux), if available
+    'peak_rss_kb' : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+  }
+  return report
+
+
+def compare(report, baseline, tolerance):
+  '''Print a per stage comparison against a baseline report
+  :return: list of stages slower than the baseline by more than tolerance
+  '''
+  regressions = []
+  min_delta = max(MIN_DELTA, MIN_SHARE * baseline['totals']['elapsed'])
+  print('{s:<12} {b:>10} {c:>10} {r:>8}'.format(s='stage', b='baseline', c='current', r='ratio'))
+  for stage in STAGES + ['elapsed']:
+    old = baseline['totals'][stage]
+    new = report['totals'][stage]
+    ratio = new / old if old else 0.0
+    flag = ''
+    if old and ratio > 1.0 + tolerance and new - old > min_delta:
+      regressions.append(stage)
+      flag = ' <-- regression'
+    print('{s:<12} {b:>10.4f} {c:>10.4f} {r:>8.2f}{f}'.format(s=stage, b=old, c=new, r=ratio, f=flag))
+  return regressions
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark ARIB closed caption processing stages over a corpus of .es files.')
+  parser.add_argument('infiles', help='Input .es files (default: tests/*.es)', type=str, nargs='*')
+  parser.add_argument('-n', '--repeat', help='Runs per file. The fastest time of each stage is kept.', type=int,
+                      default=DEFAULT_REPEAT)
+  parser.add_argument('-o', '--output', help='Write JSON results to this file rather than stdout.', type=str, default=None)
+  parser.add_argument('-b', '--baseline', help='Compare against JSON results of a previous run.', type=str, default=None)
+  parser.add_argument('-t', '--tolerance', help='Allowed slowdown against the baseline as a fraction (default 0.1).',
+                      type=float, default=0.1)
+  args = parser.parse_args()
+
+  files = args.infiles or sorted(glob.glob(DEFAULT_CORPUS))
+  if not files:
+    print('No input .es files found.')
+    sys.exit(-1)
+
+  report = bench(files, repeat=args.repeat)
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2, sort_keys=True)
+  elif not args.baseline:
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    if compare(report, baseline, args.tolerance):
+      sys.exit(1)
+
+  sys.exit(0)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: bench_import
+Desc: Check the import time of the command line tools against a budget
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Jobs that run arib-ts2ass on thousands of short clips spend a noticeable
+part of their time starting the interpreter and importing the package.
+For each command line module this measures, in fresh interpreters:
+
+  import      wall time of "import <module>" less that of an empty run
+  heavy       slow to import modules loaded that the tools should only
+              load when a feature needing them is used (HEAVY_MODULES)
+
+The exit code is 1 if any heavy module is loaded or the best import time
+of a module is over the budget. Modules are byte compiled first, since a
+run without cached bytecode mostly measures compilation.
+
+usage:
+  python benchmarks/bench_import.py
+  python benchmarks/bench_import.py -b 40 -n 20 arib.ts2ass
+
+'''
+import os
+import sys
+import argparse
+import compileall
+import json
+import subprocess
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+timer = timeit.default_timer
+
+MODULES = ['arib.ts2ass', 'arib.ts_extract', 'arib.es_extract', 'arib.drcs_extract', 'arib.archive']
+
+# only imported on demand: thread pools for -j, http for --metrics-port,
+# requests for translation and hashlib for DRCS digests. xml.sax was only
+# ever needed for escaping TTML text.
+HEAVY_MODULES = ['multiprocessing', 'http.server', 'urllib.request', 'requests', 'hashlib', 'xml.sax']
+
+DEFAULT_BUDGET_MS = 50.0
+
+LOADED = 'import sys, {m}; print(" ".join(m for m in {h!r} if m in sys.modules))'
+
+
+def run(code):
+  '''Wall time of running code in a fresh interpreter
+  :return: tuple of (seconds, stdout)
+  '''
+  env = dict(os.environ, PYTHONPATH=ROOT)
+  start = timer()
+  out = subprocess.check_output([sys.executable, '-c', code], env=env)
+  return timer() - start, out.decode('utf-8').strip()
+
+
+def bench(module, repeat):
+  '''Best import time of a module over repeat runs, less interpreter startup
+  '''
+  empty = min(run('pass')[0] for i in range(repeat))
+  best = min(run('import ' + module)[0] for i in range(repeat))
+  heavy = run(LOADED.format(m=module, h=HEAVY_MODULES))[1]
+  return {
+    'import_ms' : max(0.0, best - empty) * 1000.0,
+    'startup_ms' : empty * 1000.0,
+    'heavy' : heavy.split() if heavy else [],
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Check the import time of the arib command line tools against a budget.')
+  parser.add_argument('modules', help='Modules to check (default: all command line tools)', type=str, nargs='*')
+  parser.add_argument('-b', '--budget', help='Import time budget per module in ms (default {b}).'.format(b=DEFAULT_BUDGET_MS),
+                      type=float, default=DEFAULT_BUDGET_MS)
+  parser.add_argument('-n', '--repeat', help='Runs per module. The fastest is kept.', type=int, default=10)
+  parser.add_argument('-o', '--output', help='Also write JSON results to this file.', type=str, default=None)
+  args = parser.parse_args()
+
+  compileall.compile_dir(os.path.join(ROOT, 'arib'), quiet=1)
+
+  results = {}
+  failed = False
+  print('{m:<20} {i:>10} {s:>10}  {h}'.format(m='module', i='import ms', s='startup ms', h='heavy modules'))
+  for module in args.modules or MODULES:
+    result = bench(module, args.repeat)
+    results[module] = result
+    flag = ''
+    if result['heavy'] or result['import_ms'] > args.budget:
+      failed = True
+      flag = ' <-- over budget'
+    print('{m:<20} {i:>10.1f} {s:>10.1f}  {h}{f}'.format(m=module, i=result['import_ms'], s=result['startup_ms'],
+      h=' '.join(result['heavy']) or '-', f=flag))
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump({'budget_ms' : args.budget, 'modules' : results}, f, indent=2, sort_keys=True)
+
+  sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+  main()
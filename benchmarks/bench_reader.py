@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: bench_reader
+Desc: Compare the throughput of the MPEG ts reader backends on a .ts file
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Backends:
+  mmap          TS.next_packet over a memory map of the whole file (default)
+  stream        TS.next_packet through a fixed size read window (--stream)
+  block         BlockReader large block reads
+  prefetch      BlockReader with a prefetch thread
+
+Run it on files on each filesystem of interest (e.g. a local disk and an
+NFS mount). Results depend heavily on whether the file is already in the
+page cache, so either use files larger than memory or drop caches between
+runs (as root: sync; echo 3 > /proc/sys/vm/drop_caches).
+
+usage:
+  python benchmarks/make_ts.py -s 2G -o /mnt/nfs/2g.ts
+  python benchmarks/bench_reader.py /mnt/nfs/2g.ts
+  python benchmarks/bench_reader.py --parse -b 16 -o nfs.json /mnt/nfs/2g.ts
+
+'''
+import os
+import sys
+import argparse
+import json
+import platform
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from arib.mpeg.ts import TS
+from arib.mpeg.reader import BlockReader
+
+timer = timeit.default_timer
+
+BACKENDS = ['mmap', 'stream', 'block', 'prefetch']
+
+
+def packets(backend, filepath, block_size, prefetch):
+  if backend == 'mmap':
+    return TS.next_packet(filepath)
+  if backend == 'stream':
+    return TS.next_packet(filepath, window=TS.STREAM_WINDOW)
+  if backend == 'block':
+    return BlockReader(filepath, block_size).packets()
+  return BlockReader(filepath, block_size, prefetch).packets()
+
+
+def reader(backend, filepath, block_size, prefetch):
+  if backend == 'mmap':
+    return {}
+  if backend == 'stream':
+    return {'window' : TS.STREAM_WINDOW}
+  if backend == 'block':
+    return {'reader' : BlockReader(filepath, block_size)}
+  return {'reader' : BlockReader(filepath, block_size, prefetch)}
+
+
+def bench(backend, filepath, block_size, prefetch, parse):
+  '''Time one pass over the file, either only reading packets or running TS.Parse
+  '''
+  start = timer()
+  count = None
+  if parse:
+    ts = TS(filepath, **reader(backend, filepath, block_size, prefetch))
+    ts.OnESPacket = lambda pid, es, header_size: None
+    ts.Parse()
+  else:
+    count = 0
+    for packet in packets(backend, filepath, block_size, prefetch):
+      count += 1
+  elapsed = timer() - start
+  size = os.path.getsize(filepath)
+  return {
+    'seconds' : elapsed,
+    'packets' : count,
+    'mb_per_s' : size / elapsed / 1000000.0 if elapsed else 0.0,
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Compare MPEG ts reader backends on a .ts file.')
+  parser.add_argument('infile', help='Input .ts file', type=str)
+  parser.add_argument('-r', '--backend', help='Backend to run. May be given several times (default: all).',
+                      choices=BACKENDS, action='append', default=None)
+  parser.add_argument('-b', '--block-size', help='Block size in MB for the block backends.', type=int, default=8)
+  parser.add_argument('-f', '--prefetch', help='Blocks read ahead by the prefetch backend.', type=int, default=2)
+  parser.add_argument('-p', '--parse', help='Time TS.Parse (PES reassembly included) rather than only reading packets.',
+                      action='store_true')
+  parser.add_argument('-n', '--repeat', help='Runs per backend. The fastest is kept.', type=int, default=1)
+  parser.add_argument('-o', '--output', help='Also write JSON results to this file.', type=str, default=None)
+  args = parser.parse_args()
+
+  block_size = args.block_size * 1024 * 1024
+  results = {}
+  print('{b:<10} {s:>10} {r:>10}'.format(b='backend', s='seconds', r='MB/s'))
+  for backend in args.backend or BACKENDS:
+    best = None
+    for i in range(args.repeat):
+      result = bench(backend, args.infile, block_size, args.prefetch, args.parse)
+      if best is None or result['seconds'] < best['seconds']:
+        best = result
+    results[backend] = best
+    print('{b:<10} {s:>10.3f} {r:>10.1f}'.format(b=backend, s=best['seconds'], r=best['mb_per_s']))
+
+  if args.output:
+    report = {
+      'file' : os.path.abspath(args.infile),
+      'bytes' : os.path.getsize(args.infile),
+      'python' : platform.python_version(),
+      'parse' : args.parse,
+      'block_size' : block_size,
+      'prefetch' : args.prefetch,
+      'backends' : results,
+    }
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2, sort_keys=True)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: make_ts
+Desc: Generate synthetic MPEG TS files carrying the tests/*.es closed captions
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+The repository only carries closed caption elementary streams, not whole
+transport streams. This wraps the caption data groups of one or more .es files
+into a valid transport stream of any requested size, for benchmarking and
+regression testing TS.Parse and arib-ts2ass:
+
+  * PAT and PMT (program 1) every 100ms
+  * dummy MPEG2 video and AAC audio PES at the given bitrates, so caption
+    packets are as sparse as they are in broadcast recordings
+  * PCR on the video PID every frame, PTS on every PES
+  * one caption data group every --interval seconds, looping over the input
+  * optionally, superimpose (character super) from other .es files on a
+    second PID, in asynchronous PES (private_stream_2, no PTS) every
+    --superimpose-interval seconds, as ARIB sends it
+  * optional corruption: dropped packets, flipped bits, transport errors
+    and lost sync bytes
+
+Output is fully determined by the arguments (including --seed).
+
+usage:
+  python benchmarks/make_ts.py -s 1G -o /tmp/1g.ts
+  python benchmarks/make_ts.py -s 200M --corrupt 0.001 -o /tmp/noisy.ts tests/aibou.es
+  python benchmarks/make_ts.py -s 50M --superimpose tests/toriko_subs.es -o /tmp/super.ts tests/aibou.es
+
+'''
+import os
+import sys
+import argparse
+import glob
+import random
+import struct
+
+PACKET_SIZE = 188
+PAYLOAD_SIZE = 184
+SYNC_BYTE = b'\x47'
+
+PAT_PID = 0x0000
+PMT_PID = 0x0101
+VIDEO_PID = 0x0111
+AUDIO_PID = 0x0112
+CAPTION_PID = 0x0130
+SUPERIMPOSE_PID = 0x0138
+
+PROGRAM_NUMBER = 1
+
+# PMT stream types
+STREAM_TYPE_MPEG2_VIDEO = 0x02
+STREAM_TYPE_AAC = 0x0f
+STREAM_TYPE_PES_PRIVATE = 0x06
+
+# ARIB component tag for the first closed caption stream
+CAPTION_COMPONENT_TAG = 0x30
+# and for the first superimpose stream
+SUPERIMPOSE_COMPONENT_TAG = 0x38
+STREAM_IDENTIFIER_DESCRIPTOR = 0x52
+
+VIDEO_STREAM_ID = 0xe0
+AUDIO_STREAM_ID = 0xc0
+PRIVATE_STREAM_1 = 0xbd
+PRIVATE_STREAM_2 = 0xbf
+
+CLOCK = 90000
+FRAME_RATE = 30000 / 1001.0
+AUDIO_FRAME_S = 1024 / 48000.0
+PSI_INTERVAL_S = 0.1
+
+DATA_GROUP_START = b'\x80\xff\xf0'
+# data identifier of superimpose, in place of 0x80. Outside the CRC.
+ASYNCHRONOUS_DATA = 0x81
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', '*.es')
+
+
+def crc32_table():
+  table = []
+  for i in range(256):
+    c = i << 24
+    for j in range(8):
+      c = ((c << 1) ^ 0x04c11db7) if c & 0x80000000 else (c << 1)
+    table.append(c & 0xffffffff)
+  return table
+
+CRC32_TABLE = crc32_table()
+
+def crc32(data):
+  '''CRC32/MPEG-2 as used by PSI sections
+  '''
+  crc = 0xffffffff
+  for c in data:
+    crc = ((crc << 8) & 0xffffffff) ^ CRC32_TABLE[((crc >> 24) ^ c) & 0xff]
+  return crc
+
+
+def randint(r, a, b):
+  '''Random integer in [a, b]. Unlike random.randint, this gives the same
+  numbers from the same seed on every Python version.
+  '''
+  return a + int(r.random() * (b - a + 1))
+
+
+def parse_size(s):
+  '''Parse sizes like 500M, 1G or 1048576
+  '''
+  units = {'K' : 1 << 10, 'M' : 1 << 20, 'G' : 1 << 30, 'T' : 1 << 40}
+  s = s.strip().upper().rstrip('B')
+  if s and s[-1] in units:
+    return int(float(s[:-1]) * units[s[-1]])
+  return int(s)
+
+
+def read_data_groups(files):
+  '''Raw data groups (including the 0x80 0xff 0xf0 PES data header) of .es files
+  '''
+  groups = []
+  for filepath in files:
+    with open(filepath, 'rb') as f:
+      data = f.read()
+    i = data.find(DATA_GROUP_START)
+    while i >= 0 and i + 8 <= len(data):
+      size = struct.unpack('>H', data[i + 6:i + 8])[0]
+      groups.append(data[i:i + 10 + size])
+      i = data.find(DATA_GROUP_START, i + 10 + size)
+  return groups
+
+
+def pts_field(pts):
+  '''5 byte PES PTS field (PTS only)
+  '''
+  pts &= 0x1ffffffff
+  return struct.pack('>BHH', 0x21 | ((pts >> 29) & 0x0e), ((pts >> 14) & 0xfffe) | 1, ((pts << 1) & 0xfffe) | 1)
+
+def pes_packet(stream_id, payload, pts, bounded=True):
+  '''PES packet with a PTS. Video PES may be unbounded (length 0).
+  '''
+  header = b'\x80\x80\x05' + pts_field(pts)
+  length = len(header) + len(payload) if bounded else 0
+  return b'\x00\x00\x01' + bytes([stream_id]) + struct.pack('>H', length) + header + payload
+
+def data_packet(stream_id, payload):
+  '''PES packet without the optional header (and so without a PTS), as
+  private_stream_2 is sent
+  '''
+  return b'\x00\x00\x01' + bytes([stream_id]) + struct.pack('>H', len(payload)) + payload
+
+def superimpose_group(group):
+  '''Caption data group as superimpose
+  '''
+  return bytes([ASYNCHRONOUS_DATA]) + group[1:]
+
+def psi_section(table_id, table_id_extension, body):
+  '''Long form PSI section with CRC
+  '''
+  length = 5 + len(body) + 4
+  section = bytes([table_id]) + struct.pack('>HHBBB', 0xb000 | length, table_id_extension, 0xc1, 0, 0) + body
+  return section + struct.pack('>I', crc32(section))
+
+def pat():
+  return psi_section(0x00, 1, struct.pack('>HH', PROGRAM_NUMBER, 0xe000 | PMT_PID))
+
+def pmt(superimpose=False):
+  streams = b''
+  streams += struct.pack('>BHH', STREAM_TYPE_MPEG2_VIDEO, 0xe000 | VIDEO_PID, 0xf000)
+  streams += struct.pack('>BHH', STREAM_TYPE_AAC, 0xe000 | AUDIO_PID, 0xf000)
+  descriptor = struct.pack('>BBB', STREAM_IDENTIFIER_DESCRIPTOR, 1, CAPTION_COMPONENT_TAG)
+  streams += struct.pack('>BHH', STREAM_TYPE_PES_PRIVATE, 0xe000 | CAPTION_PID, 0xf000 | len(descriptor)) + descriptor
+  if superimpose:
+    descriptor = struct.pack('>BBB', STREAM_IDENTIFIER_DESCRIPTOR, 1, SUPERIMPOSE_COMPONENT_TAG)
+    streams += struct.pack('>BHH', STREAM_TYPE_PES_PRIVATE, 0xe000 | SUPERIMPOSE_PID, 0xf000 | len(descriptor)) + descriptor
+  body = struct.pack('>HH', 0xe000 | VIDEO_PID, 0xf000) + streams
+  return psi_section(0x02, PROGRAM_NUMBER, body)
+
+
+class TSWriter(object):
+  '''Packetize PES and PSI sections into 188 byte TS packets
+  '''
+  def __init__(self, f, corrupt=0.0, seed=0):
+    self._f = f
+    self._cc = {}
+    self._corrupt = corrupt
+    self._random = random.Random(seed)
+    self.bytes = 0
+    self.packets = 0
+    self.corrupted = 0
+
+  def _counter(self, pid):
+    cc = self._cc.get(pid, 0)
+    self._cc[pid] = (cc + 1) & 0x0f
+    return cc
+
+  def packet(self, pid, payload, pusi=False, pcr=None):
+    '''Single packet. Short payloads are padded with adaptation field stuffing.
+    '''
+    af = b''
+    if pcr is not None:
+      base = pcr & 0x1ffffffff
+      af = b'\x10' + struct.pack('>IH', base >> 1, ((base & 1) << 15) | 0x7e00)
+    room = PAYLOAD_SIZE - (len(af) + 1 if af else 0)
+    if len(payload) > room:
+      raise ValueError('payload too large for packet')
+    stuffing = room - len(payload)
+    if af:
+      af = bytes([len(af) + stuffing]) + af + b'\xff' * stuffing
+    elif stuffing == 1:
+      af = b'\x00'
+    elif stuffing:
+      af = bytes([stuffing - 1]) + b'\x00' + b'\xff' * (stuffing - 2)
+    if not payload:
+      control = 0x20
+      cc = self._cc.get(pid, 0)
+    else:
+      control = 0x30 if af else 0x10
+      cc = self._counter(pid)
+    header = struct.pack('>BHB', 0x47, (0x4000 if pusi else 0) | pid, control | cc)
+    return header + af + payload
+
+  def pes(self, pid, data, pcr=None):
+    '''Split a PES packet over as many TS packets as needed
+    '''
+    first = PAYLOAD_SIZE - (8 if pcr is not None else 0)
+    packets = [self.packet(pid, data[:first], pusi=True, pcr=pcr)]
+    for i in range(first, len(data), PAYLOAD_SIZE):
+      packets.append(self.packet(pid, data[i:i + PAYLOAD_SIZE]))
+    return packets
+
+  def section(self, pid, section):
+    return [self.packet(pid, b'\x00' + section, pusi=True)]
+
+  def corrupt(self, packet):
+    '''Damage a packet in one of several ways. Returns b'' for a dropped packet.
+    '''
+    r = self._random
+    kind = randint(r, 0, 3)
+    self.corrupted += 1
+    if kind == 0:
+      return b''
+    if kind == 1:
+      i = randint(r, 4, PACKET_SIZE - 1)
+      return packet[:i] + bytes([packet[i] ^ (1 << randint(r, 0, 7))]) + packet[i + 1:]
+    if kind == 2:
+      return packet[:1] + bytes([packet[1] | 0x80]) + packet[2:]
+    return b'\x00' + packet[1:]
+
+  def write(self, packets):
+    if self._corrupt:
+      packets = [self.corrupt(p) if self._random.random() < self._corrupt else p for p in packets]
+    data = b''.join(packets)
+    self._f.write(data)
+    self.bytes += len(data)
+    self.packets += len([p for p in packets if p])
+
+
+def generate(f, groups, size, video_kbps=15000, audio_kbps=192, interval=2.0, start=10.0,
+  corrupt=0.0, seed=0, superimpose=(), superimpose_interval=7.0):
+  '''Write size bytes (rounded up to the next video frame) of transport stream to f
+  :param superimpose: data groups sent as superimpose, if any
+  '''
+  writer = TSWriter(f, corrupt=corrupt, seed=seed)
+  filler = random.Random(seed)
+  video_frame = bytes(randint(filler, 0, 255) for i in range(int(video_kbps * 1000 // 8 / FRAME_RATE)))
+  audio_frame = bytes(randint(filler, 0, 255) for i in range(int(audio_kbps * 1000 // 8 * AUDIO_FRAME_S)))
+  pat_section = pat()
+  pmt_section = pmt(bool(superimpose))
+  superimpose = [superimpose_group(group) for group in superimpose]
+
+  frame = 0
+  audio = 0
+  caption = 0
+  superimposed = 0
+  next_psi = 0.0
+  while writer.bytes < size:
+    t = frame / FRAME_RATE
+    clock = int((start + t) * CLOCK)
+    packets = []
+    if t >= next_psi:
+      packets += writer.section(PAT_PID, pat_section)
+      packets += writer.section(PMT_PID, pmt_section)
+      next_psi += PSI_INTERVAL_S
+    packets += writer.pes(VIDEO_PID, pes_packet(VIDEO_STREAM_ID, video_frame, clock, bounded=False), pcr=clock)
+    while audio * AUDIO_FRAME_S <= t:
+      pts = int((start + audio * AUDIO_FRAME_S) * CLOCK)
+      packets += writer.pes(AUDIO_PID, pes_packet(AUDIO_STREAM_ID, audio_frame, pts))
+      audio += 1
+    while groups and caption * interval <= t:
+      pts = int((start + caption * interval) * CLOCK)
+      group = groups[caption % len(groups)]
+      packets += writer.pes(CAPTION_PID, pes_packet(PRIVATE_STREAM_1, group, pts))
+      caption += 1
+    while superimpose and superimposed * superimpose_interval <= t:
+      group = superimpose[superimposed % len(superimpose)]
+      packets += writer.pes(SUPERIMPOSE_PID, data_packet(PRIVATE_STREAM_2, group))
+      superimposed += 1
+    writer.write(packets)
+    frame += 1
+  return writer
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Generate a synthetic MPEG TS file carrying ARIB closed captions from .es files.')
+  parser.add_argument('infiles', help='Input .es files (default: tests/*.es)', type=str, nargs='*')
+  parser.add_argument('-o', '--outfile', help='Output .ts filename', type=str, required=True)
+  parser.add_argument('-s', '--size', help='Output size, e.g. 100M or 2G (default 100M)', type=str, default='100M')
+  parser.add_argument('--video-kbps', help='Dummy video bitrate in kbps (default 15000)', type=int, default=15000)
+  parser.add_argument('--audio-kbps', help='Dummy audio bitrate in kbps (default 192)', type=int, default=192)
+  parser.add_argument('-i', '--interval', help='Seconds between caption data groups (default 2.0)', type=float, default=2.0)
+  parser.add_argument('--start', help='Clock value in seconds at the start of the stream (default 10.0)', type=float, default=10.0)
+  parser.add_argument('-c', '--corrupt', help='Fraction of packets to corrupt (default 0)', type=float, default=0.0)
+  parser.add_argument('--seed', help='Random seed for dummy payloads and corruption (default 0)', type=int, default=0)
+  parser.add_argument('--superimpose', help='.es file whose data groups are also sent as superimpose, in asynchronous PES on a second PID. May be given several times.',
+                      type=str, action='append', default=[])
+  parser.add_argument('--superimpose-interval', help='Seconds between superimpose data groups (default 7.0)', type=float, default=7.0)
+  parser.add_argument('-q', '--quiet', help='Does not write to stdout.', action='store_true')
+  args = parser.parse_args()
+
+  files = args.infiles or sorted(glob.glob(DEFAULT_CORPUS))
+  groups = read_data_groups(files)
+  if not groups:
+    print('No closed caption data groups found in input files.')
+    sys.exit(-1)
+
+  with open(args.outfile, 'wb') as f:
+    writer = generate(f, groups, parse_size(args.size), video_kbps=args.video_kbps, audio_kbps=args.audio_kbps,
+      interval=args.interval, start=args.start, corrupt=args.corrupt, seed=args.seed,
+      superimpose=read_data_groups(args.superimpose), superimpose_interval=args.superimpose_interval)
+
+  if not args.quiet:
+    print('Wrote {n} packets ({b} bytes, {c} corrupted) to {o}'.format(n=writer.packets, b=writer.bytes,
+      c=writer.corrupted, o=args.outfile))
+  sys.exit(0)
+
+if __name__ == "__main__":
+  main()
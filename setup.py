@@ -15,6 +15,7 @@ from setuptools import setup
 #version 0.6.3: Basic management data handling and language detection.
 #version 0.6.4: Fixes to issues #27, #33 (subtitle positions in generatd .ass files).
 #version 0.6.5: Fixes for issues #41, #43, #44: General file handling
+#version 0.7.0: Python 3
 
 def readme():
   with open('README.md') as f:
@@ -25,13 +26,13 @@ def requirements():
     return f.read().splitlines()
 
 setup(name='arib',
-  version='0.6.5',
+  version='0.7.0',
   description='Japan Association of Radio Industries and Businesses (ARIB) MPEG2 Transport Stream Closed Caption Decoding Tools',
   long_description = readme(),
 	classifiers=[
     'Development Status :: 3 - Alpha',
     'License :: OSI Approved :: MIT License',
-    'Programming Language :: Python :: 2.7',
+    'Programming Language :: Python :: 3',
     'Topic :: Multimedia :: Sound/Audio :: Conversion',
   ],
   keywords = 'Japanese Closed Caption arib b-24 MPEG TS PES',
@@ -41,13 +42,17 @@ setup(name='arib',
   license='MIT',
   packages=[
     'arib',
+    'arib.mpeg',
   ],
+  python_requires='>=3.6',
   install_requires = requirements(),
   entry_points = {
     'console_scripts': [
       'arib-ts2ass=arib.ts2ass:main',
       'arib-ts-extract=arib.ts_extract:main',
       'arib-es-extract=arib.es_extract:main',
+      'arib-drcs-extract=arib.drcs_extract:main',
+      'arib-archive=arib.archive:main',
   ],
   },
   zip_safe=True)
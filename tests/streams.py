@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: streams.py
+Desc: Small transport streams and scratch directories for tests
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Streams are written by benchmarks/make_ts.py from the tests/*.es captures,
+at a low bitrate and with captions every 0.2s so that a few MB hold a few
+dozen captions.
+
+'''
+import os
+import shutil
+import sys
+import tempfile
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS, '..', 'benchmarks'))
+
+import make_ts
+
+DEFAULT_ES = 'aibou.es'
+DEFAULT_SIZE = 4 * 1024 * 1024
+
+
+def write_ts(filepath, size=DEFAULT_SIZE, es=DEFAULT_ES, **kwargs):
+  '''Write a transport stream carrying the captions of a tests/ .es file
+  :param kwargs: passed on to make_ts.generate
+  '''
+  options = {'video_kbps': 1000, 'audio_kbps': 64, 'interval': 0.2}
+  options.update(kwargs)
+  groups = make_ts.read_data_groups([os.path.join(TESTS, es)])
+  with open(filepath, 'wb') as f:
+    make_ts.generate(f, groups, size, **options)
+  return filepath
+
+
+class Directory(object):
+  '''Temporary directory, removed with everything in it
+  '''
+  def __enter__(self):
+    self.path = tempfile.mkdtemp(prefix='arib-test-')
+    return self.path
+
+  def __exit__(self, exc_type, exc_value, tb):
+    shutil.rmtree(self.path, ignore_errors=True)
+    return False
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: tables.py
+Desc: Hand built PSI/SI sections and the TS packets carrying them, for tests
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+'''
+import struct
+
+from arib.mpeg import psi
+
+
+def long_section(table_id, table_id_extension, body, section_number=0, last_section_number=0, version=0):
+  '''Long form section with its CRC
+  '''
+  length = 5 + len(body) + psi.CRC_SIZE
+  section = bytes([table_id]) + struct.pack('>HHBBB', 0xb000 | length, table_id_extension, 0xc1 | (version << 1),
+    section_number, last_section_number) + body
+  return section + struct.pack('>I', psi.crc32(section))
+
+
+def packets(pid, section, size=184):
+  '''TS packets carrying a section, split into payloads of at most size bytes.
+  The last is padded with stuffing after the section, the others with
+  adaptation field stuffing.
+  '''
+  payload = b'\x00' + section
+  result = []
+  for i in range(0, len(payload), size):
+    chunk = payload[i:i + size]
+    control = 0x10
+    if i + size >= len(payload):
+      chunk += b'\xff' * (184 - len(chunk))
+    elif len(chunk) < 184:
+      control = 0x30
+      stuffing = 184 - len(chunk)
+      af = b'\x00' if stuffing == 1 else bytes([stuffing - 1, 0]) + b'\xff' * (stuffing - 2)
+      chunk = af + chunk
+    pusi = 0x4000 if i == 0 else 0
+    result.append(struct.pack('>BHB', 0x47, pusi | pid, control | (len(result) & 0x0f)) + chunk)
+  return result
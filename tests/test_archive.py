@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: test_archive.py
+Desc: Checks of ingesting recordings into, and searching, a caption archive
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Each test ingests make_ts.py streams into an archive in a temporary
+directory.
+
+Run it directly, or with pytest:
+
+  python tests/test_archive.py
+
+'''
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from arib.arib_exceptions import ArchiveError
+from arib.archive import Archive
+from arib.archive import phrase_query
+from arib.archive import sha256
+from streams import Directory
+from streams import write_ts
+
+MB = 1024 * 1024
+
+
+def captions(archive):
+  '''(path, start, text) of every caption in the archive
+  '''
+  return archive._db.execute('SELECT f.path, c.start, c.text FROM captions c JOIN files f ON f.id = c.file_id '
+    'ORDER BY f.path, c.start').fetchall()
+
+
+def files(archive):
+  return archive._db.execute('SELECT path, sha256, size FROM files').fetchall()
+
+
+def test_same_contents():
+  with Directory() as d:
+    first = write_ts(os.path.join(d, 'first.ts'), size=MB)
+    copy = os.path.join(d, 'copy.ts')
+    shutil.copy(first, copy)
+    with Archive(os.path.join(d, 'captions.db')) as archive:
+      count = archive.ingest(first)
+      assert count == len(captions(archive)) > 0
+      # skipped wherever it is, and left where it was first found
+      assert archive.ingest(copy) is None
+      assert archive.ingested(sha256(copy)) == first
+      assert files(archive) == [(first, sha256(first), os.path.getsize(first))]
+      assert len(captions(archive)) == count
+
+
+def test_changed_file():
+  with Directory() as d:
+    recording = write_ts(os.path.join(d, 'recording.ts'), size=MB)
+    with Archive(os.path.join(d, 'captions.db')) as archive:
+      before = archive.ingest(recording)
+      assert [hit.text for hit in archive.search(u'宝の持ち腐れ')] == [u'（社 美彌子）春にアップした動画ね。\n（冠城 亘）宝の持ち腐れ。']
+      # the recording had been still being written
+      write_ts(recording, size=2 * MB)
+      after = archive.ingest(recording)
+      assert after > before
+      assert files(archive) == [(recording, sha256(recording), os.path.getsize(recording))]
+      assert len(captions(archive)) == after
+      # and the index has lost the captions replaced
+      assert len(archive.search(u'宝の持ち腐れ')) == 1
+      assert archive._db.execute('SELECT COUNT(*) FROM captions_fts').fetchone()[0] == after
+
+
+def test_short_phrases():
+  with Directory() as d:
+    recording = write_ts(os.path.join(d, 'recording.ts'))
+    with Archive(os.path.join(d, 'captions.db')) as archive:
+      archive.ingest(recording)
+      everything = captions(archive)
+      # too short for a trigram, so not found through the index
+      assert archive._db.execute('SELECT COUNT(*) FROM captions_fts WHERE captions_fts MATCH ?',
+        (phrase_query(u'画面'),)).fetchone()[0] == 0
+      for phrase in (u'え', u'画面', u'再生数', u'宝の持ち腐れ', u'%', u'_', u'\\'):
+        expected = [(path, start, text) for path, start, text in everything if phrase in text]
+        assert [(hit.path, hit.start, hit.text) for hit in archive.search(phrase)] == expected, phrase
+        if len(phrase) < 3 and phrase.isalnum():
+          assert expected, phrase
+
+
+class FailingArchive(Archive):
+  '''Archive that fails part way through ingesting, once some captions have
+  been inserted
+  '''
+  def write(self, row):
+    if self.flushed >= 2:
+      raise ValueError('decoding failed')
+    Archive.write(self, row)
+
+  def flush(self):
+    if self._rows:
+      self.flushed += 1
+    Archive.flush(self)
+
+
+def test_rollback():
+  with Directory() as d:
+    recording = write_ts(os.path.join(d, 'recording.ts'), size=MB)
+    database = os.path.join(d, 'captions.db')
+    with Archive(database) as archive:
+      archive.ingest(recording)
+      expected = (files(archive), captions(archive))
+    # a changed recording that can't be decoded leaves the archive as it was
+    write_ts(recording, size=2 * MB)
+    with FailingArchive(database, batch_size=2) as archive:
+      archive.flushed = 0
+      try:
+        archive.ingest(recording)
+      except ArchiveError:
+        pass
+      else:
+        assert False
+      assert archive.flushed == 2
+      assert (files(archive), captions(archive)) == expected
+    with Archive(database) as archive:
+      assert (files(archive), captions(archive)) == expected
+      # and it can be ingested once it can be decoded
+      assert archive.ingest(recording) == len(captions(archive)) > len(expected[1])
+
+
+if __name__ == '__main__':
+  for name, test in sorted(globals().items()):
+    if name.startswith('test_') and callable(test):
+      test()
+      print(name + ': ok')
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: test_checkpoint.py
+Desc: Checks that a resumed extraction writes what an uninterrupted one does
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Run it directly, or with pytest:
+
+  python tests/test_checkpoint.py
+
+'''
+import gc
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from arib import checkpoint
+from arib.arib_exceptions import CheckpointError
+from arib.mpeg.ts import TS
+from arib.ts2ass import Extraction
+from arib.ts2ass import output_filenames
+from streams import Directory
+from streams import write_ts
+
+# bytes of input between checkpoints, so a 4MB stream has about 20
+INTERVAL = 188 * 1000
+
+
+class Interrupted(Extraction):
+  '''Extraction that dies when about to save its stop_at'th checkpoint
+  '''
+  def __init__(self, *args, **kwargs):
+    self.stop_at = kwargs.pop('stop_at')
+    self.saved = 0
+    Extraction.__init__(self, *args, **kwargs)
+
+  def save_checkpoint(self, offset):
+    self.saved += 1
+    if self.saved == self.stop_at:
+      raise RuntimeError('interrupted')
+    Extraction.save_checkpoint(self, offset)
+
+
+def extract(infile, outdir, formats, stop_at=None, **kwargs):
+  '''Run an extraction writing to outdir
+  :return: tuple of (run() result, Extraction)
+  '''
+  outfilenames = output_filenames(infile, os.path.join(outdir, 'out.' + formats[0]), formats)
+  if stop_at is None:
+    extraction = Extraction(infile, outfilenames, formats, silent=True, **kwargs)
+  else:
+    extraction = Interrupted(infile, outfilenames, formats, silent=True, stop_at=stop_at, **kwargs)
+  return extraction.run(TS(infile)), extraction
+
+
+def contents(directory):
+  result = {}
+  for name in os.listdir(directory):
+    with open(os.path.join(directory, name), 'rb') as f:
+      result[name] = f.read()
+  return result
+
+
+# a write torn by the crash, left past the end of what the output will be
+TORN = b'\0' * (1024 * 1024)
+
+
+def resume(formats, stop_at, **kwargs):
+  # every line goes straight to the .part files, so there is output written
+  # after the last checkpoint for resuming to truncate
+  kwargs['flush_lines'] = 1
+  with Directory() as d:
+    infile = write_ts(os.path.join(d, 'in.ts'))
+    # both runs write to the same place, since .ass headers name their file
+    outdir = os.path.join(d, 'out')
+    os.mkdir(outdir)
+    ok, extraction = extract(infile, outdir, formats, **kwargs)
+    assert ok
+    expected = contents(outdir)
+    assert expected and all(expected.values())
+    for name in expected:
+      os.remove(os.path.join(outdir, name))
+
+    ok, extraction = extract(infile, outdir, formats, stop_at=stop_at,
+      checkpoint_interval=INTERVAL, **kwargs)
+    assert not ok
+    assert extraction.saved == stop_at
+    # only the checkpoint and the incomplete outputs are left
+    left = sorted(os.listdir(outdir))
+    assert left == sorted([name + '.part' for name in expected] + ['out.' + formats[0] + '.checkpoint'])
+    for name in expected:
+      with open(os.path.join(outdir, name + '.part'), 'ab') as f:
+        f.write(TORN)
+
+    ok, extraction = extract(infile, outdir, formats, checkpoint_interval=INTERVAL, resume=True, **kwargs)
+    assert ok
+    # byte for byte the same, and the checkpoint is gone
+    assert contents(outdir) == expected
+
+
+def test_resume():
+  resume(['ass', 'srt', 'jsonl'], 5)
+
+
+def test_resume_languages():
+  resume(['vtt'], 12, languages=True)
+
+
+def test_load():
+  with Directory() as d:
+    filename = os.path.join(d, 'out.ass.checkpoint')
+    assert checkpoint.load(filename) is None
+    checkpoint.save(filename, {'offset': 188}, ('in.ts', ['ass']))
+    assert checkpoint.load(filename) == {'offset': 188}
+    assert checkpoint.load(filename, ('in.ts', ['ass'])) == {'offset': 188}
+    try:
+      checkpoint.load(filename, ('in.ts', ['srt']))
+    except CheckpointError:
+      pass
+    else:
+      assert False
+    checkpoint.remove(filename)
+    assert os.listdir(d) == []
+
+
+def test_other_version():
+  with Directory() as d:
+    filename = os.path.join(d, 'out.ass.checkpoint')
+    with open(filename, 'wb') as f:
+      pickle.dump((checkpoint.VERSION + 1, None), f)
+      pickle.dump({}, f)
+    try:
+      checkpoint.load(filename)
+    except CheckpointError:
+      pass
+    else:
+      assert False
+
+
+def test_corrupt():
+  with Directory() as d:
+    infile = write_ts(os.path.join(d, 'in.ts'), size=188 * 100)
+    with open(os.path.join(d, 'out.ass.checkpoint'), 'wb') as f:
+      f.write(b'\x80\x04not a pickle')
+    try:
+      checkpoint.load(os.path.join(d, 'out.ass.checkpoint'))
+    except CheckpointError:
+      pass
+    else:
+      assert False
+    # a run asked to resume from it fails, and writes nothing
+    ok, extraction = extract(infile, d, ['ass'], checkpoint_interval=INTERVAL, resume=True)
+    assert not ok
+    assert sorted(os.listdir(d)) == ['in.ts', 'out.ass.checkpoint']
+
+
+def test_other_conversion():
+  with Directory() as d:
+    infile = write_ts(os.path.join(d, 'in.ts'))
+    ok, extraction = extract(infile, d, ['ass'], stop_at=3, checkpoint_interval=INTERVAL)
+    assert not ok
+    left = contents(d)
+    # resuming with other options is refused, leaving the checkpoint and the
+    # partial output as they were for a resume with the right ones
+    ok, extraction = extract(infile, d, ['ass'], checkpoint_interval=INTERVAL, resume=True, languages=True)
+    assert not ok
+    gc.collect()
+    assert contents(d) == left
+    ok, extraction = extract(infile, d, ['ass'], checkpoint_interval=INTERVAL, resume=True)
+    assert ok
+    assert sorted(os.listdir(d)) == ['in.ts', 'out.ass']
+
+
+if __name__ == '__main__':
+  for name, test in sorted(globals().items()):
+    if name.startswith('test_') and callable(test):
+      test()
+      print(name + ': ok')
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: test_follow.py
+Desc: Checks that following a growing recording gives what reading it whole does
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+A writer thread copies a make_ts.py stream into place in chunks of random,
+not packet aligned, sizes while an extraction follows it with FollowReader
+polling for more (inotify=False). The output must be that of an extraction
+of the whole file, whether the writer renames the file when done or just
+leaves it to the idle timeout.
+
+Run it directly, or with pytest:
+
+  python tests/test_follow.py
+
+'''
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from arib.mpeg.follow import FollowReader
+from arib.mpeg.reader import copy
+from arib.mpeg.ts import TS
+from arib.ts2ass import Extraction
+from arib.ts2ass import output_filenames
+from streams import Directory
+from streams import write_ts
+
+FORMATS = ['ass', 'srt', 'jsonl']
+SIZE = 2 * 1024 * 1024
+POLL_INTERVAL_S = 0.02
+
+
+class Writer(threading.Thread):
+  '''Copies data to a file in chunks of random size, as a recorder would
+  :param done: 'rename' to rename the file once written, or None to leave it
+  '''
+  def __init__(self, data, filepath, done=None):
+    threading.Thread.__init__(self)
+    self.daemon = True
+    self._data = data
+    self._filepath = filepath
+    self._done = done
+    self.finished = None
+
+  def run(self):
+    rnd = random.Random(1)
+    with open(self._filepath, 'ab') as f:
+      i = 0
+      while i < len(self._data):
+        n = rnd.randint(1, 64 * 1024)
+        f.write(self._data[i:i + n])
+        f.flush()
+        i += n
+        time.sleep(0.002)
+      self.finished = time.time()
+      if self._done == 'rename':
+        os.rename(self._filepath, self._filepath + '.done')
+
+
+def contents(directory):
+  result = {}
+  for name in os.listdir(directory):
+    with open(os.path.join(directory, name), 'rb') as f:
+      result[name] = f.read()
+  return result
+
+
+def extract(infile, outdir, **kwargs):
+  outfilenames = output_filenames(infile, os.path.join(outdir, 'out.' + FORMATS[0]), FORMATS)
+  return Extraction(infile, outfilenames, FORMATS, silent=True, **kwargs)
+
+
+def follow(done, idle_timeout):
+  '''Follow a stream as it's written, and check the output is that of a
+  static run over the whole of it
+  :return: seconds from the last write to the end of extraction
+  '''
+  with Directory() as d:
+    source = write_ts(os.path.join(d, 'source.ts'), size=SIZE)
+    with open(source, 'rb') as f:
+      data = f.read()
+    # both runs write to the same place, since .ass headers name their file
+    outdir = os.path.join(d, 'out')
+    os.mkdir(outdir)
+    assert extract(source, outdir).run(TS(source))
+    expected = contents(outdir)
+    assert len(expected) == len(FORMATS) and all(expected.values())
+    for name in expected:
+      os.remove(os.path.join(outdir, name))
+
+    recording = os.path.join(d, 'recording.ts')
+    open(recording, 'wb').close()
+    writer = Writer(data, recording, done)
+    reader = FollowReader(recording, poll_interval=POLL_INTERVAL_S, idle_timeout=idle_timeout, inotify=False)
+    ts = TS(recording, reader=reader)
+    writer.start()
+    assert extract(source, outdir, live=True).run(ts)
+    ended = time.time()
+    writer.join()
+    assert ts.offset() == len(data)
+    assert contents(outdir) == expected
+    return ended - writer.finished
+
+
+def test_renamed():
+  # no idle timeout: only the rename ends it
+  follow('rename', 0)
+
+
+def test_idle_timeout():
+  idle = follow(None, 0.5)
+  assert 0.5 <= idle < 5
+
+
+def test_packets():
+  # a partial packet waits for the rest of it, and garbage is skipped as when
+  # reading the whole file
+  with Directory() as d:
+    source = write_ts(os.path.join(d, 'source.ts'), size=188 * 2000)
+    with open(source, 'rb') as f:
+      data = bytearray(f.read())
+    data[188 * 500:188 * 500] = b'\xff' * 100
+    data += data[:100]
+    whole = os.path.join(d, 'whole.ts')
+    with open(whole, 'wb') as f:
+      f.write(data)
+    skipped = [0]
+    expected = [bytes(p) for p in TS.next_packet(whole, skipped=skipped)]
+
+    recording = os.path.join(d, 'recording.ts')
+    open(recording, 'wb').close()
+    writer = Writer(bytes(data), recording)
+    reader = FollowReader(recording, read_size=1000, poll_interval=POLL_INTERVAL_S, idle_timeout=0.2, inotify=False)
+    writer.start()
+    followed = [0]
+    packets = [copy(p) for p in reader.packets(skipped=followed)]
+    writer.join()
+    assert packets == expected
+    assert followed == skipped == [100]
+
+
+if __name__ == '__main__':
+  for name, test in sorted(globals().items()):
+    if name.startswith('test_') and callable(test):
+      test()
+      print(name + ': ok')
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: test_formats.py
+Desc: Checks of the caption output formats
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Every registered format is written from the first statements of one .es
+sample, which has furigana and ACPS line breaks and ends with lines still
+waiting for a clear screen, and compared with the files in tests/formats.
+
+Run it directly, or with pytest:
+
+  python tests/test_formats.py
+
+After a deliberate change to a format, write the files again with:
+
+  python tests/test_formats.py --update
+
+'''
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import arib.read as read
+import arib.control_characters as control_characters
+from arib.closed_caption import Context
+from arib.closed_caption import StatementBody
+from arib.closed_caption import next_data_unit
+from arib.data_group import next_data_group
+from arib.error_log import ErrorLog
+from arib.formats import FORMATTERS
+from arib.formats import MAX_PENDING_LINES
+from arib.formats import MultiFormatter
+from arib.formats import extension
+from arib.metrics import Worker
+from streams import Directory
+from streams import TESTS
+
+SAMPLE = 'ace_of_diamond_subs_pid276'
+# statement bodies of the sample used, ending part way through a caption
+BODIES = 86
+# seconds between statement bodies
+STEP = 1.5
+GOLDEN = os.path.join(TESTS, 'formats')
+
+
+def statements(body):
+  '''Decoded statements of a statement body
+  '''
+  return StatementBody.parse_contents(read.Cursor(body), len(body))
+
+
+def sample():
+  '''The first BODIES statement bodies of the sample, decoded
+  '''
+  bodies = []
+  with contextlib.redirect_stdout(io.StringIO()):
+    for data_group in next_data_group(os.path.join(TESTS, SAMPLE + '.es'), Context()):
+      if data_group.is_management_data():
+        continue
+      for data_unit in next_data_unit(data_group.payload()):
+        if isinstance(data_unit.payload(), StatementBody):
+          bodies.append(data_unit.payload().payload())
+  return bodies[:BODIES]
+
+
+def write_all():
+  '''Output of every registered format for the sample
+  :return: dict of format name to text
+  '''
+  with Directory() as d:
+    names = sorted(FORMATTERS)
+    filenames = [os.path.join(d, SAMPLE + '.' + extension(name)) for name in names]
+    formatters = [FORMATTERS[name](video_filename=filename) for name, filename in zip(names, filenames)]
+    with MultiFormatter(formatters) as formatter:
+      for i, statements in enumerate(sample()):
+        formatter.format(statements, STEP * i)
+      # the last caption is still on screen, to be written on closing
+      assert formatters[names.index('srt')]._lines[0]
+    result = {}
+    for name, filename in zip(names, filenames):
+      with open(filename, 'rb') as f:
+        # .ass headers name the file written
+        result[name] = f.read().decode('utf-8').replace(d + os.sep, u'')
+    return result
+
+
+def golden_filename(name):
+  return os.path.join(GOLDEN, SAMPLE + '.' + extension(name))
+
+
+def test_golden():
+  assert sorted(FORMATTERS) == ['ass', 'jsonl', 'srt', 'ttml', 'txt', 'vtt']
+  for name, text in write_all().items():
+    with open(golden_filename(name), 'rb') as f:
+      assert text == f.read().decode('utf-8'), name
+
+
+def test_furigana_and_acps():
+  output = write_all()
+  # furigana are left out of plain text, but drawn small in .ass
+  assert u'自分のことみたいに' in output['txt'] and u'じぶん' not in output['txt']
+  assert u'{\\rsmall}' in output['ass'] and u'じぶん' in output['ass']
+  # the caption on screen at the end, two lines broken by ACPS, is the last cue
+  assert output['srt'].endswith(u'00:02:06,000 --> 00:02:11,000\n俺は敬遠された哲のあとに\n続くことができなかった。\n\n')
+  assert output['txt'].endswith(u'俺は敬遠された哲のあとに\n続くことができなかった。\n')
+
+
+def test_dropped_lines():
+  # lines that never see a clear screen, each a kanji and an APS
+  lines = statements(bytes([0x30, 0x21, control_characters.APS.CODE, 0x41, 0x41]) * (MAX_PENDING_LINES + 6))
+  with Directory() as d:
+    formatters = [FORMATTERS[name](video_filename=os.path.join(d, 'out.' + name)) for name in ('ass', 'srt')]
+    metrics = Worker()
+    out = io.StringIO()
+    errors = ErrorLog(out=out)
+    with MultiFormatter(formatters, metrics=metrics, errors=errors) as formatter:
+      formatter.format(lines, 1.0)
+      assert [f.dropped_lines for f in formatters] == [7, 7]
+      formatter.format(lines, 2.0)
+    assert [f.dropped_lines for f in formatters] == [7 + MAX_PENDING_LINES + 6] * 2
+    # counted once, not once per format
+    assert dict(metrics.values())[('arib_caption_lines_dropped_total', ())] == 7 + MAX_PENDING_LINES + 6
+    assert errors.counts == {'lines_dropped': 2}
+    # and reported, at most every few seconds
+    assert out.getvalue() == '7 caption lines dropped, waiting too long for a clear screen\n'
+
+
+if __name__ == '__main__':
+  if '--update' in sys.argv:
+    for name, text in write_all().items():
+      with open(golden_filename(name), 'wb') as f:
+        f.write(text.encode('utf-8'))
+      print('wrote ' + golden_filename(name))
+    sys.exit(0)
+  for name, test in sorted(globals().items()):
+    if name.startswith('test_') and callable(test):
+      test()
+      print(name + ': ok')
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: test_import_time.py
+Desc: Checks the import time of the command line tools against a budget
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Measured by benchmarks/bench_import.py in fresh interpreters. The budget
+(50ms by default) can be raised for slow machines with the
+ARIB_IMPORT_BUDGET_MS environment variable.
+
+Run it directly, or with pytest:
+
+  python tests/test_import_time.py
+
+'''
+import compileall
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import bench_import
+
+BUDGET_MS = float(os.environ.get('ARIB_IMPORT_BUDGET_MS', bench_import.DEFAULT_BUDGET_MS))
+REPEAT = 5
+
+
+def test_import_time():
+  compileall.compile_dir(os.path.join(ROOT, 'arib'), quiet=1)
+  for module in bench_import.MODULES:
+    result = bench_import.bench(module, REPEAT)
+    assert not result['heavy'], (module, result['heavy'])
+    assert result['import_ms'] <= BUDGET_MS, (module, result['import_ms'])
+
+
+def test_deferred_tables():
+  # the code set tables are only built when first used
+  seconds, out = bench_import.run('import arib.ts2ass, arib.code_set as c; '
+    'print(" ".join(type(s.__dict__["ENCODING"]).__name__ for s in (c.Gaiji, c.Hiragana, c.Katakana)))')
+  assert out == 'deferred deferred deferred'
+
+
+if __name__ == '__main__':
+  for name, test in sorted(globals().items()):
+    if name.startswith('test_') and callable(test):
+      test()
+      print(name + ': ok')
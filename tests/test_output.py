@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: test_output.py
+Desc: Checks that BufferedFile never publishes incomplete output
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Run it directly, or with pytest:
+
+  python tests/test_output.py
+
+'''
+import gc
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from arib.output import BufferedFile
+from arib.output import TEMP_SUFFIX
+
+
+class Directory(object):
+  '''Temporary directory, removed with everything in it
+  '''
+  def __enter__(self):
+    self.path = tempfile.mkdtemp(prefix='arib-test-')
+    return self.path
+
+  def __exit__(self, exc_type, exc_value, tb):
+    shutil.rmtree(self.path, ignore_errors=True)
+    return False
+
+
+def contents(filepath):
+  with open(filepath, 'rb') as f:
+    return f.read().decode('utf-8')
+
+
+def test_close():
+  with Directory() as d:
+    filepath = os.path.join(d, 'out.ass')
+    with BufferedFile(filepath, flush_lines=2) as f:
+      for i in range(5):
+        f.write(u'字幕 {i}\n'.format(i=i))
+        # flushed lines only ever go to the temporary file
+        assert not os.path.exists(filepath)
+      assert os.path.exists(filepath + TEMP_SUFFIX)
+    assert contents(filepath) == u''.join(u'字幕 {i}\n'.format(i=i) for i in range(5))
+    assert os.listdir(d) == ['out.ass']
+
+
+def test_exception():
+  with Directory() as d:
+    filepath = os.path.join(d, 'out.ass')
+    try:
+      with BufferedFile(filepath, flush_lines=1) as f:
+        f.write(u'line\n')
+        raise RuntimeError('conversion failed')
+    except RuntimeError:
+      pass
+    assert os.listdir(d) == []
+
+
+def test_abort():
+  with Directory() as d:
+    filepath = os.path.join(d, 'out.ass')
+    f = BufferedFile(filepath, flush_lines=1)
+    f.write(u'line\n')
+    f.abort()
+    assert f.closed()
+    assert os.listdir(d) == []
+    # closing afterwards publishes nothing
+    f.close()
+    assert os.listdir(d) == []
+
+
+def test_never_closed():
+  with Directory() as d:
+    filepath = os.path.join(d, 'out.ass')
+    f = BufferedFile(filepath, flush_lines=1)
+    f.write(u'line\n')
+    del f
+    gc.collect()
+    assert os.listdir(d) == []
+
+
+def test_keep():
+  with Directory() as d:
+    filepath = os.path.join(d, 'out.ass')
+    f = BufferedFile(filepath, flush_lines=1)
+    f.write(u'line\n')
+    f.keep()
+    del f
+    gc.collect()
+    assert os.listdir(d) == ['out.ass' + TEMP_SUFFIX]
+    assert contents(filepath + TEMP_SUFFIX) == u'line\n'
+
+
+def test_pickle():
+  with Directory() as d:
+    filepath = os.path.join(d, 'out.ass')
+    f = BufferedFile(filepath, flush_lines=2)
+    f.write(u'written 1\n')
+    f.write(u'written 2\n')
+    f.write(u'buffered\n')
+    state = pickle.dumps(f)
+    # output after the checkpoint, then the run dies
+    f.write(u'lost 1\n')
+    f.write(u'lost 2\n')
+    f.keep()
+    assert u'lost' in contents(filepath + TEMP_SUFFIX)
+
+    resumed = pickle.loads(state)
+    assert os.path.getsize(filepath + TEMP_SUFFIX) == len(u'written 1\nwritten 2\n'.encode('utf-8'))
+    resumed.write(u'resumed\n')
+    resumed.close()
+    assert contents(filepath) == u'written 1\nwritten 2\nbuffered\nresumed\n'
+    assert os.listdir(d) == ['out.ass']
+
+
+def test_in_place():
+  with Directory() as d:
+    filepath = os.path.join(d, 'out.srt')
+    f = BufferedFile(filepath, flush_lines=1, atomic=False)
+    f.write(u'line\n')
+    # readable as it grows
+    assert contents(filepath) == u'line\n'
+    f.close()
+    assert os.listdir(d) == ['out.srt']
+
+
+if __name__ == '__main__':
+  for name, test in sorted(globals().items()):
+    if name.startswith('test_') and callable(test):
+      test()
+      print(name + ': ok')
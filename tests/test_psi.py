@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: test_psi.py
+Desc: Checks of PSI section reassembly and PAT/PMT following
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Run it directly, or with pytest:
+
+  python tests/test_psi.py
+
+'''
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from arib.mpeg import psi
+from tables import long_section, packets
+
+
+def test_crc32():
+  section = long_section(psi.PAT.TABLE_ID, 1, b'\x00\x01\xe1\x00')
+  assert psi.crc32(section) == 0
+  damaged = section[:8] + bytes([section[8] ^ 1]) + section[9:]
+  assert psi.crc32(damaged) != 0
+
+
+def test_sections():
+  # a long section split over packets, then two sections in one packet
+  body = b''.join(struct.pack('>HH', n, 0xe000 | (0x100 + n)) for n in range(1, 60))
+  sections = psi.Sections()
+  found = []
+  pat = long_section(psi.PAT.TABLE_ID, 1, body)
+  for packet in packets(0, pat, size=100):
+    found += sections.push(packet)
+  assert found == [pat]
+  first = long_section(psi.PAT.TABLE_ID, 1, b'\x00\x01\xe1\x00')
+  second = long_section(psi.PAT.TABLE_ID, 2, b'\x00\x02\xe2\x00')
+  assert sections.push(packets(0, first + second)[0]) == [first, second]
+
+
+def test_program_map():
+  pat = long_section(psi.PAT.TABLE_ID, 1, struct.pack('>HHHH', 0, 0xe010, 1, 0xe100))
+  streams = struct.pack('>BHH', 0x02, 0xe111, 0xf000)
+  for pid, tag in ((0x130, 0x30), (0x138, 0x38), (0x140, 0x40)):
+    streams += struct.pack('>BHHBBB', 0x06, 0xe000 | pid, 0xf003, psi.STREAM_IDENTIFIER_DESCRIPTOR, 1, tag)
+  pmt = long_section(psi.PMT.TABLE_ID, 1, struct.pack('>HH', 0xe111, 0xf000) + streams)
+  programs = psi.ProgramMap()
+  seen = []
+  programs.OnPMT = seen.append
+  for packet in packets(psi.PAT_PID, pat):
+    programs.packet(psi.PAT_PID, packet)
+  assert 0x100 in programs.pids
+  assert 0x010 not in programs.pids
+  for packet in packets(0x100, pmt) * 2:
+    programs.packet(0x100, packet)
+  # the repeat is dropped
+  assert len(seen) == 1
+  pmt = programs.programs[1]
+  assert pmt.pcr_pid == 0x111
+  assert [(kind, stream.pid) for kind, stream in pmt.caption_streams()] == [
+    (psi.CAPTION, 0x130), (psi.SUPERIMPOSE, 0x138)]
+  # a damaged section is dropped
+  damaged = bytearray(long_section(psi.PMT.TABLE_ID, 2, struct.pack('>HH', 0xe111, 0xf000)))
+  damaged[-1] ^= 1
+  programs.section(0x100, bytes(damaged))
+  assert 2 not in programs.programs
+
+
+def test_new_pat():
+  def pat(version, *programs, **kwargs):
+    body = b''.join(struct.pack('>HH', n, 0xe000 | pid) for n, pid in programs)
+    return long_section(psi.PAT.TABLE_ID, 1, body, version=version, **kwargs)
+
+  def pmt(program_number):
+    return long_section(psi.PMT.TABLE_ID, program_number, struct.pack('>HH', 0xe111, 0xf000))
+
+  programs = psi.ProgramMap()
+  seen = []
+  programs.OnPMT = lambda pmt: seen.append(pmt.program_number)
+  programs.watch(0x11, lambda pid, section: None)
+  pids = programs.pids
+  programs.section(psi.PAT_PID, pat(0, (1, 0x100), (2, 0x200)))
+  for n in (1, 2):
+    programs.section(n << 8, pmt(n))
+  assert sorted(programs.programs) == [1, 2] and seen == [1, 2]
+
+  # program 2 is gone, and 3 is new. TS.Parse no longer hands over PID 0x200
+  programs.section(psi.PAT_PID, pat(1, (1, 0x100), (3, 0x300)))
+  assert programs.pids is pids
+  assert pids == set([psi.PAT_PID, 0x11, 0x100, 0x300])
+  assert sorted(programs.programs) == [1]
+  # the repeat of one still listed is still dropped
+  programs.section(0x100, pmt(1))
+  assert seen == [1, 2]
+
+  # back again, its PMT is new
+  programs.section(psi.PAT_PID, pat(2, (1, 0x100), (2, 0x200)))
+  programs.section(0x200, pmt(2))
+  assert sorted(programs.programs) == [1, 2] and seen == [1, 2, 2]
+
+  # the sections of a PAT make up the map together
+  programs.section(psi.PAT_PID, pat(3, (1, 0x100), last_section_number=1))
+  programs.section(psi.PAT_PID, pat(3, (4, 0x400), section_number=1, last_section_number=1))
+  assert pids == set([psi.PAT_PID, 0x11, 0x100, 0x400])
+  assert sorted(programs.programs) == [1]
+
+
+if __name__ == '__main__':
+  for name, test in sorted(globals().items()):
+    if name.startswith('test_') and callable(test):
+      test()
+      print(name + ': ok')
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: test_reader.py
+Desc: Checks that BlockReader reads the packets the mmap reader does
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+The test file has garbage at and across block edges, so that sync is lost
+and regained there and packets straddle two blocks, and BlockReader (with
+and without prefetch, as bytes and as memoryviews) must give the same
+packets and skip the same bytes as TS.next_packet over a memory map.
+
+Run it directly, or with pytest:
+
+  python tests/test_reader.py
+
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from arib.mpeg.reader import BlockReader
+from arib.mpeg.reader import BLOCK_ALIGNMENT
+from arib.mpeg.reader import copy
+from arib.mpeg.ts import TS
+from streams import Directory
+
+PACKET_SIZE = TS.PACKET_SIZE
+BLOCK = BLOCK_ALIGNMENT
+
+
+class Stream(object):
+  '''A .ts file being built of numbered packets and garbage
+  '''
+  def __init__(self):
+    self.data = bytearray()
+    self.packets = []
+    self.garbage = 0
+
+  def packet(self):
+    # the number in base 64 digits, so never a sync byte
+    i = len(self.packets)
+    packet = bytes([TS.SYNC_BYTE, 0x01, 0x00, 0x10, i >> 12 & 63, i >> 6 & 63, i & 63]) + b'\0' * (PACKET_SIZE - 7)
+    self.packets.append(packet)
+    self.data += packet
+
+  def junk(self, data):
+    self.garbage += len(data)
+    self.data += data
+
+  def fill_to(self, offset, junk=0xff):
+    '''Packets, then garbage to end exactly at offset
+    '''
+    while len(self.data) + PACKET_SIZE <= offset:
+      self.packet()
+    self.junk(bytes([junk]) * (offset - len(self.data)))
+
+
+def stream():
+  s = Stream()
+  # garbage ending 100 bytes before the first block edge, so the next
+  # packet straddles it
+  s.fill_to(BLOCK - 100)
+  s.packet()
+  # garbage across the second edge, with a sync byte that no other follows
+  s.fill_to(2 * BLOCK - 10)
+  s.junk(b'\xff' * 5 + bytes([TS.SYNC_BYTE]) + b'\xff' * 14)
+  s.packet()
+  # garbage ending exactly at the third edge
+  s.fill_to(3 * BLOCK)
+  s.packet()
+  # more than two packets of garbage, full of false sync bytes, across the fourth
+  s.fill_to(4 * BLOCK - 200)
+  s.junk(bytes([TS.SYNC_BYTE, 0x00, 0x00]) * 133)
+  s.packet()
+  # a packet starting at the last byte of the fifth block
+  s.fill_to(5 * BLOCK - 1, junk=0x00)
+  s.packet()
+  s.fill_to(5 * BLOCK + 20 * PACKET_SIZE)
+  # and a partial packet at the end, which is never read
+  s.data += s.packets[0][:100]
+  return s
+
+
+def mmap_packets(filepath, start=0):
+  skipped = [0]
+  packets = [bytes(p) for p in TS.next_packet(filepath, start=start, skipped=skipped)]
+  return packets, skipped[0]
+
+
+def block_packets(filepath, start=0, **kwargs):
+  skipped = [0]
+  packets = [copy(p) for p in BlockReader(filepath, block_size=BLOCK, **kwargs).packets(start=start, skipped=skipped)]
+  return packets, skipped[0]
+
+
+def test_block_edges():
+  s = stream()
+  with Directory() as d:
+    filepath = os.path.join(d, 'edges.ts')
+    with open(filepath, 'wb') as f:
+      f.write(s.data)
+    expected = mmap_packets(filepath)
+    assert expected == (s.packets, s.garbage)
+    for prefetch in (0, 2):
+      for views in (False, True):
+        assert block_packets(filepath, prefetch=prefetch, views=views) == expected, (prefetch, views)
+
+
+def test_start():
+  s = stream()
+  with Directory() as d:
+    filepath = os.path.join(d, 'edges.ts')
+    with open(filepath, 'wb') as f:
+      f.write(s.data)
+    # from a packet, and from part way through the garbage before an edge
+    for start in (PACKET_SIZE * 10, 2 * BLOCK - 5, 4 * BLOCK - 100):
+      expected = mmap_packets(filepath, start)
+      assert expected[0]
+      for prefetch in (0, 2):
+        assert block_packets(filepath, start, prefetch=prefetch) == expected, (start, prefetch)
+
+
+def test_short_last_block():
+  # sync lost just before the last block edge, and regained by a packet
+  # running into a last block too short to confirm it with
+  for end in (b'', bytes([TS.SYNC_BYTE]) + b'\0' * 99):
+    s = Stream()
+    s.fill_to(BLOCK - 150)
+    s.packet()
+    s.data += end
+    with Directory() as d:
+      filepath = os.path.join(d, 'short.ts')
+      with open(filepath, 'wb') as f:
+        f.write(s.data)
+      expected = mmap_packets(filepath)
+      assert expected[0] == s.packets
+      for prefetch in (0, 2):
+        assert block_packets(filepath, prefetch=prefetch) == expected, (end, prefetch)
+
+
+def test_tiny():
+  # files smaller than a block, and with nothing but garbage
+  with Directory() as d:
+    filepath = os.path.join(d, 'tiny.ts')
+    # (an empty one can't be memory mapped)
+    open(filepath, 'wb').close()
+    assert block_packets(filepath) == ([], 0)
+    for data in (b'\xff' * 1000, b'\xff' * 100, bytes([TS.SYNC_BYTE]) * 3,
+        b'\xff' * 5 + bytes([TS.SYNC_BYTE]) + b'\0' * 99,
+        b'\0' * 7 + bytes([TS.SYNC_BYTE]) + b'\0' * 187):
+      with open(filepath, 'wb') as f:
+        f.write(data)
+      assert block_packets(filepath) == mmap_packets(filepath), data[:10]
+
+
+if __name__ == '__main__':
+  for name, test in sorted(globals().items()):
+    if name.startswith('test_') and callable(test):
+      test()
+      print(name + ': ok')
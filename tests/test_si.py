@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: test_si.py
+Desc: Checks of SDT, EIT present/following and TDT following by the Guide
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Run it directly, or with pytest:
+
+  python tests/test_si.py
+
+'''
+import datetime
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from arib.mpeg.timeline import Timeline, CLOCK
+from arib.mpeg import psi
+from arib.mpeg import si
+from tables import long_section
+
+
+def bcd(n):
+  return ((n // 10) << 4) | (n % 10)
+
+
+def mjd(t):
+  days = (t.date() - datetime.date(1858, 11, 17)).days
+  return struct.pack('>H', days) + bytes([bcd(t.hour), bcd(t.minute), bcd(t.second)])
+
+
+def event(event_id, start, duration, title):
+  descriptor = bytes([si.SHORT_EVENT_DESCRIPTOR, 5 + len(title)]) + b'jpn' + bytes([len(title)]) + title + b'\x00'
+  return struct.pack('>H', event_id) + mjd(start) + bytes([bcd(duration // 3600), bcd(duration // 60 % 60), 0]) + \
+    struct.pack('>H', 0x8000 | len(descriptor)) + descriptor
+
+
+class Stream(object):
+  '''The parts of a TS a Guide uses
+  '''
+  def __init__(self):
+    self.timeline = Timeline()
+    self.timelines = {}
+
+
+def test_times():
+  t = datetime.datetime(2026, 10, 19, 21, 5, 9)
+  assert si.mjd_time(mjd(t)) == t
+  assert si.mjd_time(b'\xff' * 5) is None
+  assert si.bcd_duration(b'\x01\x30\x00') == 5400
+  assert si.bcd_duration(b'\xff' * 3) is None
+
+
+def test_guide():
+  programs = psi.ProgramMap()
+  ts = Stream()
+  guide = si.Guide(programs, ts)
+  # service 1 named in kanji (社会) by provider "ARIB" in alphanumerics
+  provider = b'\x0eARIB'
+  name = bytes([0x3c, 0x52, 0x32, 0x71])
+  descriptor = bytes([si.SERVICE_DESCRIPTOR, 3 + len(provider) + len(name), 1, len(provider)]) + provider + \
+    bytes([len(name)]) + name
+  service = struct.pack('>HBH', 1, 0xff, 0x8000 | len(descriptor)) + descriptor
+  programs.section(si.SDT_PID, long_section(si.SDT.TABLE_ID, 1, struct.pack('>HB', 4, 0xff) + service))
+  assert guide.services[1] == si.Service(1, u'ARIB', u'社会')
+
+  start = datetime.datetime(2026, 10, 19, 21, 0)
+  header = struct.pack('>HHBB', 1, 4, 1, si.EIT.TABLE_ID)
+  programs.section(si.EIT_PID, long_section(si.EIT.TABLE_ID, 1,
+    header + event(7, start, 3600, b'\x0eNews'), si.PRESENT, 1))
+  programs.section(si.EIT_PID, long_section(si.EIT.TABLE_ID, 1,
+    header + event(8, start + datetime.timedelta(hours=1), 1800, b'\x0eLate'), si.FOLLOWING, 1))
+  # EIT schedules on the same PID are dropped
+  programs.section(si.EIT_PID, long_section(0x50, 1, header + event(9, start, 60, b'\x0eX')))
+  assert sorted(guide.events[1]) == [si.PRESENT, si.FOLLOWING]
+
+  assert guide.wall_time(ts.timeline, 0.0) is None
+  ts.timeline.pcr(10 * CLOCK)
+  ts.timeline.pcr(11 * CLOCK)
+  programs.section(si.TDT_PID, bytes([si.TDT_TABLE_ID, 0x70, 5]) + mjd(start + datetime.timedelta(minutes=59)))
+  assert guide.wall_time(ts.timeline, 61.0) == start + datetime.timedelta(minutes=60)
+  assert guide.event(1, start + datetime.timedelta(minutes=59)).title == u'News'
+  assert guide.event(1, start + datetime.timedelta(minutes=61)).title == u'Late'
+  assert guide.event(1).title == u'News'
+  assert guide.event(2) is None
+
+
+if __name__ == '__main__':
+  for name, test in sorted(globals().items()):
+    if name.startswith('test_') and callable(test):
+      test()
+      print(name + ': ok')
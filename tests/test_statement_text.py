@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: test_statement_text.py
+Desc: Checks that the text only decoder agrees with the full decoder
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+arib.decoder.statement_text() must give the text the full decode gives
+once formatted as arib.formats does: over the tests/*.es corpus, and over
+bodies built by hand for the cases the corpus holds few or none of.
+
+Run it directly, or with pytest:
+
+  python tests/test_statement_text.py
+
+'''
+import contextlib
+import glob
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import arib.read as read
+import arib.control_characters as control_characters
+from arib.closed_caption import Context
+from arib.closed_caption import StatementBody
+from arib.closed_caption import next_data_unit
+from arib.data_group import next_data_group
+from arib.decoder import statement_text
+from arib.decoder import TEXT_STATEMENTS
+from arib.decoder import READ_AHEAD
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.es')
+
+# final byte of ACPS
+ACPS = 0x61
+
+
+def expected(statements):
+  '''Text of decoded statements by the rules of arib.formats, written out
+  '''
+  lines = []
+  line = []
+  small = False
+  for s in statements:
+    t = type(s)
+    if t is control_characters.SSZ:
+      small = True
+    elif t in (control_characters.MSZ, control_characters.NSZ):
+      small = False
+    elif isinstance(s, TEXT_STATEMENTS) or t is control_characters.SP or t.__name__.startswith('DRCS'):
+      if not small:
+        line.append(u' ' if t is control_characters.SP else u'�' if t.__name__.startswith('DRCS') else str(s))
+    elif t in (control_characters.APS, control_characters.CS) or (t is control_characters.CSI and s._args[-1] == ACPS):
+      if line:
+        lines.append(u''.join(line))
+        line = []
+  if line:
+    lines.append(u''.join(line))
+  return u'\n'.join(lines)
+
+
+def texts(filepath, context):
+  '''Payloads of the caption statement bodies of a .es file
+  '''
+  result = []
+  with contextlib.redirect_stdout(io.StringIO()):
+    for data_group in next_data_group(filepath, context):
+      if data_group.is_management_data():
+        continue
+      for data_unit in next_data_unit(data_group.payload()):
+        payload = data_unit.payload()
+        if payload is None or data_unit._data_unit_type != StatementBody.ID:
+          continue
+        result.append(payload.payload() if context.text_only else expected(payload.payload()))
+  return result
+
+
+def both(body, bytes_to_read=None):
+  '''(text, bytes read) by statement_text and by the full decode
+  '''
+  if bytes_to_read is None:
+    bytes_to_read = len(body)
+  f = read.Cursor(body)
+  fast = (statement_text(f, bytes_to_read), f.tell())
+  f = read.Cursor(body)
+  full = (expected(StatementBody.parse_contents(f, bytes_to_read)), f.tell())
+  return fast, full
+
+
+def test_corpus():
+  files = sorted(glob.glob(CORPUS))
+  assert files
+  bodies = 0
+  for filepath in files:
+    full = texts(filepath, Context())
+    fast = texts(filepath, Context(text_only=True))
+    assert fast == full, filepath
+    bodies += len(full)
+  assert bodies > 10000
+
+
+def test_single_shift():
+  # SS2 takes one character from G2 (hiragana), then GL is G0 (kanji) again
+  fast, full = both(bytes([0x30, 0x21, control_characters.SS2.CODE, 0x22, 0x30, 0x21]))
+  assert fast == full == (u'亜あ亜', 6)
+  # SS3 from G3, designated katakana by ESC + 1
+  fast, full = both(bytes([0x1b, 0x2b, 0x31, control_characters.SS3.CODE, 0x22, 0x30, 0x21]))
+  assert fast == full == (u'ア亜', 7)
+
+
+def test_size_and_position():
+  SSZ = control_characters.SSZ.CODE
+  NSZ = control_characters.NSZ.CODE
+  CSI = control_characters.CSI.CODE
+  body = bytes([SSZ, 0x30, 0x21, NSZ, 0x30, 0x21,
+    # SWF, which doesn't break the line, then ACPS, which does
+    CSI, 0x37, 0x20, 0x53, 0x30, 0x21, CSI, 0x31, 0x3b, 0x32, 0x20, ACPS, 0x30, 0x21])
+  fast, full = both(body)
+  assert fast == full == (u'亜亜\n亜', len(body))
+
+
+def test_truncated():
+  # data ending part way through a kanji, a body and APS parameters
+  for body, bytes_to_read in ((bytes([0x30, 0x21, 0x30]), 3), (bytes([0x30, 0x21]), 4),
+      (bytes([0x30, 0x21, control_characters.APS.CODE, 0x41]), 4)):
+    for decode in (statement_text, StatementBody.parse_contents):
+      try:
+        decode(read.Cursor(body), bytes_to_read)
+      except read.EOFError:
+        pass
+      else:
+        assert False, (decode.__name__, body)
+
+
+def test_long_body():
+  kanji = bytes([0x30, 0x21]) * READ_AHEAD
+  fast, full = both(kanji)
+  assert fast == full == (u'亜' * READ_AHEAD, 2 * READ_AHEAD)
+  # a CSI starting within the body but ending well past READ_AHEAD bytes
+  # beyond it is read in full, after reading again with more data
+  csi = bytes([control_characters.CSI.CODE]) + b'1;' * READ_AHEAD + bytes([0x20, ACPS])
+  body = kanji + csi + kanji
+  fast, full = both(body, len(kanji) + 1)
+  assert fast == full == (u'亜' * READ_AHEAD, len(kanji) + len(csi))
+
+
+if __name__ == '__main__':
+  for name, test in sorted(globals().items()):
+    if name.startswith('test_') and callable(test):
+      test()
+      print(name + ': ok')
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# vim: set ts=2 expandtab:
+'''
+Module: test_timeline.py
+Desc: Checks of the media timeline
+Author: John O'Neil
+Email: oneil.john@gmail.com
+DATE: Monday, October 19th 2026
+
+Recordings rarely hold the cases that matter here, so the PCR and PTS
+values are made up: PCR wraparound, splices and PTS before the first PCR.
+
+Run it directly, or with pytest:
+
+  python tests/test_timeline.py
+
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from arib.mpeg.timeline import Timeline, CLOCK, WRAP
+
+
+def test_timeline_wrap():
+  clock = Timeline()
+  clock.pcr(WRAP - CLOCK)
+  clock.pcr(WRAP - CLOCK // 2)
+  # the 33 bit clock wraps to zero half a second later
+  clock.pcr(0)
+  clock.pcr(CLOCK // 2)
+  assert clock.now() == 1.5
+  assert clock.wraps == 1
+  assert clock.discontinuities == 0
+  # a PTS just before the wrap, given after it
+  assert clock.time(WRAP - CLOCK // 2) == 0.5
+
+
+def test_timeline_splice():
+  clock = Timeline()
+  clock.pcr(1000 * CLOCK)
+  clock.pcr(1001 * CLOCK)
+  # flagged, backwards and too large steps all carry on from the same time
+  clock.pcr(5 * CLOCK, discontinuity=True)
+  assert clock.now() == 1.0
+  clock.pcr(6 * CLOCK)
+  clock.pcr(2 * CLOCK)
+  assert clock.now() == 2.0
+  clock.pcr(3 * CLOCK)
+  clock.pcr(3000 * CLOCK)
+  assert clock.now() == 3.0
+  assert clock.discontinuities == 3
+  assert clock.time(3001 * CLOCK) == 4.0
+
+
+def test_timeline_before_pcr():
+  clock = Timeline()
+  assert clock.time(900000) == 0.0
+  assert clock.time(990000) == 1.0
+  # stepping back doesn't take media time back with it
+  assert clock.time(900000) == 1.0
+  assert clock.time(990000) == 2.0
+  assert clock.discontinuities == 1
+  # PTS wraps are followed too
+  clock = Timeline()
+  clock.time(WRAP - CLOCK)
+  assert clock.time(CLOCK) == 2.0
+  assert clock.wraps == 1
+  # the first PCR, a little behind the PTS, doesn't step back either
+  clock.pcr(CLOCK // 2)
+  assert clock.now() == 2.0
+  clock.pcr(CLOCK)
+  assert clock.now() == 2.5
+  assert clock.discontinuities == 0
+
+
+def test_timeline_splice_before_pcr():
+  # PTS of one clock, then the PCR of another
+  clock = Timeline()
+  clock.time(1000 * CLOCK)
+  clock.time(1002 * CLOCK)
+  clock.pcr(40000 * CLOCK)
+  assert clock.now() == 2.0
+  assert clock.discontinuities == 1
+  clock.pcr(40001 * CLOCK)
+  assert clock.now() == 3.0
+  assert clock.time(40001 * CLOCK + CLOCK // 2) == 3.5
+  # and far behind it
+  clock = Timeline()
+  clock.time(40000 * CLOCK)
+  clock.pcr(1000 * CLOCK)
+  assert clock.now() == 0.0
+  assert clock.discontinuities == 1
+  # a flagged discontinuity is one too
+  clock = Timeline()
+  clock.time(1000 * CLOCK)
+  clock.pcr(1001 * CLOCK, discontinuity=True)
+  assert clock.now() == 0.0
+  assert clock.discontinuities == 1
+
+
+if __name__ == '__main__':
+  for name, test in sorted(globals().items()):
+    if name.startswith('test_') and callable(test):
+      test()
+      print(name + ': ok')